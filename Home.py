@@ -1,48 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from datetime import date
-import base64
-import streamlit.components.v1 as components
+from datetime import date, timedelta
 
-from database import inicializar_banco, conectar_banco
+from database import inicializar_banco
+from repository import kpis_mes, despesas_por_categoria
 from auth import checar_senha, fazer_logout
-from style import carregar_estilos
+from bootstrap import iniciar_pagina
 from components import metric_card, icon_svg
+from formatting import fmt_brl
 
 # ==========================================
 # CONFIGURAÇÃO DA PÁGINA
 # ==========================================
-st.set_page_config(
-    page_title="Painel Executivo | D.Tech", 
-    page_icon="logo.png",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
-# Truque do iPhone
-try:
-    with open("logo.png", "rb") as f:
-        img_b64 = base64.b64encode(f.read()).decode()
-    components.html(
-        f"""
-        <script>
-            var existente = window.parent.document.querySelector("link[rel='apple-touch-icon']");
-            if (!existente) {{
-                var link = window.parent.document.createElement('link');
-                link.rel = 'apple-touch-icon';
-                link.href = 'data:image/png;base64,{img_b64}';
-                window.parent.document.head.appendChild(link);
-            }}
-        </script>
-        """, height=0, width=0
-    )
-except: pass
-
-try: st.logo("logo.png")
-except: pass
-
-carregar_estilos()
+# Logo, estilos e ícone do iPhone (injetado uma vez por sessão) ficam no bootstrap
+iniciar_pagina("Painel Executivo | D.Tech")
 
 if not checar_senha():
     st.stop()
@@ -52,10 +23,6 @@ if not checar_senha():
 # ==========================================
 MESES_PT = {1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho", 7: "Julho", 8: "Agosto", 9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro"}
 
-def fmt_brl(x: float) -> str:
-    try: return f"R$ {float(x):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except: return "R$ 0,00"
-
 db_ref = st.session_state.get("db_nome", "financas.db")
 st.session_state["db_nome"] = db_ref
 
@@ -104,51 +71,29 @@ menu = st.tabs(["Visão Geral", "Análise Visual"])
 # ==========================================
 # EXTRAÇÃO DE DADOS (AGORA SUPER RÁPIDA)
 # ==========================================
-conn, engine = conectar_banco(db_ref)
-try:
-    query = """
-        SELECT t.tipo, t.valor, t.data_prevista, t.data_real, t.status, c.nome as categoria
-        FROM transactions t
-        LEFT JOIN categories c ON t.categoria_id = c.id
-        WHERE t.usuario_dono = ?
-    """
-    if engine == "postgres": query = query.replace("?", "%s")
-    df = pd.read_sql_query(query, conn, params=(usuario_logado,))
-finally:
-    conn.close()
-
-if df.empty:
-    st.info("Bem-vindo! Cadastre contas, categorias e lançamentos para visualizar seu painel.")
-    st.stop()
-
-df["tipo"] = df["tipo"].astype(str).str.strip()
-df["status"] = df["status"].astype(str).str.strip()
-if "categoria" in df.columns:
-    df["categoria"] = df["categoria"].fillna("Sem categoria")
-
-df["data_prevista"] = pd.to_datetime(df["data_prevista"], errors="coerce")
-df["data_real"] = pd.to_datetime(df["data_real"], errors="coerce")
-
 hoje = date.today()
 mes_atual = hoje.month
 ano_atual = hoje.year
 titulo_mes = f"{MESES_PT.get(mes_atual, 'Mês')} / {ano_atual}"
 
-# ==========================================
-# PROCESSAMENTO DE KPIS
-# ==========================================
-df_realizado = df[df["status"].str.lower() == "realizado"]
+inicio_mes = hoje.replace(day=1)
+fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
 
-total_entradas_reais = float(df_realizado[df_realizado["tipo"] == "Entrada"]["valor"].sum())
-total_saidas_reais = float(df_realizado[df_realizado["tipo"] == "Saída"]["valor"].sum())
-saldo_atual = total_entradas_reais - total_saidas_reais
+# Uma linha de somas calculada no banco, em vez do histórico inteiro em pandas
+kpis = kpis_mes(db_ref, usuario_logado, inicio_mes, fim_mes)
 
-df_mes_previsto = df[(df["data_prevista"].dt.month == mes_atual) & (df["data_prevista"].dt.year == ano_atual)]
-df_mes_realizado = df_realizado[(df_realizado["data_real"].dt.month == mes_atual) & (df_realizado["data_real"].dt.year == ano_atual)]
+if kpis["quantidade"] == 0:
+    st.info("Bem-vindo! Cadastre contas, categorias e lançamentos para visualizar seu painel.")
+    st.stop()
 
-total_receber_mes = float(df_mes_previsto[(df_mes_previsto["tipo"] == "Entrada") & (df_mes_previsto["status"].str.lower() == "previsto")]["valor"].sum())
-total_pagar_mes = float(df_mes_previsto[(df_mes_previsto["tipo"] == "Saída") & (df_mes_previsto["status"].str.lower() == "previsto")]["valor"].sum())
-resultado_mes = float(df_mes_realizado[df_mes_realizado["tipo"] == "Entrada"]["valor"].sum() - df_mes_realizado[df_mes_realizado["tipo"] == "Saída"]["valor"].sum())
+# ==========================================
+# PROCESSAMENTO DE KPIS
+# ==========================================
+# Tudo em centavos inteiros; reais só na formatação e nos gráficos
+saldo_atual = kpis["saldo_atual_centavos"]
+total_receber_mes = kpis["receber_mes_centavos"]
+total_pagar_mes = kpis["pagar_mes_centavos"]
+resultado_mes = kpis["entradas_realizadas_mes_centavos"] - kpis["saidas_realizadas_mes_centavos"]
 
 # ==========================================
 # VISUALIZAÇÃO
@@ -162,6 +107,9 @@ with menu[0]:
     with c4: metric_card("Resultado do mês", fmt_brl(resultado_mes), "Lucro/Prejuízo realizado", "green" if resultado_mes >= 0 else "red", icon_svg("trend"))
 
 with menu[1]:
+    # Import tardio: o plotly só carrega depois do login, quando há gráfico para desenhar
+    import plotly.express as px
+
     st.subheader("Análise Visual")
     g1, g2 = st.columns(2)
 
@@ -169,7 +117,7 @@ with menu[1]:
         st.markdown("*Receitas vs Despesas (Realizado no mês)*")
         dados_barras = pd.DataFrame({
             "Tipo": ["Entradas", "Saídas"],
-            "Valor": [float(df_mes_realizado[df_mes_realizado["tipo"] == "Entrada"]["valor"].sum()), float(df_mes_realizado[df_mes_realizado["tipo"] == "Saída"]["valor"].sum())]
+            "Valor": [kpis["entradas_realizadas_mes_centavos"] / 100, kpis["saidas_realizadas_mes_centavos"] / 100]
         })
         fig_barras = px.bar(dados_barras, x="Tipo", y="Valor", color="Tipo", color_discrete_map={"Entradas": "#00CC96", "Saídas": "#FF4B4B"}, text_auto=".2s", template="plotly_dark")
         fig_barras.update_layout(showlegend=False, margin=dict(l=0, r=0, t=30, b=0), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
@@ -177,9 +125,9 @@ with menu[1]:
 
     with g2:
         st.markdown("*Despesas por categoria (Previsto no mês)*")
-        df_despesas = df_mes_previsto[df_mes_previsto["tipo"] == "Saída"]
-        if not df_despesas.empty:
-            df_pizza = df_despesas.groupby("categoria", dropna=False)["valor"].sum().reset_index()
+        df_pizza = despesas_por_categoria(db_ref, usuario_logado, inicio_mes, fim_mes)
+        if not df_pizza.empty:
+            df_pizza["valor"] = df_pizza["valor_centavos"] / 100
             fig_pizza = px.pie(df_pizza, values="valor", names="categoria", hole=0.4, color_discrete_sequence=px.colors.sequential.Teal, template="plotly_dark")
             fig_pizza.update_traces(textposition="inside", textinfo="percent+label")
             fig_pizza.update_layout(margin=dict(l=0, r=0, t=30, b=0), showlegend=False, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
@@ -0,0 +1,146 @@
+"""
+Auditoria (audit_log) fora do caminho de quem salva.
+
+registrar() só põe o evento numa fila em memória e volta na hora. Uma thread de fundo
+junta os eventos e grava em lote (um INSERT multi-linha por banco) a cada
+AUDIT_INTERVALO_MS ou quando AUDIT_LOTE eventos se acumulam. O que ainda estiver na
+fila é gravado quando o processo encerra.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from repository import transacao
+
+AUDIT_INTERVALO_MS = int(os.getenv("AUDIT_INTERVALO_MS", "500"))
+AUDIT_LOTE = int(os.getenv("AUDIT_LOTE", "200"))
+# Fila cheia (banco fora do ar por muito tempo) descarta o evento em vez de travar a tela
+AUDIT_FILA_MAX = int(os.getenv("AUDIT_FILA_MAX", "10000"))
+
+FUSO_BR = timezone(timedelta(hours=-3))
+
+_COLUNAS = ["data_hora", "usuario", "acao", "detalhes"]
+
+_log = logging.getLogger(__name__)
+
+_fila = queue.Queue(maxsize=AUDIT_FILA_MAX)
+_parar = threading.Event()
+_lock = threading.Lock()
+_thread = None
+_contadores = {"enfileirados": 0, "gravados": 0, "descartados": 0, "lotes": 0}
+
+
+# =========================================================
+# API
+# =========================================================
+def registrar(db_ref, usuario, acao, detalhes=""):
+    """Enfileira um evento de auditoria; a gravação acontece em segundo plano."""
+    agora = datetime.now(FUSO_BR).strftime("%Y-%m-%d %H:%M:%S")
+    _iniciar()
+    try:
+        _fila.put_nowait((db_ref, (agora, usuario or "desconhecido", acao, str(detalhes))))
+    except queue.Full:
+        _contar("descartados")
+    else:
+        _contar("enfileirados")
+
+
+def descarregar():
+    """Grava agora, nesta thread, tudo o que está na fila."""
+    _gravar(_drenar())
+
+
+def encerrar(timeout=5.0):
+    """Para a thread de fundo gravando o que restou (registrado no atexit)."""
+    _parar.set()
+    thread = _thread
+    if thread is not None and thread.is_alive():
+        thread.join(timeout)
+    descarregar()
+
+
+def metricas_auditoria():
+    with _lock:
+        metricas = dict(_contadores)
+    metricas["na_fila"] = _fila.qsize()
+    return metricas
+
+
+# =========================================================
+# THREAD DE GRAVAÇÃO
+# =========================================================
+def _contar(chave, n=1):
+    with _lock:
+        _contadores[chave] += n
+
+
+def _iniciar():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _parar.clear()
+            _thread = threading.Thread(target=_laco, name="audit-log", daemon=True)
+            _thread.start()
+
+
+def _drenar():
+    eventos = []
+    while True:
+        try:
+            eventos.append(_fila.get_nowait())
+        except queue.Empty:
+            return eventos
+
+
+def _coletar():
+    """Espera o primeiro evento e junta os que chegarem até encher o lote ou vencer o intervalo."""
+    intervalo = AUDIT_INTERVALO_MS / 1000
+    try:
+        eventos = [_fila.get(timeout=intervalo)]
+    except queue.Empty:
+        return []
+    limite = time.monotonic() + intervalo
+    while len(eventos) < AUDIT_LOTE and not _parar.is_set():
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        try:
+            eventos.append(_fila.get(timeout=restante))
+        except queue.Empty:
+            break
+    return eventos
+
+
+def _laco():
+    while not _parar.is_set():
+        eventos = _coletar()
+        if eventos:
+            _gravar(eventos)
+    _gravar(_drenar())
+
+
+def _gravar(eventos):
+    por_banco = {}
+    for db_ref, linha in eventos:
+        por_banco.setdefault(db_ref, []).append(linha)
+
+    for db_ref, linhas in por_banco.items():
+        try:
+            # Sem usuario: auditoria não muda a versão dos dados (não invalida o cache)
+            with transacao(db_ref) as tx:
+                tx.inserir_lote("audit_log", _COLUNAS, linhas)
+        except Exception:
+            _log.exception("Falha ao gravar %d evento(s) de auditoria", len(linhas))
+            _contar("descartados", len(linhas))
+        else:
+            _contar("gravados", len(linhas))
+            _contar("lotes")
+
+
+atexit.register(encerrar)
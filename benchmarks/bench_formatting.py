@@ -0,0 +1,75 @@
+"""
+Micro-benchmark da formatação das tabelas: linha a linha (.apply, como as páginas faziam)
+contra as versões _serie do formatting.py, com 10 mil e 100 mil linhas.
+
+    python benchmarks/bench_formatting.py [--linhas 10000,100000] [--repeticoes 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatting import fmt_brl, fmt_brl_serie, status_serie  # noqa: E402
+
+
+def _status(status, atrasado):
+    # Como as páginas decidiam o rótulo, uma linha por vez
+    if atrasado:
+        return "Atrasado"
+    return "Realizado" if status == "Realizado" else "Previsto"
+
+
+def _frame(linhas, semente=42):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        "id": np.arange(1, linhas + 1),
+        "nome": pd.Series(rng.choice(["Itaú", "Nubank", "Caixa", "Inter"], linhas)),
+        "tipo": pd.Categorical(rng.choice(["Entrada", "Saída"], linhas)),
+        "status": pd.Categorical(rng.choice(["Previsto", "Realizado"], linhas)),
+        "atrasado": rng.random(linhas) < 0.2,
+        "valor_centavos": rng.integers(-10_000_000, 10_000_000, linhas),
+    })
+
+
+# Cada caso: (nome, linha a linha, vetorizado)
+CASOS = [
+    ("fmt_brl",
+     lambda df: df["valor_centavos"].apply(fmt_brl),
+     lambda df: fmt_brl_serie(df["valor_centavos"])),
+    ("status",
+     lambda df: df.apply(lambda r: _status(r["status"], r["atrasado"]), axis=1),
+     lambda df: status_serie(df["status"], df["atrasado"])),
+    ("rotulo 'ID n | nome (tipo)'",
+     lambda df: df.apply(lambda r: f"ID {r['id']} | {r['nome']} ({r['tipo']})", axis=1),
+     lambda df: "ID " + df["id"].astype(str) + " | " + df["nome"] + " (" + df["tipo"].astype(str) + ")"),
+]
+
+
+def _medir(funcao, df, repeticoes):
+    return min(timeit.repeat(lambda: funcao(df), number=1, repeat=repeticoes)) * 1000
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--linhas", default="10000,100000", help="tamanhos separados por vírgula")
+    p.add_argument("--repeticoes", type=int, default=5, help="melhor de N execuções")
+    args = p.parse_args()
+
+    print(f"{'caso':<28} {'linhas':>8} {'.apply (ms)':>12} {'vetorizado (ms)':>16} {'ganho':>8}")
+    for linhas in [int(n) for n in args.linhas.split(",")]:
+        df = _frame(linhas)
+        for nome, linha_a_linha, vetorizado in CASOS:
+            # Mesma saída antes de comparar tempos
+            assert linha_a_linha(df).astype(str).tolist() == vetorizado(df).astype(str).tolist(), nome
+            lento = _medir(linha_a_linha, df, args.repeticoes)
+            rapido = _medir(vetorizado, df, args.repeticoes)
+            print(f"{nome:<28} {linhas:>8} {lento:>12.1f} {rapido:>16.1f} {lento / rapido:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Tempo de import a frio de cada página, medido com python -X importtime.
+
+Para cada página roda, num processo novo, os imports em dois recortes:
+  - cabeçalho: o bloco de imports do topo, pago em todo rerun, inclusive na tela de login;
+  - página completa: todo import que roda sem condição (topo do módulo e blocos with),
+    que é o caminho de quem está logado e tem dados. Imports dentro de if, try e funções
+    (os tardios, como o do Gemini no clique do botão) ficam de fora.
+Antes dos imports vem uma BASE que não entra na conta: num servidor no ar o streamlit e o
+pandas (com numpy e pyarrow) já estão carregados desde a primeira tela. Com --antes
+<revisão do git> mede também as páginas naquela revisão, para comparar antes e depois.
+
+    python benchmarks/bench_importtime.py [--antes HEAD~1] [--repeticoes 5] [--top 3]
+"""
+import argparse
+import ast
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARCA = "--pagina--"
+BASE = ["streamlit", "numpy", "pandas", "pyarrow"]
+_LINHA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+def _paginas():
+    return ["Home.py"] + sorted(
+        os.path.join("pages", p) for p in os.listdir(os.path.join(RAIZ, "pages")) if p.endswith(".py")
+    )
+
+
+def _fonte(pagina, revisao=None):
+    if revisao is None:
+        with open(os.path.join(RAIZ, pagina), encoding="utf-8") as f:
+            return f.read()
+    return subprocess.run(
+        ["git", "show", f"{revisao}:{pagina}"], cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stdout
+
+
+def _nomes(no):
+    # Só os módulos contam para o custo: "from x import y" vira "import x" e, se y for
+    # submódulo (from google import genai), "import x.y". Nomes que já não existem na
+    # árvore atual não quebram a medição de uma revisão antiga.
+    if isinstance(no, ast.Import):
+        return [a.name for a in no.names]
+    if isinstance(no, ast.ImportFrom) and no.module and not no.level:
+        return [no.module] + [f"{no.module}.{a.name}" for a in no.names]
+    return []
+
+
+def _modulos(fonte, so_cabecalho):
+    modulos = []
+    pendentes = list(ast.parse(fonte).body)
+    while pendentes:
+        no = pendentes.pop(0)
+        if isinstance(no, (ast.Import, ast.ImportFrom)):
+            modulos += _nomes(no)
+        elif so_cabecalho:
+            # Docstring no topo não encerra o cabeçalho
+            if not (isinstance(no, ast.Expr) and isinstance(no.value, ast.Constant)):
+                break
+        elif isinstance(no, ast.With):
+            pendentes[:0] = no.body
+    return list(dict.fromkeys(modulos))
+
+
+def _medir(modulos):
+    """(total em ms, {pacote do topo: ms}) de um import a frio dos módulos."""
+    codigo = f"import sys, {', '.join(BASE)}\nsys.stderr.write({MARCA + chr(10)!r})\n"
+    codigo += "".join(f"try:\n    import {m}\nexcept ImportError:\n    pass\n" for m in modulos)
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo], cwd=RAIZ, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    ).stderr
+    _, _, depois = saida.partition(MARCA)
+    por_pacote = {}
+    for linha in depois.splitlines():
+        achou = _LINHA.match(linha)
+        # Sem recuo = import pedido direto pelo código (o cumulativo já inclui as dependências)
+        if achou and len(achou.group(3)) == 1:
+            nome = achou.group(4).split(".")[0]
+            por_pacote[nome] = por_pacote.get(nome, 0) + int(achou.group(2)) / 1000
+    return sum(por_pacote.values()), por_pacote
+
+
+def _mediana(modulos, repeticoes):
+    medidas = [_medir(modulos) for _ in range(repeticoes)]
+    total = statistics.median(m[0] for m in medidas)
+    pacotes = {}
+    for _, por_pacote in medidas:
+        for nome, ms in por_pacote.items():
+            pacotes.setdefault(nome, []).append(ms)
+    return total, {nome: statistics.median(v) for nome, v in pacotes.items()}
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--antes", help="revisão do git para comparar (ex.: HEAD~1)")
+    p.add_argument("--repeticoes", type=int, default=5, help="mediana de N processos")
+    p.add_argument("--top", type=int, default=3, help="pacotes mais pesados listados por página")
+    args = p.parse_args()
+
+    revisoes = [("agora", None)] + ([("antes", args.antes)] if args.antes else [])
+    colunas = [f"{recorte} {nome}" for nome, _ in revisoes for recorte in ("cabeçalho", "completa")]
+    print(f"{'página':<28}" + "".join(f" {c:>18}" for c in colunas) + "  mais pesados (completa, agora)")
+    for pagina in _paginas():
+        linha, pesados = f"{pagina:<28}", []
+        for nome, revisao in revisoes:
+            try:
+                fonte = _fonte(pagina, revisao)
+            except subprocess.CalledProcessError:
+                linha += f" {'-':>18}" * 2
+                continue
+            for so_cabecalho in (True, False):
+                total, pacotes = _mediana(_modulos(fonte, so_cabecalho), args.repeticoes)
+                linha += f" {total:>15.1f} ms"
+                if revisao is None and not so_cabecalho:
+                    pesados = sorted(pacotes.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        print(linha + "  " + ", ".join(f"{n} {ms:.0f}" for n, ms in pesados))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Início comum das páginas: set_page_config, logo do menu, estilos e o ícone do iPhone.
+
+Os ícones saem do logo.png (820 px, ~150 KB) uma vez por processo, nos tamanhos de uso,
+para static/. Com server.enableStaticServing o navegador busca o apple-touch-icon como
+arquivo estático em vez de receber o logo inteiro em base64 a cada rerun; o <link> é
+injetado uma vez por sessão e só se a página ainda não tiver um.
+"""
+import base64
+import logging
+from pathlib import Path
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from style import carregar_estilos
+
+RAIZ = Path(__file__).resolve().parent
+LOGO = RAIZ / "logo.png"
+# Servida pelo Streamlit em app/static/ (precisa estar ao lado do Home.py)
+PASTA_STATIC = RAIZ / "static"
+
+# arquivo -> lado em pixels
+ICONES = {
+    "apple-touch-icon.png": 180,
+    "favicon.png": 64,
+    "logo-menu.png": 128,
+}
+# O iOS pinta de preto o que é transparente; o ícone da tela inicial ganha o fundo do tema
+FUNDO_TOUCH_ICON = "#0A0A0A"
+
+_log = logging.getLogger(__name__)
+
+
+# =========================================================
+# ÍCONES
+# =========================================================
+@st.cache_resource(show_spinner=False)
+def _gerar_icones():
+    """{arquivo: caminho} dos ícones em static/, gerados só quando faltam ou o logo mudou."""
+    from PIL import Image
+
+    try:
+        PASTA_STATIC.mkdir(exist_ok=True)
+        versao_logo = LOGO.stat().st_mtime
+        with Image.open(LOGO) as logo:
+            logo = logo.convert("RGBA")
+        caminhos = {}
+        for nome, lado in ICONES.items():
+            destino = PASTA_STATIC / nome
+            if not destino.exists() or destino.stat().st_mtime < versao_logo:
+                icone = logo.resize((lado, lado), Image.LANCZOS)
+                if nome == "apple-touch-icon.png":
+                    fundo = Image.new("RGBA", icone.size, FUNDO_TOUCH_ICON)
+                    icone = Image.alpha_composite(fundo, icone).convert("RGB")
+                icone.save(destino, optimize=True)
+            caminhos[nome] = str(destino)
+        return caminhos
+    except OSError:
+        # Disco só de leitura ou logo ausente: as páginas seguem com o logo.png original
+        _log.exception("Não foi possível gerar os ícones em %s", PASTA_STATIC)
+        return {}
+
+
+@st.cache_resource(show_spinner=False)
+def _data_uri(caminho):
+    with open(caminho, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
+
+
+def _href_touch_icon(icones):
+    caminho = icones.get("apple-touch-icon.png")
+    if not caminho:
+        return None
+    if st.get_option("server.enableStaticServing"):
+        base = st.get_option("server.baseUrlPath").strip("/")
+        return "/" + "/".join(p for p in [base, "app/static/apple-touch-icon.png"] if p)
+    # Sem static serving: o de 180 px em base64 ainda é uma fração do logo original
+    return _data_uri(caminho)
+
+
+def _injetar_touch_icon(icones):
+    if st.session_state.get("_touch_icon_injetado"):
+        return
+    href = _href_touch_icon(icones)
+    if not href:
+        return
+    components.html(
+        f"""
+        <script>
+            var doc = window.parent.document;
+            if (!doc.querySelector("link[rel='apple-touch-icon']")) {{
+                var link = doc.createElement('link');
+                link.rel = 'apple-touch-icon';
+                link.href = '{href}';
+                doc.head.appendChild(link);
+            }}
+        </script>
+        """,
+        height=0, width=0,
+    )
+    st.session_state["_touch_icon_injetado"] = True
+
+
+# =========================================================
+# API
+# =========================================================
+def iniciar_pagina(titulo, icone=None, sidebar="collapsed", estilos=True):
+    """Primeira chamada de cada página. icone: emoji/caminho; sem ele, o favicon gerado do logo."""
+    icones = _gerar_icones()
+    st.set_page_config(
+        page_title=titulo,
+        page_icon=icone or icones.get("favicon.png", str(LOGO)),
+        layout="wide",
+        initial_sidebar_state=sidebar,
+    )
+    try:
+        st.logo(icones.get("logo-menu.png", str(LOGO)))
+    except Exception:
+        pass
+    _injetar_touch_icon(icones)
+    if estilos:
+        carregar_estilos()
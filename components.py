@@ -1,3 +1,4 @@
+import pandas as pd
 import streamlit as st
 
 def icon_svg(name: str) -> str:
@@ -40,3 +41,50 @@ def metric_card(title: str, value: str, footer_text: str, footer_color: str, ico
 </div>
 """
     st.markdown(html_content, unsafe_allow_html=True)
+
+# =========================================================
+# TABELA PAGINADA
+# =========================================================
+TAMANHOS_PAGINA = [25, 50, 100]
+
+
+def tabela_paginada(df, chave: str, etiquetas: dict = None, formatos: dict = None, column_config: dict = None, tamanho_padrao: int = 50):
+    """
+    st.dataframe que manda ao navegador só a página visível (a ordenação por clique vale para a página).
+    etiquetas: {coluna: {rótulo: cor}} vira pílula colorida pelo column_config, sem HTML por linha.
+    formatos: {coluna: função} muda só o texto exibido; a ordenação usa o valor original.
+    Colunas de data sem configuração saem como DD/MM/AAAA.
+    """
+    total = len(df)
+    chave_tamanho, chave_pagina = f"{chave}_tamanho", f"{chave}_pagina"
+    por_pagina = st.session_state.get(chave_tamanho, tamanho_padrao)
+    paginas = max(1, -(-total // por_pagina))
+    # Filtro novo pode encolher o total: volta para a última página que existe
+    if st.session_state.get(chave_pagina, 1) > paginas:
+        st.session_state[chave_pagina] = paginas
+
+    pagina = 1
+    if total > TAMANHOS_PAGINA[0]:
+        p1, p2, p3 = st.columns([1, 1, 2.4])
+        with p1:
+            pagina = st.number_input("Página", min_value=1, max_value=paginas, step=1, key=chave_pagina)
+        with p2:
+            st.selectbox("Linhas por página", options=TAMANHOS_PAGINA, index=TAMANHOS_PAGINA.index(tamanho_padrao), key=chave_tamanho)
+        with p3:
+            inicio = (pagina - 1) * por_pagina
+            st.caption(f"Linhas {inicio + 1}–{min(inicio + por_pagina, total)} de {total}")
+
+    inicio = (int(pagina) - 1) * por_pagina
+    visivel = df.iloc[inicio:inicio + por_pagina].copy()
+
+    config = dict(column_config or {})
+    for coluna, cores in (etiquetas or {}).items():
+        visivel[coluna] = [[] if pd.isna(v) else [str(v)] for v in visivel[coluna].astype(object)]
+        config.setdefault(coluna, st.column_config.MultiselectColumn(
+            coluna, options=list(cores), color=list(cores.values()), disabled=True,
+        ))
+    for coluna in visivel.select_dtypes(include="datetime").columns:
+        config.setdefault(coluna, st.column_config.DateColumn(coluna, format="DD/MM/YYYY"))
+
+    dados = visivel.style.format(formatos) if formatos else visivel
+    st.dataframe(dados, hide_index=True, use_container_width=True, column_config=config)
@@ -1,16 +1,266 @@
+import logging
 import os
+import re
 import sqlite3
+import threading
+import time
 import streamlit as st
 
+_log = logging.getLogger(__name__)
+
+# =========================================================
+# POOL DE CONEXÕES POSTGRES (NEON)
+# =========================================================
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "15"))
+# Conexões paradas há mais tempo que isso levam um "SELECT 1" antes de sair do pool
+# (o Neon derruba sockets ociosos e a conexão morta só apareceria no meio da página).
+POOL_PING_APOS = float(os.getenv("DB_POOL_PING_APOS", "30"))
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo limite do pool."""
+
+
+class PoolConexoes:
+    """
+    Pool limitado de conexões psycopg2, seguro entre as threads do Streamlit.
+    Cada sessão pega a sua conexão, usa e devolve no close().
+    """
+    def __init__(self, db_url, minimo=POOL_MIN, maximo=POOL_MAX, timeout=POOL_TIMEOUT, ping_apos=POOL_PING_APOS):
+        self.db_url = db_url
+        self.minimo = max(0, int(minimo))
+        self.maximo = max(1, int(maximo), self.minimo)
+        self.timeout = float(timeout)
+        self.ping_apos = float(ping_apos)
+
+        self._cond = threading.Condition()
+        self._livres = []  # pilha de (conexao, momento_devolucao)
+        self._em_uso = 0
+        self._aguardando = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconexoes = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+        for _ in range(self.minimo):
+            self._livres.append((self._abrir(), time.monotonic()))
+
+    def _abrir(self):
+        import psycopg2
+        return psycopg2.connect(self.db_url, sslmode="require", connect_timeout=10)
+
+    @staticmethod
+    def _descartar(conn):
+        try: conn.close()
+        except Exception: pass
+
+    def _viva(self, conn):
+        if conn.closed:
+            return False
+        cur = None
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+        finally:
+            if cur is not None:
+                try: cur.close()
+                except Exception: pass
+
+    def obter(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+
+        with self._cond:
+            while not self._livres and self._em_uso >= self.maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._timeouts += 1
+                    raise PoolEsgotado(f"Nenhuma conexão livre em {self.timeout:g}s (máximo={self.maximo}).")
+                self._aguardando += 1
+                try:
+                    self._cond.wait(restante)
+                finally:
+                    self._aguardando -= 1
+
+            item = self._livres.pop() if self._livres else None
+            self._em_uso += 1
+
+            espera = time.monotonic() - inicio
+            self._checkouts += 1
+            self._espera_total += espera
+            self._espera_max = max(self._espera_max, espera)
+
+        # Abertura e ping ficam fora do lock para não travar as outras sessões
+        try:
+            if item is not None:
+                conn, devolvida_em = item
+                if conn.closed or (time.monotonic() - devolvida_em > self.ping_apos and not self._viva(conn)):
+                    self._descartar(conn)
+                    with self._cond:
+                        self._reconexoes += 1
+                    conn = self._abrir()
+            else:
+                conn = self._abrir()
+        except Exception:
+            with self._cond:
+                self._em_uso -= 1
+                self._cond.notify()
+            raise
+
+        return conn
+
+    def devolver(self, conn):
+        reaproveitar = not conn.closed
+        if reaproveitar:
+            try:
+                # Transação aberta ou abortada nunca volta para o pool
+                if conn.get_transaction_status() != 0:
+                    conn.rollback()
+            except Exception:
+                reaproveitar = False
+
+        with self._cond:
+            self._em_uso -= 1
+            if reaproveitar and len(self._livres) < self.maximo:
+                self._livres.append((conn, time.monotonic()))
+            else:
+                self._descartar(conn)
+            self._cond.notify()
+
+    def metricas(self):
+        with self._cond:
+            return {
+                "em_uso": self._em_uso,
+                "livres": len(self._livres),
+                "aguardando": self._aguardando,
+                "minimo": self.minimo,
+                "maximo": self.maximo,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "reconexoes": self._reconexoes,
+                "espera_media_ms": (self._espera_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "espera_max_ms": self._espera_max * 1000,
+            }
+
+
+class PooledConnection:
+    """
+    Conexão emprestada do pool. O close() devolve para o pool em vez de fechar o socket.
+    """
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return self._conn.cursor(*args, **kwargs)
+
+    def commit(self):
+        return self._conn.commit()
+
+    def rollback(self):
+        return self._conn.rollback()
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.devolver(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # Rede de segurança: página que esqueceu o close() não vaza conexão
+        try: self.close()
+        except Exception: pass
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+
 # =========================================================
-# O ESCUDO DE VELOCIDADE (TÚNEL VIP)
+# SQLITE EM MODO PRODUÇÃO (WAL + POOL DE CONEXÕES POR ARQUIVO)
 # =========================================================
-class CachedConnection:
+# WAL deixa os painéis lendo enquanto um lançamento está sendo gravado.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", SQLITE_BUSY_TIMEOUT_MS),
+    ("cache_size", -int(os.getenv("SQLITE_CACHE_KB", "20000"))),
+    ("mmap_size", int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))),
+    ("temp_store", "MEMORY"),
+)
+# Conexões paradas guardadas por arquivo; as que sobram além disso são fechadas na devolução
+SQLITE_POOL_MAX = int(os.getenv("SQLITE_POOL_MAX", "4"))
+
+
+class PoolSQLite:
+    """
+    Conexões abertas de um arquivo SQLite, reaproveitadas entre threads. Cada rerun do
+    Streamlit roda numa thread nova: em vez de abrir (e repetir os PRAGMAs) a cada uma,
+    a thread pega uma conexão parada, usa sozinha e devolve no close().
+    """
+    def __init__(self, nome_db, maximo=SQLITE_POOL_MAX):
+        self.nome_db = nome_db
+        self.maximo = max(1, int(maximo))
+        self._lock = threading.Lock()
+        self._livres = []
+
+    def _abrir(self):
+        if self.nome_db and not os.path.isabs(self.nome_db):
+            pasta = os.path.dirname(self.nome_db)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+        # Nunca é usada por duas threads ao mesmo tempo: sai do pool para uma só e volta
+        conn = sqlite3.connect(self.nome_db, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        for pragma, valor in SQLITE_PRAGMAS:
+            conn.execute(f"PRAGMA {pragma} = {valor}")
+        return conn
+
+    def obter(self):
+        with self._lock:
+            if self._livres:
+                return self._livres.pop()
+        return self._abrir()
+
+    def devolver(self, conn):
+        reaproveitar = True
+        try:
+            # Escrita sem commit seguraria o lock de escrita do arquivo para todo mundo
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            reaproveitar = False
+
+        with self._lock:
+            if reaproveitar and len(self._livres) < self.maximo:
+                self._livres.append(conn)
+                return
+        try: conn.close()
+        except Exception: pass
+
+
+class PooledSQLiteConnection:
     """
-    Intercepta o comando de fechar o banco. 
-    Mantém o túnel aberto na memória para não travar a nuvem.
+    Conexão SQLite emprestada do pool do arquivo. O close() devolve para o pool,
+    sem transação pendurada.
     """
-    def __init__(self, conn):
+    def __init__(self, pool, conn):
+        self._pool = pool
         self._conn = conn
 
     def cursor(self, *args, **kwargs):
@@ -23,9 +273,24 @@ class CachedConnection:
         return self._conn.rollback()
 
     def close(self):
-        pass # A MÁGICA: Ignora o comando de fechar!
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.devolver(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # Rede de segurança: página que esqueceu o close() não vaza conexão
+        try: self.close()
+        except Exception: pass
 
     def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
         return getattr(self._conn, name)
 
 def eh_postgres(db_ref: str) -> bool:
@@ -36,70 +301,598 @@ def eh_postgres(db_ref: str) -> bool:
 # =========================================================
 # CONEXÕES CACHEADAS DE ALTA PERFORMANCE
 # =========================================================
-@st.cache_resource(ttl=600, show_spinner=False)
-def _get_postgres_persistente(db_url):
-    import psycopg2
-    # Cria a conexão direta com o Neon e segura por 10 min
-    return psycopg2.connect(db_url, sslmode="require", connect_timeout=10)
+@st.cache_resource(show_spinner=False)
+def _get_pool_postgres(db_url):
+    # Um pool por URL e por processo, compartilhado por todas as sessões
+    return PoolConexoes(db_url)
 
 @st.cache_resource(show_spinner=False)
-def _get_sqlite_persistente(nome_db):
-    if nome_db and not os.path.isabs(nome_db):
-        pasta = os.path.dirname(nome_db)
-        if pasta:
-            os.makedirs(pasta, exist_ok=True)
-    return sqlite3.connect(nome_db, check_same_thread=False)
+def _get_pool_sqlite(nome_db):
+    # Um pool por arquivo e por processo
+    return PoolSQLite(nome_db)
 
 def conectar_banco(nome_db):
     if eh_postgres(nome_db):
-        conn_pg = _get_postgres_persistente(nome_db)
-        return CachedConnection(conn_pg), "postgres"
+        pool = _get_pool_postgres(nome_db)
+        return PooledConnection(pool, pool.obter()), "postgres"
     
-    conn_sqlite = _get_sqlite_persistente(nome_db)
-    return CachedConnection(conn_sqlite), "sqlite"
+    pool = _get_pool_sqlite(nome_db)
+    return PooledSQLiteConnection(pool, pool.obter()), "sqlite"
+
+def metricas_pool(nome_db):
+    """Retrato do pool (em uso, fila de espera, tempo de espera) para dimensionar DB_POOL_MAX."""
+    if not eh_postgres(nome_db):
+        return None
+    return _get_pool_postgres(nome_db).metricas()
 
 # =========================================================
-# INICIALIZAÇÃO E TABELAS
+# MIGRAÇÕES VERSIONADAS
 # =========================================================
-def inicializar_banco(nome_db):
-    conn, engine = conectar_banco(nome_db)
-    cursor = None
-    try:
-        cursor = conn.cursor()
+# Cada passo roda uma única vez por banco e fica anotado em schema_version.
+# Para mudar o schema, acrescente um passo novo no fim de MIGRACOES (nunca edite um antigo).
+def _colunas_sqlite(cursor, tabela):
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    return {linha[1] for linha in cursor.fetchall()}
+
+def _m001_tabelas_base(cursor, engine):
+    if engine == "postgres":
+        cursor.execute("CREATE TABLE IF NOT EXISTS accounts (id SERIAL PRIMARY KEY, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
+        cursor.execute("CREATE TABLE IF NOT EXISTS categories (id SERIAL PRIMARY KEY, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
+        cursor.execute("CREATE TABLE IF NOT EXISTS transactions (id SERIAL PRIMARY KEY, tipo TEXT NOT NULL, descricao TEXT NOT NULL, valor DOUBLE PRECISION NOT NULL, data_prevista DATE NOT NULL, data_real DATE, status TEXT NOT NULL, conta_id INTEGER, categoria_id INTEGER, usuario_dono TEXT DEFAULT 'danilo', FOREIGN KEY (conta_id) REFERENCES accounts(id), FOREIGN KEY (categoria_id) REFERENCES categories(id))")
+    else:
+        cursor.execute("CREATE TABLE IF NOT EXISTS accounts (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
+        cursor.execute("CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
+        cursor.execute("CREATE TABLE IF NOT EXISTS transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, descricao TEXT NOT NULL, valor REAL NOT NULL, data_prevista DATE NOT NULL, data_real DATE, status TEXT NOT NULL, conta_id INTEGER, categoria_id INTEGER, usuario_dono TEXT DEFAULT 'danilo', FOREIGN KEY (conta_id) REFERENCES accounts(id), FOREIGN KEY (categoria_id) REFERENCES categories(id))")
 
+def _m002_coluna_usuario_dono(cursor, engine):
+    # Bancos antigos foram criados antes do multiusuário
+    for t in ["accounts", "categories", "transactions"]:
         if engine == "postgres":
-            cursor.execute("CREATE TABLE IF NOT EXISTS accounts (id SERIAL PRIMARY KEY, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
-            cursor.execute("CREATE TABLE IF NOT EXISTS categories (id SERIAL PRIMARY KEY, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
-            cursor.execute("CREATE TABLE IF NOT EXISTS transactions (id SERIAL PRIMARY KEY, tipo TEXT NOT NULL, descricao TEXT NOT NULL, valor DOUBLE PRECISION NOT NULL, data_prevista DATE NOT NULL, data_real DATE, status TEXT NOT NULL, conta_id INTEGER, categoria_id INTEGER, usuario_dono TEXT DEFAULT 'danilo', FOREIGN KEY (conta_id) REFERENCES accounts(id), FOREIGN KEY (categoria_id) REFERENCES categories(id))")
-            
-            cursor.execute("ALTER TABLE accounts ADD COLUMN IF NOT EXISTS usuario_dono TEXT DEFAULT 'danilo'")
-            cursor.execute("ALTER TABLE categories ADD COLUMN IF NOT EXISTS usuario_dono TEXT DEFAULT 'danilo'")
-            cursor.execute("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS usuario_dono TEXT DEFAULT 'danilo'")
-            
-            cursor.execute("UPDATE accounts SET usuario_dono = 'danilo' WHERE usuario_dono IS NULL OR usuario_dono = ''")
-            cursor.execute("UPDATE categories SET usuario_dono = 'danilo' WHERE usuario_dono IS NULL OR usuario_dono = ''")
-            cursor.execute("UPDATE transactions SET usuario_dono = 'danilo' WHERE usuario_dono IS NULL OR usuario_dono = ''")
-            
-            # Índices para o Neon voar nas buscas
-            tabelas = ["accounts", "categories", "transactions"]
-            for t in tabelas:
-                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_usuario_dono ON {t} (usuario_dono)")
+            cursor.execute(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS usuario_dono TEXT DEFAULT 'danilo'")
+        elif "usuario_dono" not in _colunas_sqlite(cursor, t):
+            cursor.execute(f"ALTER TABLE {t} ADD COLUMN usuario_dono TEXT DEFAULT 'danilo'")
 
-        else:
-            cursor.execute("CREATE TABLE IF NOT EXISTS accounts (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
-            cursor.execute("CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, tipo TEXT NOT NULL, usuario_dono TEXT DEFAULT 'danilo')")
-            cursor.execute("CREATE TABLE IF NOT EXISTS transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, descricao TEXT NOT NULL, valor REAL NOT NULL, data_prevista DATE NOT NULL, data_real DATE, status TEXT NOT NULL, conta_id INTEGER, categoria_id INTEGER, usuario_dono TEXT DEFAULT 'danilo', FOREIGN KEY (conta_id) REFERENCES accounts(id), FOREIGN KEY (categoria_id) REFERENCES categories(id))")
-            
-            for t in ["accounts", "categories", "transactions"]:
-                try: cursor.execute(f"ALTER TABLE {t} ADD COLUMN usuario_dono TEXT DEFAULT 'danilo'")
-                except Exception: pass
-                cursor.execute(f"UPDATE {t} SET usuario_dono = 'danilo' WHERE usuario_dono IS NULL OR usuario_dono = ''")
+def _m003_preencher_usuario_dono(cursor, engine):
+    for t in ["accounts", "categories", "transactions"]:
+        cursor.execute(f"UPDATE {t} SET usuario_dono = 'danilo' WHERE usuario_dono IS NULL OR usuario_dono = ''")
+
+def _m004_indices_usuario_dono(cursor, engine):
+    # Índices para o Neon voar nas buscas
+    if engine == "postgres":
+        for t in ["accounts", "categories", "transactions"]:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_usuario_dono ON {t} (usuario_dono)")
+
+# Índices no formato das consultas reais: sempre usuario_dono + data/tipo, e as FKs dos JOINs
+INDICES_TRANSACTIONS = [
+    ("idx_transactions_dono_prevista", "usuario_dono, data_prevista", None),
+    ("idx_transactions_dono_tipo_prevista", "usuario_dono, tipo, data_prevista", None),
+    ("idx_transactions_dono_real_realizado", "usuario_dono, data_real", "status = 'Realizado'"),
+    ("idx_transactions_dono_id", "usuario_dono, id", None),
+    ("idx_transactions_conta", "conta_id", None),
+    ("idx_transactions_categoria", "categoria_id", None),
+]
+
+def criar_indices_transactions(cursor, tabela="transactions", sufixo=""):
+    for nome, colunas, where in INDICES_TRANSACTIONS:
+        filtro = f" WHERE {where}" if where else ""
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {nome}{sufixo} ON {tabela} ({colunas}){filtro}")
 
+def _m005_indices_compostos(cursor, engine):
+    criar_indices_transactions(cursor)
+    # O índice simples vira prefixo redundante dos compostos (só custaria escrita)
+    cursor.execute("DROP INDEX IF EXISTS idx_transactions_usuario_dono")
+    if engine == "sqlite":
+        for t in ["accounts", "categories"]:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_usuario_dono ON {t} (usuario_dono)")
+        cursor.execute("ANALYZE")
+
+def _m006_normalizar_tipo_status(cursor, engine):
+    # As somas no banco comparam texto exato; limpa os valores antigos digitados com espaço/caixa diferente
+    cursor.execute("UPDATE transactions SET tipo = TRIM(tipo) WHERE tipo <> TRIM(tipo)")
+    for status in ["Previsto", "Realizado"]:
+        ph = "%s" if engine == "postgres" else "?"
+        cursor.execute(
+            f"UPDATE transactions SET status = {ph} WHERE LOWER(TRIM(status)) = {ph} AND status <> {ph}",
+            (status, status.lower(), status),
+        )
+
+def _m007_indice_paginacao(cursor, engine):
+    # Paginação por chave (id < :cursor ORDER BY id DESC) do "Gerenciar Lançamentos"
+    criar_indices_transactions(cursor)
+    if engine == "sqlite":
+        cursor.execute("ANALYZE")
+
+# Preenchimento do resumo mensal e dos checkpoints a partir do razão. O SQL fica congelado
+# aqui (não vem do repository): cada migração precisa rodar igual contra o schema da época dela.
+def _sql_mes(engine, coluna):
+    return f"TO_CHAR({coluna}, 'YYYY-MM')" if engine == "postgres" else f"SUBSTR({coluna}, 1, 7)"
+
+def _sql_linhas_resumo(engine, valor):
+    return f"""
+        SELECT usuario_dono, 'prevista' AS base, {_sql_mes(engine, "data_prevista")} AS ano_mes, tipo, status,
+               COALESCE(categoria_id, 0) AS categoria_id, COALESCE(conta_id, 0) AS conta_id, {valor} AS valor
+        FROM transactions
+        UNION ALL
+        SELECT usuario_dono, 'real' AS base, {_sql_mes(engine, "data_real")} AS ano_mes, tipo, status,
+               COALESCE(categoria_id, 0) AS categoria_id, COALESCE(conta_id, 0) AS conta_id, {valor} AS valor
+        FROM transactions WHERE data_real IS NOT NULL
+    """
+
+def _preencher_resumo(cursor, engine, valor, total):
+    cursor.execute("DELETE FROM monthly_rollup")
+    cursor.execute(f"""
+        INSERT INTO monthly_rollup (usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id, {total}, quantidade)
+        SELECT usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id, SUM(valor), COUNT(*)
+        FROM ({_sql_linhas_resumo(engine, valor)}) m
+        GROUP BY usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id
+    """)
+
+def _preencher_saldos(cursor, engine, valor, saldo):
+    cursor.execute("DELETE FROM saldo_checkpoint")
+    cursor.execute(f"""
+        INSERT INTO saldo_checkpoint (usuario_dono, conta_id, base, mes, {saldo})
+        SELECT usuario_dono, conta_id, base, ano_mes,
+               SUM(liquido) OVER (PARTITION BY usuario_dono, conta_id, base ORDER BY ano_mes)
+        FROM (
+            SELECT usuario_dono, conta_id, base, ano_mes,
+                   SUM(CASE tipo WHEN 'Entrada' THEN valor WHEN 'Saída' THEN -valor ELSE 0 END) AS liquido
+            FROM ({_sql_linhas_resumo(engine, valor)}) m
+            GROUP BY usuario_dono, conta_id, base, ano_mes
+        ) l
+    """)
+
+def _m008_monthly_rollup(cursor, engine):
+    # Resumo mensal mantido pelas escritas do repository (somas por mês/tipo/status/categoria/conta)
+    tipo_total = "DOUBLE PRECISION" if engine == "postgres" else "REAL"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS monthly_rollup (
+            usuario_dono TEXT NOT NULL,
+            base TEXT NOT NULL,
+            ano_mes TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            status TEXT NOT NULL,
+            categoria_id INTEGER NOT NULL DEFAULT 0,
+            conta_id INTEGER NOT NULL DEFAULT 0,
+            total {tipo_total} NOT NULL DEFAULT 0,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id)
+        )
+    """)
+    _preencher_resumo(cursor, engine, "valor", "total")
+
+def _m009_saldo_checkpoint(cursor, engine):
+    # Saldo acumulado por conta ao fim de cada mês com movimento (abertura instantânea do fluxo de caixa)
+    tipo_saldo = "DOUBLE PRECISION" if engine == "postgres" else "REAL"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS saldo_checkpoint (
+            usuario_dono TEXT NOT NULL,
+            base TEXT NOT NULL,
+            conta_id INTEGER NOT NULL DEFAULT 0,
+            mes TEXT NOT NULL,
+            saldo {tipo_saldo} NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_dono, base, conta_id, mes)
+        )
+    """)
+    _preencher_saldos(cursor, engine, "valor", "saldo")
+
+def _m010_data_version(cursor, engine):
+    # Contador de escritas por usuário: entra na chave do cache de leituras do repository
+    cursor.execute("CREATE TABLE IF NOT EXISTS data_version (usuario_dono TEXT PRIMARY KEY, versao BIGINT NOT NULL DEFAULT 0)")
+
+def _m011_audit_log(cursor, engine):
+    # O CREATE antigo da página usava AUTOINCREMENT, que o Postgres não aceita: lá a auditoria nunca gravou
+    if engine == "postgres":
+        cursor.execute("CREATE TABLE IF NOT EXISTS audit_log (id BIGSERIAL PRIMARY KEY, data_hora TIMESTAMP NOT NULL, usuario TEXT, acao TEXT NOT NULL, detalhes TEXT)")
+    else:
+        cursor.execute("CREATE TABLE IF NOT EXISTS audit_log (id INTEGER PRIMARY KEY AUTOINCREMENT, data_hora TEXT, usuario TEXT, acao TEXT, detalhes TEXT)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_usuario_data ON audit_log (usuario, data_hora)")
+
+# Ordem das colunas de transactions ao recriar a tabela no SQLite sem DROP COLUMN (< 3.35)
+_COLUNAS_TRANSACTIONS_CENTAVOS = "id, tipo, descricao, valor_centavos, data_prevista, data_real, status, conta_id, categoria_id, usuario_dono"
+
+def _m012_valor_em_centavos(cursor, engine):
+    # Dinheiro em centavos inteiros: somas exatas no banco e no pandas (int64), sem resíduo de float.
+    # O resumo mensal e os checkpoints são derivados: recriados já em centavos a partir do razão.
+    if engine == "postgres":
+        cursor.execute("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS valor_centavos BIGINT")
+        cursor.execute("UPDATE transactions SET valor_centavos = ROUND(valor::NUMERIC * 100)::BIGINT WHERE valor_centavos IS NULL")
+        cursor.execute("ALTER TABLE transactions ALTER COLUMN valor_centavos SET NOT NULL")
+        cursor.execute("ALTER TABLE transactions DROP COLUMN valor")
+    elif sqlite3.sqlite_version_info >= (3, 35, 0):
+        cursor.execute("ALTER TABLE transactions ADD COLUMN valor_centavos BIGINT NOT NULL DEFAULT 0")
+        cursor.execute("UPDATE transactions SET valor_centavos = CAST(ROUND(valor * 100) AS INTEGER)")
+        cursor.execute("ALTER TABLE transactions DROP COLUMN valor")
+    else:
+        cursor.execute("CREATE TABLE transactions_nova (id INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, descricao TEXT NOT NULL, valor_centavos BIGINT NOT NULL, data_prevista DATE NOT NULL, data_real DATE, status TEXT NOT NULL, conta_id INTEGER, categoria_id INTEGER, usuario_dono TEXT DEFAULT 'danilo', FOREIGN KEY (conta_id) REFERENCES accounts(id), FOREIGN KEY (categoria_id) REFERENCES categories(id))")
+        cursor.execute(f"""
+            INSERT INTO transactions_nova ({_COLUNAS_TRANSACTIONS_CENTAVOS})
+            SELECT {_COLUNAS_TRANSACTIONS_CENTAVOS.replace("valor_centavos", "CAST(ROUND(valor * 100) AS INTEGER)")} FROM transactions
+        """)
+        cursor.execute("DROP TABLE transactions")
+        cursor.execute("ALTER TABLE transactions_nova RENAME TO transactions")
+        criar_indices_transactions(cursor)
+
+    cursor.execute("DROP TABLE IF EXISTS monthly_rollup")
+    cursor.execute("""
+        CREATE TABLE monthly_rollup (
+            usuario_dono TEXT NOT NULL,
+            base TEXT NOT NULL,
+            ano_mes TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            status TEXT NOT NULL,
+            categoria_id INTEGER NOT NULL DEFAULT 0,
+            conta_id INTEGER NOT NULL DEFAULT 0,
+            total_centavos BIGINT NOT NULL DEFAULT 0,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id)
+        )
+    """)
+    cursor.execute("DROP TABLE IF EXISTS saldo_checkpoint")
+    cursor.execute("""
+        CREATE TABLE saldo_checkpoint (
+            usuario_dono TEXT NOT NULL,
+            base TEXT NOT NULL,
+            conta_id INTEGER NOT NULL DEFAULT 0,
+            mes TEXT NOT NULL,
+            saldo_centavos BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_dono, base, conta_id, mes)
+        )
+    """)
+    _preencher_resumo(cursor, engine, "valor_centavos", "total_centavos")
+    _preencher_saldos(cursor, engine, "valor_centavos", "saldo_centavos")
+
+def _m013_normalizar_textos(cursor, engine):
+    # Texto já gravado limpo (sem quebra de linha/tabulação, sem espaço nas pontas), como o
+    # repository.normalizar_texto faz nas escritas: as telas não precisam limpar a cada leitura
+    char = "CHR" if engine == "postgres" else "CHAR"
+    for tabela, coluna in [("transactions", "descricao"), ("accounts", "nome"), ("categories", "nome")]:
+        limpo = f"TRIM(REPLACE(REPLACE(REPLACE({coluna}, {char}(13), ' '), {char}(10), ' '), {char}(9), ' '))"
+        cursor.execute(f"UPDATE {tabela} SET {coluna} = {limpo} WHERE {coluna} <> {limpo}")
+
+MIGRACOES = [
+    (1, "tabelas_base", _m001_tabelas_base),
+    (2, "coluna_usuario_dono", _m002_coluna_usuario_dono),
+    (3, "preencher_usuario_dono", _m003_preencher_usuario_dono),
+    (4, "indices_usuario_dono", _m004_indices_usuario_dono),
+    (5, "indices_compostos_transactions", _m005_indices_compostos),
+    (6, "normalizar_tipo_status", _m006_normalizar_tipo_status),
+    (7, "indice_paginacao_transactions", _m007_indice_paginacao),
+    (8, "monthly_rollup", _m008_monthly_rollup),
+    (9, "saldo_checkpoint", _m009_saldo_checkpoint),
+    (10, "data_version", _m010_data_version),
+    (11, "audit_log", _m011_audit_log),
+    (12, "valor_em_centavos", _m012_valor_em_centavos),
+    (13, "normalizar_textos", _m013_normalizar_textos),
+]
+
+# Chave arbitrária do advisory lock: só um processo migra o Postgres por vez
+_PG_LOCK_MIGRACOES = 7310451
+
+def _versoes_aplicadas(cursor):
+    cursor.execute("SELECT versao FROM schema_version")
+    return {int(linha[0]) for linha in cursor.fetchall()}
+
+def aplicar_migracoes(conn, engine):
+    """Aplica, em ordem e cada uma na sua transação, as migrações que faltam neste banco."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (versao INTEGER PRIMARY KEY, nome TEXT NOT NULL, aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+        conn.commit()
+
+        aplicadas = _versoes_aplicadas(cursor)
         conn.commit()
+
+        for versao, nome, passo in MIGRACOES:
+            if versao in aplicadas:
+                continue
+
+            if engine == "postgres":
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_PG_LOCK_MIGRACOES,))
+            else:
+                cursor.execute("BEGIN IMMEDIATE")
+
+            # Outro processo pode ter aplicado enquanto esperávamos o lock
+            if versao in _versoes_aplicadas(cursor):
+                conn.commit()
+                continue
+
+            passo(cursor, engine)
+            ph = "%s" if engine == "postgres" else "?"
+            cursor.execute(f"INSERT INTO schema_version (versao, nome) VALUES ({ph}, {ph})", (versao, nome))
+            conn.commit()
     except Exception:
         try: conn.rollback()
         except Exception: pass
+        raise
     finally:
-        if cursor:
-            try: cursor.close()
-            except Exception: pass
+        try: cursor.close()
+        except Exception: pass
+
+# =========================================================
+# CHECAGEM DOS PLANOS (EXPLAIN) DAS CONSULTAS QUENTES
+# =========================================================
+# (nome, sql com "?", parâmetros, índice que o plano precisa usar)
+CONSULTAS_QUENTES = [
+    ("lancamentos_do_mes",
+     "SELECT id, valor_centavos FROM transactions WHERE usuario_dono = ? AND data_prevista >= ? AND data_prevista < ?",
+     ("danilo", "2024-01-01", "2024-02-01"), "idx_transactions_dono_prevista"),
+    ("contas_do_mes_por_tipo",
+     "SELECT id, valor_centavos FROM transactions WHERE usuario_dono = ? AND tipo = ? AND data_prevista >= ? AND data_prevista < ?",
+     ("danilo", "Saída", "2024-01-01", "2024-02-01"), "idx_transactions_dono_tipo_prevista"),
+    ("realizado_do_mes",
+     "SELECT id, valor_centavos FROM transactions WHERE usuario_dono = ? AND status = 'Realizado' AND data_real >= ? AND data_real < ?",
+     ("danilo", "2024-01-01", "2024-02-01"), "idx_transactions_dono_real_realizado"),
+    ("pagina_de_lancamentos",
+     "SELECT id FROM transactions WHERE usuario_dono = ? AND id < ? ORDER BY id DESC LIMIT 50",
+     ("danilo", 1000), "idx_transactions_dono_id"),
+    ("lancamentos_da_conta",
+     "SELECT id FROM transactions WHERE conta_id = ?",
+     (1,), "idx_transactions_conta"),
+    ("lancamentos_da_categoria",
+     "SELECT id FROM transactions WHERE categoria_id = ?",
+     (1,), "idx_transactions_categoria"),
+]
+
+def verificar_indices(nome_db):
+    """
+    Roda EXPLAIN em cada consulta quente e diz se o índice esperado aparece no plano.
+    Retorna [(nome, ok, plano)]. No Postgres o seq scan é desligado só dentro da checagem,
+    porque em tabela pequena o planejador prefere varrer mesmo tendo o índice.
+    """
+    conn, engine = conectar_banco(nome_db)
+    cursor = conn.cursor()
+    resultado = []
+    try:
+        for nome, sql, params, indice in CONSULTAS_QUENTES:
+            aceitos = [indice]
+            if engine == "postgres":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql.replace("?", "%s"), params)
+                plano = "\n".join(linha[0] for linha in cursor.fetchall())
+                # Com transactions particionada o plano cita o índice de cada partição
+                cursor.execute("""
+                    SELECT f.relname FROM pg_inherits h
+                    JOIN pg_class f ON f.oid = h.inhrelid
+                    WHERE h.inhparent = to_regclass(%s)
+                """, (indice,))
+                aceitos += [linha[0] for linha in cursor.fetchall()]
+            else:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plano = "\n".join(str(linha[-1]) for linha in cursor.fetchall())
+            resultado.append((nome, any(nome_indice in plano for nome_indice in aceitos), plano))
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+    return resultado
+
+# =========================================================
+# PARTICIONAMENTO DE transactions (POSTGRES, OPCIONAL)
+# =========================================================
+# No banco compartilhado todos os clientes dividem a mesma transactions. O layout
+# particionado é opcional: partição própria (LIST por usuario_dono) para os clientes
+# grandes e uma default para o resto, ou partições por ano (RANGE em data_prevista).
+# Como toda consulta já filtra usuario_dono e/ou data_prevista, o Postgres poda as
+# partições sozinho; nenhuma página muda.
+#
+# A conversão é online: um gatilho anota os ids alterados enquanto a cópia roda em
+# lotes, o delta é reaplicado e a troca de nomes acontece num lock curto no final.
+# A tabela antiga fica como transactions_antiga (apague depois de conferir).
+PARTICIONAR_LOTE = int(os.getenv("DB_PARTICIONAR_LOTE", "50000"))
+PARTICIONAR_LOCK_TIMEOUT = os.getenv("DB_PARTICIONAR_LOCK_TIMEOUT", "10s")
+
+_CHAVE_PARTICAO = {"usuario": ("LIST", "usuario_dono"), "ano": ("RANGE", "data_prevista")}
+
+def _nome_particao(valor):
+    sufixo = re.sub(r"[^a-z0-9]+", "_", str(valor).lower()).strip("_")
+    return f"transactions_p_{sufixo or 'vazio'}"
+
+def _estrategia_particao(cursor):
+    """'l' (lista), 'r' (faixa) ou None se transactions não é particionada."""
+    cursor.execute(
+        "SELECT p.partstrat FROM pg_partitioned_table p WHERE p.partrelid = to_regclass('transactions')"
+    )
+    linha = cursor.fetchone()
+    return linha[0] if linha else None
+
+def _criar_particao(cursor, tabela, estrategia, valor):
+    nome = _nome_particao(valor)
+    if estrategia == "l":
+        cursor.execute(f"CREATE TABLE {nome} PARTITION OF {tabela} FOR VALUES IN (%s)", (str(valor),))
+    else:
+        ano = int(valor)
+        cursor.execute(
+            f"CREATE TABLE {nome} PARTITION OF {tabela} FOR VALUES FROM (%s) TO (%s)",
+            (f"{ano}-01-01", f"{ano + 1}-01-01"),
+        )
+    return nome
+
+def _aplicar_delta(cursor):
+    cursor.execute("DELETE FROM transactions_delta RETURNING id")
+    ids = sorted({int(linha[0]) for linha in cursor.fetchall()})
+    if ids:
+        cursor.execute("DELETE FROM transactions_nova WHERE id = ANY(%s)", (ids,))
+        cursor.execute("INSERT INTO transactions_nova SELECT * FROM transactions WHERE id = ANY(%s)", (ids,))
+    return len(ids)
+
+def particionar_transactions(nome_db, por="usuario", usuarios=(), anos=None, lote=PARTICIONAR_LOTE, apagar_antiga=False, progresso=None):
+    """
+    Converte transactions para o layout particionado, sem parar o app.
+    por="usuario": uma partição por nome em usuarios + default.
+    por="ano": uma partição por ano em anos=(primeiro, ultimo) (padrão: os anos com dados) + default.
+    """
+    if por not in _CHAVE_PARTICAO:
+        raise ValueError(f"Particionamento desconhecido: {por} (use 'usuario' ou 'ano')")
+    avisar = progresso or (lambda texto: None)
+
+    conn, engine = conectar_banco(nome_db)
+    if engine != "postgres":
+        conn.close()
+        raise ValueError("Particionamento só existe no Postgres.")
+    cursor = conn.cursor()
+    try:
+        if _estrategia_particao(cursor):
+            raise ValueError("transactions já está particionada.")
+
+        # Sobras de uma tentativa interrompida
+        cursor.execute("DROP TRIGGER IF EXISTS transactions_delta ON transactions")
+        cursor.execute("DROP TABLE IF EXISTS transactions_delta, transactions_nova CASCADE")
+        conn.commit()
+
+        metodo, coluna = _CHAVE_PARTICAO[por]
+        cursor.execute(f"CREATE TABLE transactions_nova (LIKE transactions INCLUDING DEFAULTS) PARTITION BY {metodo} ({coluna})")
+        cursor.execute(f"ALTER TABLE transactions_nova ADD CONSTRAINT transactions_nova_pkey PRIMARY KEY (id, {coluna})")
+        cursor.execute("ALTER TABLE transactions_nova ADD CONSTRAINT transactions_conta_id_fkey FOREIGN KEY (conta_id) REFERENCES accounts(id)")
+        cursor.execute("ALTER TABLE transactions_nova ADD CONSTRAINT transactions_categoria_id_fkey FOREIGN KEY (categoria_id) REFERENCES categories(id)")
+
+        if por == "usuario":
+            valores = list(dict.fromkeys(u.strip() for u in usuarios if u and u.strip()))
+        else:
+            if anos is None:
+                cursor.execute("SELECT EXTRACT(YEAR FROM MIN(data_prevista)), EXTRACT(YEAR FROM MAX(data_prevista)) FROM transactions")
+                primeiro, ultimo = cursor.fetchone()
+                anos = (int(primeiro), int(ultimo)) if primeiro is not None else ()
+            valores = list(range(anos[0], anos[1] + 1)) if anos else []
+        nomes = [_nome_particao(v) for v in valores]
+        if len(set(nomes + ["transactions_p_default"])) != len(nomes) + 1:
+            raise ValueError("Dois valores geram o mesmo nome de partição; ajuste a lista.")
+        for valor in valores:
+            _criar_particao(cursor, "transactions_nova", "l" if por == "usuario" else "r", valor)
+        cursor.execute("CREATE TABLE transactions_p_default PARTITION OF transactions_nova DEFAULT")
+        criar_indices_transactions(cursor, "transactions_nova", sufixo="_nova")
+
+        # A partir daqui toda escrita na tabela atual fica anotada para ser reaplicada
+        cursor.execute("CREATE TABLE transactions_delta (id INTEGER NOT NULL)")
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION transactions_anotar_delta() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO transactions_delta (id) VALUES (OLD.id);
+                ELSE
+                    INSERT INTO transactions_delta (id) VALUES (NEW.id);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute("""
+            CREATE TRIGGER transactions_delta AFTER INSERT OR UPDATE OR DELETE ON transactions
+            FOR EACH ROW EXECUTE FUNCTION transactions_anotar_delta()
+        """)
+        conn.commit()
+        avisar(f"{len(valores) + 1} partição(ões) criada(s); copiando os lançamentos...")
+
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM transactions")
+        maior_id = int(cursor.fetchone()[0])
+        conn.commit()
+        for inicio in range(0, maior_id, lote):
+            cursor.execute(
+                "INSERT INTO transactions_nova SELECT * FROM transactions WHERE id > %s AND id <= %s",
+                (inicio, inicio + lote),
+            )
+            conn.commit()
+            avisar(f"copiados até o id {min(inicio + lote, maior_id)} de {maior_id}")
+
+        # Reaplica o que mudou durante a cópia até sobrar pouco para o lock final
+        for _ in range(10):
+            pendentes = _aplicar_delta(cursor)
+            conn.commit()
+            if pendentes < 1000:
+                break
+
+        cursor.execute("SELECT pg_get_serial_sequence('transactions', 'id')")
+        sequencia = cursor.fetchone()[0]
+
+        cursor.execute(f"SET LOCAL lock_timeout = '{PARTICIONAR_LOCK_TIMEOUT}'")
+        cursor.execute("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE")
+        _aplicar_delta(cursor)
+        cursor.execute("DROP TRIGGER transactions_delta ON transactions")
+        cursor.execute("DROP FUNCTION transactions_anotar_delta()")
+        cursor.execute("DROP TABLE transactions_delta")
+
+        cursor.execute("ALTER TABLE transactions RENAME TO transactions_antiga")
+        cursor.execute("ALTER INDEX IF EXISTS transactions_pkey RENAME TO transactions_antiga_pkey")
+        for nome, _, _ in INDICES_TRANSACTIONS:
+            cursor.execute(f"ALTER INDEX IF EXISTS {nome} RENAME TO {nome}_antiga")
+            cursor.execute(f"ALTER INDEX {nome}_nova RENAME TO {nome}")
+        cursor.execute("ALTER TABLE transactions_nova RENAME TO transactions")
+        cursor.execute("ALTER INDEX transactions_nova_pkey RENAME TO transactions_pkey")
+        if sequencia:
+            # Sem isso, apagar a tabela antiga levaria junto a sequência dos ids
+            cursor.execute(f"ALTER SEQUENCE {sequencia} OWNED BY transactions.id")
+        conn.commit()
+
+        cursor.execute("ANALYZE transactions")
+        conn.commit()
+        if apagar_antiga:
+            cursor.execute("DROP TABLE transactions_antiga")
+            conn.commit()
+        avisar("transactions particionada" + ("." if apagar_antiga else "; a cópia antiga ficou em transactions_antiga."))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def criar_particao(nome_db, valor):
+    """
+    Nova partição numa transactions já particionada: um cliente (layout por usuário) ou um
+    ano (layout por ano). As linhas que estavam na default são movidas para ela.
+    """
+    conn, engine = conectar_banco(nome_db)
+    if engine != "postgres":
+        conn.close()
+        raise ValueError("Particionamento só existe no Postgres.")
+    cursor = conn.cursor()
+    try:
+        estrategia = _estrategia_particao(cursor)
+        if estrategia is None:
+            raise ValueError("transactions não está particionada (rode particionar_transactions antes).")
+
+        cursor.execute(f"SET LOCAL lock_timeout = '{PARTICIONAR_LOCK_TIMEOUT}'")
+        cursor.execute("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("ALTER TABLE transactions DETACH PARTITION transactions_p_default")
+        nome = _criar_particao(cursor, "transactions", estrategia, valor)
+        if estrategia == "l":
+            filtro, params = "usuario_dono = %s", (str(valor),)
+        else:
+            filtro, params = "data_prevista >= %s AND data_prevista < %s", (f"{int(valor)}-01-01", f"{int(valor) + 1}-01-01")
+        cursor.execute(f"INSERT INTO {nome} SELECT * FROM transactions_p_default WHERE {filtro}", params)
+        movidas = cursor.rowcount
+        cursor.execute(f"DELETE FROM transactions_p_default WHERE {filtro}", params)
+        cursor.execute("ALTER TABLE transactions ATTACH PARTITION transactions_p_default DEFAULT")
+        conn.commit()
+        return nome, movidas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+# =========================================================
+# INICIALIZAÇÃO (UMA VEZ POR PROCESSO E POR BANCO)
+# =========================================================
+_bancos_prontos = set()
+_lock_inicializacao = threading.Lock()
+
+def inicializar_banco(nome_db):
+    if nome_db in _bancos_prontos:
+        return
+
+    with _lock_inicializacao:
+        if nome_db in _bancos_prontos:
+            return
+
+        conn, engine = conectar_banco(nome_db)
+        try:
+            aplicar_migracoes(conn, engine)
+            _bancos_prontos.add(nome_db)
+        except Exception:
+            # Sem marcar como pronto: a próxima carga de página tenta de novo.
+            # A URL do Postgres leva a senha, por isso não vai para o log.
+            _log.exception("Falha ao migrar o banco %s", "Postgres" if eh_postgres(nome_db) else nome_db)
+            raise
+        finally:
+            conn.close()
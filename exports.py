@@ -0,0 +1,93 @@
+"""
+Exportação CSV/Excel sob demanda.
+
+O arquivo só é montado quando alguém clica em "Gerar arquivo" (antes, cada rerun das
+páginas gerava o CSV e uma planilha inteira do openpyxl mesmo sem ninguém baixar). Os
+bytes ficam em cache por (banco, usuário, tela, filtros, versão dos dados, formato):
+gerar de novo o mesmo recorte sem nada ter mudado não refaz o trabalho. O Excel é escrito
+em modo write_only do openpyxl, linha a linha, sem montar a planilha em memória.
+"""
+import io
+import os
+
+import streamlit as st
+
+from repository import CACHE_TTL, versao_dados
+
+EXPORT_CACHE_MAX = int(os.getenv("EXPORT_CACHE_MAX", "32"))
+
+# formato -> (extensão, mime)
+FORMATOS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+# =========================================================
+# GERAÇÃO
+# =========================================================
+def _csv(df):
+    return df.to_csv(index=False, sep=";").encode("utf-8")
+
+
+def _xlsx(df, aba):
+    # Import tardio: openpyxl só é carregado quando alguém gera uma planilha
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet(title=aba[:31])
+    planilha.append([str(c) for c in df.columns])
+    # object + None: o openpyxl não conhece NaN/NaT nem category
+    valores = df.astype(object).where(df.notna(), None)
+    for linha in valores.itertuples(index=False, name=None):
+        planilha.append(linha)
+    buffer = io.BytesIO()
+    livro.save(buffer)
+    return buffer.getvalue()
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=EXPORT_CACHE_MAX, show_spinner=False)
+def _arquivo(db_ref, usuario, chave, filtros, versao, formato, aba, _montar):
+    # _montar fica fora da chave do cache (o st.cache_data ignora argumentos com "_")
+    df = _montar()
+    return _xlsx(df, aba) if formato == "Excel" else _csv(df)
+
+
+# =========================================================
+# API
+# =========================================================
+def exportacao(db_ref, usuario, chave, filtros, montar, nome_arquivo, aba):
+    """
+    Formato + "Gerar arquivo" + botão de download, em uma linha.
+    montar() devolve o DataFrame a exportar e só roda no clique (e se não estiver no cache).
+    filtros: tudo o que muda o conteúdo além dos dados gravados (mês, busca, hoje...).
+    """
+    filtros = tuple(filtros)
+    versao = versao_dados(db_ref, usuario)
+    chave_pedido = f"{chave}_pedido"
+
+    c1, c2, c3 = st.columns([1, 1, 1])
+    with c1:
+        formato = st.selectbox("Formato", options=list(FORMATOS), key=f"{chave}_formato", label_visibility="collapsed")
+    assinatura = (db_ref, usuario, filtros, versao, formato)
+    with c2:
+        if st.button("Gerar arquivo", key=f"{chave}_gerar", use_container_width=True):
+            st.session_state[chave_pedido] = assinatura
+
+    # Filtro, formato ou dados mudaram depois do clique: o arquivo gerado não vale mais
+    if st.session_state.get(chave_pedido) != assinatura:
+        return
+
+    try:
+        with st.spinner("Gerando arquivo..."):
+            dados = _arquivo(db_ref, usuario, chave, filtros, versao, formato, aba, montar)
+    except ImportError:
+        st.warning("Para baixar Excel: pip install openpyxl")
+        return
+
+    extensao, mime = FORMATOS[formato]
+    with c3:
+        st.download_button(
+            f"Baixar {formato}", data=dados, file_name=f"{nome_arquivo}.{extensao}", mime=mime,
+            use_container_width=True, key=f"{chave}_baixar",
+        )
@@ -0,0 +1,71 @@
+"""
+Formatação para a tela: moeda em reais, rótulos de status e as cores das pílulas das tabelas.
+
+A moeda tem a versão de um valor (cards, textos) e a versão _serie, que trata a coluna
+inteira de uma vez com os kernels do pyarrow (que já vem com o streamlit); o status sai
+por coluna com np.select. Nada de .apply linha a linha. Dinheiro chega em centavos inteiros.
+Comparativo de desempenho: python benchmarks/bench_formatting.py
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# =========================================================
+# MOEDA
+# =========================================================
+def fmt_brl(centavos) -> str:
+    """123456 -> 'R$ 1.234,56' (inválido/vazio vira 'R$ 0,00')."""
+    try:
+        centavos = int(centavos)
+    except (TypeError, ValueError):
+        return "R$ 0,00"
+    reais, resto = divmod(abs(centavos), 100)
+    sinal = "-" if centavos < 0 else ""
+    return f"R$ {sinal}{reais:,}".replace(",", ".") + f",{resto:02d}"
+
+
+def fmt_brl_serie(centavos: pd.Series) -> pd.Series:
+    """Mesmo texto de fmt_brl para a Series inteira (mesmo índice)."""
+    valores = pd.to_numeric(centavos, errors="coerce").fillna(0).to_numpy(dtype="int64")
+    absoluto = np.abs(valores)
+    reais = absoluto // 100
+
+    # Somar 10^(3 * grupos) faz o texto já sair com zeros à esquerda na largura certa
+    # ("1" + dígitos); daí é fatiar de 3 em 3, juntar com "." e tirar os zeros da frente
+    grupos = max(1, -(-len(str(int(reais.max(initial=0)))) // 3))
+    digitos = pc.cast(pa.array(reais + 10 ** (3 * grupos)), pa.string())
+    partes = [pc.utf8_slice_codeunits(digitos, 1 + 3 * i, 4 + 3 * i) for i in range(grupos)]
+    texto_reais = pc.ascii_ltrim(pc.binary_join_element_wise(*partes, "."), characters="0.")
+    texto_reais = pc.if_else(pc.equal(texto_reais, ""), "0", texto_reais)
+
+    texto_centavos = pc.utf8_slice_codeunits(pc.cast(pa.array(absoluto % 100 + 100), pa.string()), 1, 3)
+    prefixo = pc.if_else(pa.array(valores < 0), "R$ -", "R$ ")
+    texto = pc.binary_join_element_wise(prefixo, texto_reais, ",", texto_centavos, "")
+    return pd.Series(pd.array(texto, dtype="str"), index=centavos.index)
+
+
+# =========================================================
+# STATUS
+# =========================================================
+_VERMELHO = "#FF4B4B"
+_VERDE = "#00CC96"
+_AMARELO = "#F9C74F"
+
+# Cores das pílulas do st.dataframe (components.tabela_paginada)
+CORES_STATUS = {"Atrasado": _VERMELHO, "Realizado": _VERDE, "Previsto": _AMARELO}
+CORES_TIPO = {"Entrada": _VERDE, "Saída": _VERMELHO}
+CORES_RECEBER = {"Recebido": _VERDE, "Atrasado": _VERMELHO, "Recebe em 7 dias": _AMARELO, "A receber": _AMARELO}
+
+
+def _codigo_status(status, atrasado):
+    # 0 = Atrasado, 1 = Realizado, 2 = Previsto (mesma ordem de CORES_STATUS)
+    return np.select(
+        [atrasado.to_numpy(dtype=bool), (status == "Realizado").to_numpy(dtype=bool)], [0, 1], default=2,
+    )
+
+
+def status_serie(status: pd.Series, atrasado: pd.Series) -> pd.Series:
+    """Rótulo Atrasado/Realizado/Previsto (category) para as tabelas e exportações."""
+    return pd.Series(pd.Categorical.from_codes(_codigo_status(status, atrasado), categories=list(CORES_STATUS)), index=status.index)
+
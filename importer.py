@@ -0,0 +1,264 @@
+"""
+Leitura de extratos bancários (OFX, CSV e XLSX) para importação em lote.
+
+Os leitores percorrem o arquivo linha a linha (o XLSX em modo read_only do openpyxl),
+então um extrato de um ano inteiro não vira uma cópia gigante em memória antes de
+chegar na prévia. Cada leitor produz dicts {data, descricao, valor, id_externo} com o
+valor já com sinal (positivo = entrada, negativo = saída).
+"""
+import csv
+import io
+import re
+import unicodedata
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+
+EXTENSOES = ["ofx", "csv", "xlsx"]
+
+# Quantas linhas do topo procurar pelo cabeçalho (bancos costumam pôr título/agência antes)
+LINHAS_PROCURA_CABECALHO = 30
+
+
+class ExtratoInvalido(Exception):
+    """O arquivo não pôde ser lido como extrato (formato ou colunas não reconhecidos)."""
+
+
+# =========================================================
+# CONVERSÕES
+# =========================================================
+def _sem_acento(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _numero(valor):
+    """'1.234,56', '-1234.56', '(12,50)', 'R$ 99,90 D' -> float com sinal; None se vazio."""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    s = str(valor).strip().upper()
+    if not s:
+        return None
+    negativo = s.startswith("-") or (s.startswith("(") and s.endswith(")")) or s.endswith("D")
+    s = re.sub(r"[^\d,.]", "", s)
+    if not s:
+        return None
+    if "," in s and "." in s:
+        decimal = "," if s.rfind(",") > s.rfind(".") else "."
+        s = s.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    elif "," in s:
+        s = s.replace(",", ".") if s.count(",") == 1 else s.replace(",", "")
+    elif s.count(".") > 1 or (s.count(".") == 1 and len(s.split(".")[1]) == 3):
+        s = s.replace(".", "")
+    try:
+        numero = float(s)
+    except ValueError:
+        return None
+    return -numero if negativo else numero
+
+
+_FORMATOS_DATA = ["%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%Y%m%d"]
+
+
+def _data(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    s = str(valor).strip()
+    if not s:
+        return None
+    # OFX: AAAAMMDD[HHMMSS[.xxx]][[-3:BRT]]
+    if re.match(r"^\d{8}", s) and not re.match(r"^\d{8}\d*[/.-]", s):
+        s = s[:8]
+    else:
+        s = s.split(" ")[0].split("T")[0]
+    for formato in _FORMATOS_DATA:
+        try:
+            return datetime.strptime(s, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _codificacao(amostra):
+    """utf-8 (com ou sem BOM) quando a amostra decodifica; senão cp1252, o padrão dos bancos."""
+    try:
+        amostra.decode("utf-8")
+    except UnicodeDecodeError as erro:
+        # Caractere multibyte cortado no fim da amostra ainda é utf-8
+        if erro.start < len(amostra) - 3:
+            return "cp1252"
+    return "utf-8-sig"
+
+
+@contextmanager
+def _texto(arquivo):
+    amostra = arquivo.read(64 * 1024)
+    arquivo.seek(0)
+    texto = io.TextIOWrapper(arquivo, encoding=_codificacao(amostra), errors="replace", newline="")
+    try:
+        yield texto
+    finally:
+        # Solta o binário sem fechá-lo (o arquivo é de quem chamou)
+        texto.detach()
+
+
+# =========================================================
+# OFX
+# =========================================================
+_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+
+def _linhas_ofx(arquivo):
+    atual = None
+    with _texto(arquivo) as texto:
+        for linha in texto:
+            for fecha, tag, valor in _TAG_OFX.findall(linha):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if fecha and atual is not None:
+                        yield _transacao_ofx(atual)
+                        atual = None
+                    elif not fecha:
+                        atual = {}
+                elif atual is not None and not fecha:
+                    atual[tag] = valor.strip()
+    if atual:
+        yield _transacao_ofx(atual)
+
+
+def _transacao_ofx(campos):
+    descricao = campos.get("MEMO") or campos.get("NAME") or campos.get("TRNTYPE") or ""
+    return {
+        "data": _data(campos.get("DTPOSTED")),
+        "descricao": descricao,
+        "valor": _numero(campos.get("TRNAMT")),
+        "id_externo": campos.get("FITID") or None,
+    }
+
+
+# =========================================================
+# CSV / XLSX (TABELAS)
+# =========================================================
+_PAPEIS = {
+    "data": ["data", "date", "dt"],
+    "descricao": ["descricao", "historico", "lancamento", "memo", "description", "detalhe", "estabelecimento"],
+    "valor": ["valor", "amount", "value", "quantia"],
+    "credito": ["credit", "entrada", "receita"],
+    "debito": ["debit", "saida", "despesa"],
+    "id_externo": ["documento", "fitid", "id", "identificador"],
+}
+
+
+def _mapear_cabecalho(celulas):
+    """Índice da coluna de cada papel, ou None se a linha não parece um cabeçalho de extrato."""
+    nomes = [re.sub(r"[^a-z0-9]", "", _sem_acento(c).lower()) if c is not None else "" for c in celulas]
+    mapa = {}
+    for papel, candidatos in _PAPEIS.items():
+        for i, nome in enumerate(nomes):
+            if nome and i not in mapa.values() and any(nome.startswith(c) for c in candidatos):
+                mapa[papel] = i
+                break
+    if "data" in mapa and ("valor" in mapa or "credito" in mapa or "debito" in mapa):
+        return mapa
+    return None
+
+
+def _linhas_tabela(linhas):
+    mapa = None
+    for n, celulas in enumerate(linhas):
+        if mapa is None:
+            if n >= LINHAS_PROCURA_CABECALHO:
+                break
+            mapa = _mapear_cabecalho(celulas)
+            continue
+
+        def celula(papel):
+            i = mapa.get(papel)
+            return celulas[i] if i is not None and i < len(celulas) else None
+
+        data = _data(celula("data"))
+        if data is None:
+            continue
+        if "valor" in mapa:
+            valor = _numero(celula("valor"))
+        else:
+            valor = abs(_numero(celula("credito")) or 0.0) - abs(_numero(celula("debito")) or 0.0)
+        if not valor:
+            continue
+        externo = celula("id_externo")
+        yield {
+            "data": data,
+            "descricao": str(celula("descricao") or "").strip(),
+            "valor": valor,
+            "id_externo": str(externo).strip() if externo not in (None, "") else None,
+        }
+    if mapa is None:
+        raise ExtratoInvalido("Não encontrei o cabeçalho do extrato (colunas de data e valor).")
+
+
+def _delimitador(amostra):
+    # Extrato brasileiro usa ";" (a vírgula é o decimal); o Sniffer confunde os dois
+    for candidato in [";", "\t", "|"]:
+        if candidato in amostra:
+            return candidato
+    return ","
+
+
+def _linhas_csv(arquivo):
+    with _texto(arquivo) as texto:
+        amostra = texto.read(8 * 1024)
+        texto.seek(0)
+        yield from _linhas_tabela(csv.reader(texto, delimiter=_delimitador(amostra)))
+
+
+def _linhas_xlsx(arquivo):
+    # Import tardio: openpyxl só é carregado quando alguém importa uma planilha
+    from openpyxl import load_workbook
+
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        yield from _linhas_tabela(livro.active.iter_rows(values_only=True))
+    finally:
+        livro.close()
+
+
+_LEITORES = {"ofx": _linhas_ofx, "csv": _linhas_csv, "xlsx": _linhas_xlsx}
+
+
+# =========================================================
+# API
+# =========================================================
+def ler_extrato(arquivo, nome):
+    """
+    Lê o extrato (objeto binário com read/seek, como o do st.file_uploader) e devolve um
+    DataFrame [data, descricao, valor, tipo, id_externo], valor sempre positivo.
+    Transações repetidas no arquivo (mesmo id_externo) entram uma vez só.
+    """
+    extensao = nome.rsplit(".", 1)[-1].lower() if "." in nome else ""
+    leitor = _LEITORES.get(extensao)
+    if leitor is None:
+        raise ExtratoInvalido(f"Formato não suportado: .{extensao}. Use {', '.join(EXTENSOES).upper()}.")
+    try:
+        linhas = [l for l in leitor(arquivo) if l["data"] is not None and l["valor"]]
+    except ExtratoInvalido:
+        raise
+    except Exception as erro:
+        raise ExtratoInvalido(f"Não foi possível ler o arquivo: {erro}") from erro
+
+    df = pd.DataFrame.from_records(linhas, columns=["data", "descricao", "valor", "id_externo"])
+    if df.empty:
+        raise ExtratoInvalido("Nenhuma transação encontrada no arquivo.")
+
+    com_id = df["id_externo"].notna()
+    df = pd.concat([df[com_id].drop_duplicates("id_externo"), df[~com_id]]).sort_values("data", kind="stable")
+    df["tipo"] = df["valor"].gt(0).map({True: "Entrada", False: "Saída"})
+    df["valor"] = df["valor"].abs().round(2)
+    df["descricao"] = df["descricao"].fillna("").str.strip().replace("", "Sem descrição")
+    return df[["data", "descricao", "valor", "tipo", "id_externo"]].reset_index(drop=True)
@@ -0,0 +1,110 @@
+"""
+Tarefas de manutenção do banco, fora do Streamlit.
+
+    python manutencao.py verificar-indices <db>
+    python manutencao.py reconstruir-resumo <db> [--usuario NOME]
+    python manutencao.py verificar-saldos <db> [--usuario NOME] [--corrigir]
+    python manutencao.py particionar <postgres://...> --por usuario --usuarios a,b [--apagar-antiga]
+    python manutencao.py particionar <postgres://...> --por ano [--anos 2020-2030] [--apagar-antiga]
+    python manutencao.py criar-particao <postgres://...> <usuario ou ano>
+"""
+import argparse
+import sys
+
+from database import criar_particao, inicializar_banco, particionar_transactions, verificar_indices
+from repository import reconstruir_rollup, reconstruir_saldos, verificar_saldos
+
+
+def cmd_verificar_indices(args):
+    inicializar_banco(args.db)
+    falhas = 0
+    for nome, ok, plano in verificar_indices(args.db):
+        print(f"[{'OK' if ok else 'FALHOU'}] {nome}")
+        if not ok:
+            falhas += 1
+            print("    " + plano.replace("\n", "\n    "))
+    return 1 if falhas else 0
+
+
+def cmd_reconstruir_resumo(args):
+    inicializar_banco(args.db)
+    reconstruir_rollup(args.db, args.usuario)
+    print(f"Resumo mensal reconstruído ({args.usuario or 'todos os usuários'}).")
+    return 0
+
+
+def cmd_verificar_saldos(args):
+    inicializar_banco(args.db)
+    divergencias = verificar_saldos(args.db, args.usuario)
+    if divergencias.empty:
+        print("[OK] checkpoints de saldo batem com os lançamentos")
+        return 0
+    print(f"[FALHOU] {len(divergencias)} checkpoint(s) divergente(s)")
+    print(divergencias.to_string(index=False))
+    if args.corrigir:
+        reconstruir_saldos(args.db, args.usuario)
+        print("Checkpoints reconstruídos a partir dos lançamentos.")
+        return 0
+    return 1
+
+
+def cmd_particionar(args):
+    inicializar_banco(args.db)
+    anos = None
+    if args.anos:
+        primeiro, _, ultimo = args.anos.partition("-")
+        anos = (int(primeiro), int(ultimo or primeiro))
+    usuarios = [u for u in (args.usuarios or "").split(",") if u.strip()]
+    particionar_transactions(
+        args.db, por=args.por, usuarios=usuarios, anos=anos, lote=args.lote,
+        apagar_antiga=args.apagar_antiga, progresso=print,
+    )
+    return 0
+
+
+def cmd_criar_particao(args):
+    inicializar_banco(args.db)
+    nome, movidas = criar_particao(args.db, args.valor)
+    print(f"Partição {nome} criada; {movidas} lançamento(s) movido(s) da default.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do banco D.Tech")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("verificar-indices", help="confere via EXPLAIN se as consultas quentes usam os índices")
+    p.add_argument("db", help="arquivo SQLite ou URL postgres://")
+    p.set_defaults(func=cmd_verificar_indices)
+
+    p = sub.add_parser("reconstruir-resumo", help="recalcula a tabela monthly_rollup a partir dos lançamentos")
+    p.add_argument("db", help="arquivo SQLite ou URL postgres://")
+    p.add_argument("--usuario", help="só este usuário (padrão: todos)")
+    p.set_defaults(func=cmd_reconstruir_resumo)
+
+    p = sub.add_parser("verificar-saldos", help="recalcula os saldos pelo razão e compara com saldo_checkpoint")
+    p.add_argument("db", help="arquivo SQLite ou URL postgres://")
+    p.add_argument("--usuario", help="só este usuário (padrão: todos)")
+    p.add_argument("--corrigir", action="store_true", help="reconstrói os checkpoints se houver divergência")
+    p.set_defaults(func=cmd_verificar_saldos)
+
+    p = sub.add_parser("particionar", help="converte transactions (Postgres) para partições por usuário ou por ano, online")
+    p.add_argument("db", help="URL postgres://")
+    p.add_argument("--por", choices=["usuario", "ano"], required=True)
+    p.add_argument("--usuarios", help="clientes com partição própria, separados por vírgula (--por usuario)")
+    p.add_argument("--anos", help="faixa AAAA-AAAA (--por ano; padrão: os anos que têm lançamentos)")
+    p.add_argument("--lote", type=int, default=50000, help="linhas copiadas por transação")
+    p.add_argument("--apagar-antiga", action="store_true", help="apaga transactions_antiga ao terminar")
+    p.set_defaults(func=cmd_particionar)
+
+    p = sub.add_parser("criar-particao", help="nova partição (cliente ou ano) numa transactions já particionada")
+    p.add_argument("db", help="URL postgres://")
+    p.add_argument("valor", help="usuario_dono (layout por usuário) ou ano (layout por ano)")
+    p.set_defaults(func=cmd_criar_particao)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,107 +4,35 @@ from datetime import date, datetime, timedelta, timezone
 import re
 import calendar
 
-# --- 🚀 OS DOIS IMPORTS NOVOS PARA O IPHONE ---
-import base64
-import streamlit.components.v1 as components
-
 # --- IMPORTANDO SEUS MÓDULOS D.TECH ---
-from style import carregar_estilos
-from components import metric_card, icon_svg
+from bootstrap import iniciar_pagina
+from components import metric_card, tabela_paginada
+from formatting import CORES_STATUS, CORES_TIPO, fmt_brl, fmt_brl_serie, status_serie
 from auth import exigir_login
-from database import conectar_banco
-
-# ==========================================
-# 1) CONFIGURAÇÃO DA PÁGINA
-# ==========================================
-st.set_page_config(
-    page_title="Lançamentos | D.Tech", 
-    page_icon="logo.png",
-    layout="wide",
-    initial_sidebar_state="collapsed"
+from exports import exportacao
+from importer import EXTENSOES, ExtratoInvalido, ler_extrato
+from repository import (
+    contas_do_usuario, categorias_do_usuario, lancamentos_do_periodo, lancamentos_para_gestao, lancamentos_da_conta,
+    inserir_transacao, inserir_transacoes_em_lote, atualizar_transacao, duplicar_transacao, excluir_transacao,
+    para_centavos,
 )
+import audit
 
 # ==========================================
-# 2) TRUQUE MÁGICO DO IPHONE (Apple Touch Icon)
-# ==========================================
-try:
-    with open("logo.png", "rb") as f:
-        img_b64 = base64.b64encode(f.read()).decode()
-        
-    components.html(
-        f"""
-        <script>
-            var link = window.parent.document.createElement('link');
-            link.rel = 'apple-touch-icon';
-            link.href = 'data:image/png;base64,{img_b64}';
-            window.parent.document.head.appendChild(link);
-        </script>
-        """,
-        height=0, width=0
-    )
-except:
-    pass
-
-# ==========================================
-# 3) LOGO DO MENU LATERAL
+# 1) CONFIGURAÇÃO DA PÁGINA
 # ==========================================
-try:
-    st.logo("logo.png")
-except:
-    pass
-
-carregar_estilos()
-
-st.markdown("""
-<style>
-/* ===== TABELA SaaS D.TECH ===== */
-table { width:100%; border-collapse:separate; border-spacing:0; }
-thead th {
-    text-align:center !important;
-    font-weight:800;
-    letter-spacing:0.5px;
-    padding:12px 12px;
-    border-bottom:1px solid rgba(0, 209, 255, 0.3);
-    background:rgba(0, 209, 255, 0.05);
-    color: #00D1FF;
-}
-tbody td {
-    padding:12px 12px;
-    border-bottom:1px solid rgba(255,255,255,0.05);
-    vertical-align:middle;
-}
-tbody tr:hover td { background:rgba(255,255,255,0.02); }
-</style>
-""", unsafe_allow_html=True)
+# Logo do menu, estilos e ícone do iPhone (uma vez por sessão) vêm do bootstrap
+iniciar_pagina("Lançamentos | D.Tech")
 
 exigir_login()
 
 # Captura quem é o usuário logado agora
 usuario_logado = st.session_state.get("usuario_atual", "danilo")
+db_ref = st.session_state.get("db_nome", "financas.db")
 
 st.title("Lançamentos")
 st.markdown("<span style='color: #A0AEC0;'>Registre suas entradas e saídas financeiras conectadas às suas contas e categorias.</span>", unsafe_allow_html=True)
 
-# ==========================================
-# NOVAS FUNÇÕES DE BANCO DE DADOS (Híbridas)
-# ==========================================
-def conectar():
-    db_nome = st.session_state.get("db_nome", "financas.db")
-    conn, engine = conectar_banco(db_nome)
-    return conn, engine
-
-def executar_sql(conn, engine, query, params=()):
-    if engine == "postgres" and params:
-        query = query.replace("?", "%s")
-    
-    cur = conn.cursor()
-    cur.execute(query, params)
-    conn.commit()
-    try:
-        return cur.lastrowid
-    except:
-        return 0
-
 # -----------------------------
 # Helpers de Fuso Horário e Formatação
 # -----------------------------
@@ -112,65 +40,21 @@ def obter_hoje_br():
     fuso_br = timezone(timedelta(hours=-3))
     return datetime.now(fuso_br).date()
 
-def obter_agora_br():
-    fuso_br = timezone(timedelta(hours=-3))
-    return datetime.now(fuso_br).strftime("%Y-%m-%d %H:%M:%S")
-
 MESES_PT = {
     1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho",
     7: "Julho", 8: "Agosto", 9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro"
 }
 NOME_PARA_NUMERO = {v: k for k, v in MESES_PT.items()}
 
-def fmt_brl(valor: float) -> str:
-    try:
-        return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except:
-        return "R$ 0,00"
-
-def parse_valor_brl(txt: str) -> float:
+def parse_valor_brl(txt: str) -> int:
+    """'R$ 1.234,56' -> 123456 (centavos)."""
     try:
         s = str(txt)
         s = re.sub(r"[^\d,.-]", "", s)
         s = s.replace(".", "").replace(",", ".")
-        return float(s)
+        return para_centavos(s)
     except:
-        return 0.0
-
-def limpar_txt(x) -> str:
-    s = "" if x is None else str(x)
-    return (s.replace("\\n", " ").replace("\n", " ").replace("\r", " ").replace("\t", " ").strip())
-
-def badge_tipo(tipo: str) -> str:
-    tipo = limpar_txt(tipo)
-    if tipo == "Entrada":
-        color = "#00CC96" 
-        icon = "▲"
-    else:
-        color = "#FF4B4B" 
-        icon = "▼"
-    return f'<span style="color:{color}; font-weight:700;">{icon} {tipo}</span>'
-
-def badge_status_minimal(status: str, atrasado: bool) -> str:
-    status = limpar_txt(status)
-
-    if atrasado:
-        cor_bg = "rgba(255,75,75,0.12)"
-        cor_tx = "#FF4B4B"
-        icon = icon_svg("alert")
-        texto = "Atrasado"
-    elif status == "Realizado":
-        cor_bg = "rgba(0,204,150,0.12)"
-        cor_tx = "#00CC96"
-        icon = icon_svg("check")
-        texto = "Realizado"
-    else:
-        cor_bg = "rgba(249,199,79,0.12)"
-        cor_tx = "#F9C74F"
-        icon = icon_svg("clock")
-        texto = "Previsto"
-
-    return f"""<span style="display:inline-flex; align-items:center; gap:8px; padding:6px 10px; border-radius:999px; font-size:12px; font-weight:700; color:{cor_tx}; background:{cor_bg}; border:1px solid rgba(255,255,255,0.08); white-space:nowrap;"><span style="display:inline-flex; color:{cor_tx};">{icon}</span>{texto}</span>"""
+        return 0
 
 def seletor_data_ptbr(prefix_key: str, label: str, default: date):
     st.markdown(f"**{label}**")
@@ -198,43 +82,15 @@ def seletor_data_ptbr(prefix_key: str, label: str, default: date):
 
     return date(int(ano), int(mes), int(dia))
 
-def garantir_audit_log():
-    conn, engine = conectar()
-    executar_sql(conn, engine, """
-        CREATE TABLE IF NOT EXISTS audit_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            data_hora TEXT,
-            usuario TEXT,
-            acao TEXT,
-            detalhes TEXT
-        )
-    """)
-    conn.close()
-
 def registrar_log(acao: str, detalhes: str):
-    try:
-        conn, engine = conectar()
-        usuario = st.session_state.get("usuario_atual", "desconhecido")
-        agora = obter_agora_br() 
-        executar_sql(conn, engine, "INSERT INTO audit_log (data_hora, usuario, acao, detalhes) VALUES (?, ?, ?, ?)", (agora, usuario, acao, detalhes))
-        conn.close()
-    except:
-        pass
+    # Só enfileira: a gravação em lote acontece numa thread de fundo (audit.py)
+    audit.registrar(db_ref, st.session_state.get("usuario_atual", "desconhecido"), acao, detalhes)
 
 # -----------------------------
 # DADOS INICIAIS (Apenas do usuário logado)
 # -----------------------------
-conn, engine = conectar()
-
-query_acc = "SELECT id, nome FROM accounts WHERE usuario_dono=?"
-if engine == "postgres": query_acc = query_acc.replace("?", "%s")
-df_contas = pd.read_sql_query(query_acc, conn, params=(usuario_logado,))
-
-query_cat = "SELECT id, nome, tipo FROM categories WHERE usuario_dono=?"
-if engine == "postgres": query_cat = query_cat.replace("?", "%s")
-df_categorias = pd.read_sql_query(query_cat, conn, params=(usuario_logado,))
-
-conn.close()
+df_contas = contas_do_usuario(db_ref, usuario_logado)
+df_categorias = categorias_do_usuario(db_ref, usuario_logado)
 
 if df_contas.empty or df_categorias.empty:
     st.warning("⚠️ Você precisa cadastrar pelo menos uma **Conta** e uma **Categoria** na aba de Cadastros antes de fazer lançamentos.")
@@ -265,12 +121,8 @@ else:
                     categoria_id = dict_categorias[categoria_selecionada]
                     data_real = data_prevista if status == "Realizado" else None
 
-                    conn, engine = conectar()
-                    executar_sql(conn, engine, """
-                        INSERT INTO transactions (tipo, descricao, valor, data_prevista, data_real, status, conta_id, categoria_id, usuario_dono)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (tipo, descricao, valor, data_prevista, data_real, status, conta_id, categoria_id, usuario_logado))
-                    conn.close()
+                    novo_id = inserir_transacao(db_ref, usuario_logado, tipo, descricao, para_centavos(valor), data_prevista, data_real, status, conta_id, categoria_id)
+                    registrar_log("Inserir", f"ID {novo_id} | {tipo} | {descricao} | {valor:.2f} | {status}")
 
                     st.success("Lançamento salvo com sucesso!")
                     st.rerun()
@@ -306,112 +158,194 @@ else:
         with f7:
             conta_sel = st.selectbox("Conta", options=["Todas"] + sorted(df_contas["nome"].unique().tolist()))
 
-        conn, engine = conectar()
-        query = """
-            SELECT t.id, t.status, t.data_prevista, t.tipo, t.descricao, c.nome, a.nome, t.valor
-            FROM transactions t
-            LEFT JOIN categories c ON t.categoria_id = c.id
-            LEFT JOIN accounts a ON t.conta_id = a.id
-            WHERE t.usuario_dono = ?
-            ORDER BY t.id DESC
-        """
-        if engine == "postgres": query = query.replace("?", "%s")
-        df_transacoes = pd.read_sql_query(query, conn, params=(usuario_logado,))
-        conn.close()
-
-        if not df_transacoes.empty:
-            df_transacoes.columns = ["ID", "Status", "Data", "Tipo", "Descrição", "Categoria", "Conta", "Valor"]
-            
-            df_transacoes["Status"] = df_transacoes["Status"].apply(limpar_txt)
-            df_transacoes["Data_dt"] = pd.to_datetime(df_transacoes["Data"], errors="coerce")
-            df_transacoes["Valor_num"] = pd.to_numeric(df_transacoes["Valor"], errors="coerce").fillna(0.0)
-
-            df_filtrado = df_transacoes[(df_transacoes["Data_dt"].dt.year == int(ano_sel)) & (df_transacoes["Data_dt"].dt.month == int(mes_sel))].copy()
-            df_filtrado["Atrasado"] = (df_filtrado["Status"] == "Previsto") & (df_filtrado["Data_dt"].dt.date < hoje)
-
-            if status_sel == "Atrasado":
-                df_filtrado = df_filtrado[df_filtrado["Atrasado"] == True]
-            elif status_sel != "Todos":
-                df_filtrado = df_filtrado[df_filtrado["Status"] == status_sel]
-
-            if tipo_sel != "Todos":
-                df_filtrado = df_filtrado[df_filtrado["Tipo"] == tipo_sel]
-
-            if categoria_sel != "Todas":
-                df_filtrado = df_filtrado[df_filtrado["Categoria"] == categoria_sel]
-
-            if conta_sel != "Todas":
-                df_filtrado = df_filtrado[df_filtrado["Conta"] == conta_sel]
-
-            if busca_desc.strip():
-                df_filtrado = df_filtrado[df_filtrado["Descrição"].astype(str).str.contains(busca_desc.strip(), case=False, na=False)]
-
-            if df_filtrado.empty:
-                st.info("Nenhum lançamento encontrado com os filtros selecionados.")
-            else:
-                df_view = df_filtrado.copy()
-                df_view["Data"] = df_view["Data_dt"].dt.strftime("%d/%m/%Y")
-                df_view["Valor"] = df_view["Valor_num"].apply(fmt_brl)
-                df_view["Status"] = df_view.apply(lambda r: badge_status_minimal(r["Status"], bool(r["Atrasado"])), axis=1)
-                df_view["Tipo"] = df_view["Tipo"].apply(badge_tipo)
-                df_view = df_view.drop(columns=["ID", "Data_dt", "Valor_num", "Atrasado"], errors="ignore")
-
-                st.write("")
-                e1, e2 = st.columns([1, 1])
-
-                df_export = df_filtrado.copy()
-                df_export["Data"] = df_export["Data_dt"].dt.strftime("%d/%m/%Y")
-                df_export["Valor"] = df_export["Valor_num"].apply(fmt_brl)
-                df_export["Status"] = df_export.apply(lambda r: "Atrasado" if bool(r["Atrasado"]) else str(r["Status"]), axis=1)
-                df_export = df_export.drop(columns=["ID", "Data_dt", "Valor_num", "Atrasado"], errors="ignore")
-
-                with e1:
-                    csv_data = df_export.to_csv(index=False, sep=";").encode("utf-8")
-                    st.download_button("Baixar CSV", data=csv_data, file_name=f"lancamentos_{ano_sel}_{mes_sel:02d}.csv", mime="text/csv", use_container_width=True)
-
-                with e2:
-                    try:
-                        import io
-                        buffer = io.BytesIO()
-                        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-                            df_export.to_excel(writer, index=False, sheet_name="Lancamentos")
-                        st.download_button("Baixar Excel", data=buffer.getvalue(), file_name=f"lancamentos_{ano_sel}_{mes_sel:02d}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
-                    except:
-                        st.warning("⚠️ Instale: `pip install openpyxl` para Excel")
-
-                st.markdown(df_view.to_html(escape=False, index=False), unsafe_allow_html=True)
+        inicio_periodo = date(int(ano_sel), int(mes_sel), 1)
+        fim_periodo = (inicio_periodo + timedelta(days=32)).replace(day=1)
+
+        # O banco já devolve só o mês e os filtros escolhidos
+        df_filtrado = lancamentos_do_periodo(
+            db_ref, usuario_logado, inicio_periodo, fim_periodo, hoje,
+            status=None if status_sel == "Todos" else status_sel,
+            tipo=None if tipo_sel == "Todos" else tipo_sel,
+            categoria=None if categoria_sel == "Todas" else categoria_sel,
+            conta=None if conta_sel == "Todas" else conta_sel,
+            busca=busca_desc,
+        )
+
+        df_filtrado.columns = ["ID", "Status", "Data", "Tipo", "Descrição", "Categoria", "Conta", "Valor"]
+
+        # Já vem tipado do repository: Data em datetime64, Status/Tipo/Categoria/Conta em category
+        df_filtrado["Data_dt"] = df_filtrado["Data"]
+        df_filtrado["Valor_num"] = df_filtrado["Valor"]
+        df_filtrado["Atrasado"] = (df_filtrado["Status"] == "Previsto") & (df_filtrado["Data_dt"] < pd.Timestamp(hoje))
+
+        if df_filtrado.empty:
+            st.info("Nenhum lançamento encontrado com os filtros selecionados.")
         else:
-            st.info("Nenhum lançamento registrado no sistema ainda.")
+            # Data e Valor seguem como datetime/centavos: a tabela formata só o que exibe
+            df_view = df_filtrado.drop(columns=["ID", "Data_dt", "Valor_num", "Atrasado"], errors="ignore")
+            df_view["Status"] = status_serie(df_filtrado["Status"], df_filtrado["Atrasado"])
+
+            def montar_export():
+                df_export = df_view.copy()
+                df_export["Data"] = df_export["Data"].dt.strftime("%d/%m/%Y")
+                df_export["Valor"] = fmt_brl_serie(df_export["Valor"])
+                return df_export
+
+            st.write("")
+            exportacao(
+                db_ref, usuario_logado, "export_lancamentos",
+                (ano_sel, mes_sel, status_sel, tipo_sel, categoria_sel, conta_sel, busca_desc, hoje),
+                montar_export, f"lancamentos_{ano_sel}_{mes_sel:02d}", "Lancamentos",
+            )
+
+            tabela_paginada(
+                df_view, "tabela_lancamentos", etiquetas={"Status": CORES_STATUS, "Tipo": CORES_TIPO},
+                formatos={"Valor": fmt_brl},
+            )
+
+    # -----------------------------
+    # IMPORTAR EXTRATO (OFX / CSV / XLSX)
+    # -----------------------------
+    st.divider()
+    with st.expander("Importar extrato bancário (OFX, CSV ou XLSX)"):
+        if st.session_state.get("extrato_mensagem"):
+            st.success(st.session_state.pop("extrato_mensagem"))
+
+        rodada = st.session_state.get("extrato_rodada", 0)
+        arquivo_extrato = st.file_uploader("Arquivo do extrato", type=EXTENSOES, key=f"arquivo_extrato_{rodada}")
+
+        if arquivo_extrato is not None:
+            # O arquivo é lido uma vez só; os reruns da prévia reaproveitam o DataFrame
+            if st.session_state.get("extrato_arquivo_id") != arquivo_extrato.file_id:
+                try:
+                    st.session_state["extrato_df"] = ler_extrato(arquivo_extrato, arquivo_extrato.name)
+                    st.session_state["extrato_erro"] = None
+                except ExtratoInvalido as erro:
+                    st.session_state["extrato_df"] = None
+                    st.session_state["extrato_erro"] = str(erro)
+                st.session_state["extrato_arquivo_id"] = arquivo_extrato.file_id
+
+            if st.session_state.get("extrato_erro"):
+                st.error(f"⚠️ {st.session_state['extrato_erro']}")
+            else:
+                df_extrato = st.session_state["extrato_df"]
+                rotulos_categorias = dict(zip(df_categorias["nome"] + " (" + df_categorias["tipo"] + ")", df_categorias["id"]))
+                opcoes_categorias = list(rotulos_categorias.keys())
+
+                def categoria_padrao(tipo_mov):
+                    do_tipo = [r for r, t in zip(opcoes_categorias, df_categorias["tipo"]) if t == tipo_mov]
+                    return opcoes_categorias.index(do_tipo[0]) if do_tipo else 0
+
+                i1, i2, i3 = st.columns(3)
+                with i1:
+                    conta_extrato = st.selectbox("Conta do extrato", options=df_contas["nome"].tolist(), key="conta_extrato")
+                with i2:
+                    cat_entradas = st.selectbox("Categoria das entradas", options=opcoes_categorias, index=categoria_padrao("Entrada"), key="cat_entradas_extrato")
+                with i3:
+                    cat_saidas = st.selectbox("Categoria das saídas", options=opcoes_categorias, index=categoria_padrao("Saída"), key="cat_saidas_extrato")
+                conta_extrato_id = int(df_contas[df_contas["nome"] == conta_extrato]["id"].iloc[0])
+
+                # O que já existe na conta (mesma data, valor, tipo e descrição) vem desmarcado
+                def chave_lancamento(datas, centavos, tipos, descricoes):
+                    return (
+                        pd.to_datetime(datas).dt.strftime("%Y-%m-%d") + "|" + centavos.astype(str)
+                        + "|" + tipos.astype(str) + "|" + descricoes.astype(str).str.strip().str.lower()
+                    )
+
+                df_existentes = lancamentos_da_conta(db_ref, usuario_logado, conta_extrato_id, df_extrato["data"].min(), df_extrato["data"].max())
+                chaves_existentes = set(chave_lancamento(df_existentes["data_prevista"], df_existentes["valor_centavos"], df_existentes["tipo"], df_existentes["descricao"]))
+                ja_existe = chave_lancamento(df_extrato["data"], para_centavos(df_extrato["valor"]), df_extrato["tipo"], df_extrato["descricao"]).isin(chaves_existentes)
+
+                df_previa = pd.DataFrame({
+                    "Importar": ~ja_existe,
+                    "Data": pd.to_datetime(df_extrato["data"]),
+                    "Descrição": df_extrato["descricao"],
+                    "Tipo": df_extrato["tipo"],
+                    "Valor": df_extrato["valor"],
+                    "Categoria": df_extrato["tipo"].map({"Entrada": cat_entradas, "Saída": cat_saidas}),
+                })
+
+                st.caption(f"{len(df_previa)} transação(ões) no arquivo · {int(ja_existe.sum())} já existe(m) na conta e ficou(aram) desmarcada(s).")
+                df_editado = st.data_editor(
+                    df_previa,
+                    column_config={
+                        "Importar": st.column_config.CheckboxColumn("Importar"),
+                        "Data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+                        "Valor": st.column_config.NumberColumn("Valor", format="R$ %.2f"),
+                        "Categoria": st.column_config.SelectboxColumn("Categoria", options=opcoes_categorias, required=True),
+                    },
+                    disabled=["Data", "Tipo", "Valor"],
+                    hide_index=True,
+                    use_container_width=True,
+                    key=f"editor_extrato_{st.session_state['extrato_arquivo_id']}",
+                )
+                df_importar = df_editado[df_editado["Importar"]]
+
+                if st.button(f"Importar {len(df_importar)} lançamento(s)", type="primary", disabled=df_importar.empty, use_container_width=True):
+                    datas = df_importar["Data"].dt.date
+                    lote = pd.DataFrame({
+                        "tipo": df_importar["Tipo"],
+                        "descricao": df_importar["Descrição"],
+                        "valor_centavos": para_centavos(df_importar["Valor"]),
+                        "data_prevista": datas,
+                        "data_real": datas,
+                        "status": "Realizado",
+                        "conta_id": conta_extrato_id,
+                        "categoria_id": df_importar["Categoria"].map(rotulos_categorias),
+                    })
+                    ids = inserir_transacoes_em_lote(db_ref, usuario_logado, lote)
+                    if ids:
+                        registrar_log("Importar extrato", f"{len(ids)} lançamento(s) | IDs {ids[0]}-{ids[-1]} | Conta {conta_extrato}")
+                    for chave in ["extrato_df", "extrato_erro", "extrato_arquivo_id"]:
+                        st.session_state.pop(chave, None)
+                    st.session_state["extrato_rodada"] = rodada + 1
+                    st.session_state["extrato_mensagem"] = f"✅ {len(ids)} lançamento(s) importado(s) para a conta {conta_extrato}."
+                    st.rerun()
 
     st.divider()
     st.subheader("Gerenciar Lançamentos")
 
-    conn, engine = conectar()
-    query_raw = """
-        SELECT t.id, t.tipo, t.descricao, t.valor, t.data_prevista, t.status, a.nome, c.nome, t.conta_id, t.categoria_id
-        FROM transactions t
-        LEFT JOIN accounts a ON t.conta_id = a.id
-        LEFT JOIN categories c ON t.categoria_id = c.id
-        WHERE t.usuario_dono = ?
-        ORDER BY t.id DESC
-    """
-    if engine == "postgres": query_raw = query_raw.replace("?", "%s")
-    df_raw = pd.read_sql_query(query_raw, conn, params=(usuario_logado,))
-    conn.close()
-
-    if not df_raw.empty:
-        df_raw.columns = ["id", "tipo", "descricao", "valor", "data_prevista", "status", "conta_nome", "categoria_nome", "conta_id", "categoria_id"]
-        
-        df_raw["valor_num"] = pd.to_numeric(df_raw.get("valor", 0), errors="coerce").fillna(0.0)
-        df_raw["valor_fmt"] = df_raw["valor_num"].apply(fmt_brl)
-        df_raw["data_fmt"] = pd.to_datetime(df_raw.get("data_prevista", None), errors="coerce").dt.strftime("%d/%m/%Y").fillna("—")
-        df_raw["status"] = df_raw.get("status", "").astype(str).apply(limpar_txt)
-
-        opcoes = df_raw.apply(lambda r: f"ID {r['id']} | {r['descricao']} - {r['valor_fmt']} ({r['status']}) | {r['data_fmt']}", axis=1).tolist()
-        dict_opcoes = dict(zip(opcoes, df_raw["id"].tolist()))
-
-        lancamento_selecionado = st.selectbox("Selecione o Lançamento:", options=opcoes)
-        id_selecionado = dict_opcoes[lancamento_selecionado]
+    # Paginação por chave: a pilha guarda o cursor (menor id visto) de cada página aberta,
+    # então só 50 linhas saem do banco por vez, não importa o tamanho do histórico
+    TAMANHO_PAGINA_GESTAO = 50
+
+    busca_gestao = st.text_input("Buscar lançamento", placeholder="ID, descrição, valor (ex: 150,00) ou data (dd/mm/aaaa)", key="busca_gestao")
+    if st.session_state.get("busca_gestao_anterior") != busca_gestao:
+        st.session_state["busca_gestao_anterior"] = busca_gestao
+        st.session_state["cursores_gestao"] = [None]
+    cursores = st.session_state.setdefault("cursores_gestao", [None])
+
+    df_raw = lancamentos_para_gestao(db_ref, usuario_logado, antes_de=cursores[-1], busca=busca_gestao, limite=TAMANHO_PAGINA_GESTAO)
+    tem_proxima = len(df_raw) > TAMANHO_PAGINA_GESTAO
+    df_raw = df_raw.head(TAMANHO_PAGINA_GESTAO)
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    with p1:
+        if st.button("← Mais recentes", disabled=len(cursores) == 1, use_container_width=True):
+            cursores.pop()
+            st.rerun()
+    with p2:
+        st.caption(f"Página {len(cursores)} · {len(df_raw)} lançamento(s) nesta página")
+    with p3:
+        if st.button("Mais antigos →", disabled=not tem_proxima, use_container_width=True):
+            cursores.append(int(df_raw["id"].iloc[-1]))
+            st.rerun()
+
+    if df_raw.empty:
+        st.info("Nenhum lançamento encontrado." if busca_gestao.strip() else "Nenhum lançamento registrado no sistema ainda.")
+    else:
+        df_raw.columns = ["id", "tipo", "descricao", "valor_centavos", "data_prevista", "status", "conta_nome", "categoria_nome", "conta_id", "categoria_id"]
+
+        df_raw["valor_fmt"] = fmt_brl_serie(df_raw["valor_centavos"])
+        df_raw["data_fmt"] = df_raw["data_prevista"].dt.strftime("%d/%m/%Y").fillna("—")
+
+        rotulos = (
+            "ID " + df_raw["id"].astype(str) + " | " + df_raw["descricao"].astype(str) + " - " + df_raw["valor_fmt"]
+            + " (" + df_raw["status"].astype(str) + ") | " + df_raw["data_fmt"]
+        )
+        dict_rotulos = dict(zip(df_raw["id"].tolist(), rotulos.tolist()))
+
+        id_selecionado = st.selectbox("Selecione o Lançamento:", options=list(dict_rotulos), format_func=dict_rotulos.get)
         linha = df_raw[df_raw["id"] == id_selecionado].iloc[0]
 
         st.write("")
@@ -451,24 +385,15 @@ else:
                     st.error("⚠️ Descrição não pode ficar vazia e o valor deve ser maior que zero.")
                 else:
                     data_real = data_edit if status_edit == "Realizado" else None
-                    conn, engine = conectar()
-                    executar_sql(conn, engine, """
-                        UPDATE transactions SET tipo = ?, descricao = ?, valor = ?, data_prevista = ?, data_real = ?, status = ?, conta_id = ?, categoria_id = ? 
-                        WHERE id = ? AND usuario_dono = ?
-                    """, (tipo_edit, descricao_edit.strip(), float(valor_edit), data_edit, data_real, status_edit, conta_edit_id, categoria_edit_id, int(id_selecionado), usuario_logado))
-                    conn.close()
+                    atualizar_transacao(db_ref, usuario_logado, int(id_selecionado), tipo_edit, descricao_edit.strip(), valor_edit, data_edit, data_real, status_edit, conta_edit_id, categoria_edit_id)
+                    registrar_log("Editar", f"ID {int(id_selecionado)} | {tipo_edit} | {descricao_edit.strip()} | {valor_edit / 100:.2f} | {status_edit}")
                     st.success("✅ Lançamento atualizado com sucesso!")
                     st.rerun()
 
         with a2:
             if st.button("Duplicar", use_container_width=True):
-                conn, engine = conectar()
-                novo_id = executar_sql(conn, engine, """
-                    INSERT INTO transactions (tipo, descricao, valor, data_prevista, data_real, status, conta_id, categoria_id, usuario_dono)
-                    SELECT tipo, descricao, valor, data_prevista, NULL, 'Previsto', conta_id, categoria_id, usuario_dono 
-                    FROM transactions WHERE id = ? AND usuario_dono = ?
-                """, (int(id_selecionado), usuario_logado))
-                conn.close()
+                novo_id = duplicar_transacao(db_ref, usuario_logado, int(id_selecionado))
+                registrar_log("Duplicar", f"ID {int(id_selecionado)} -> ID {novo_id}")
                 st.success(f"✅ Lançamento duplicado com sucesso! Novo ID: {novo_id}")
                 st.rerun()
 
@@ -479,9 +404,8 @@ else:
         with a4:
             if st.session_state.get("confirmar_exclusao_id") == int(id_selecionado):
                 if st.button("Confirmar Exclusão", type="secondary", use_container_width=True):
-                    conn, engine = conectar()
-                    executar_sql(conn, engine, "DELETE FROM transactions WHERE id = ? AND usuario_dono = ?", (int(id_selecionado), usuario_logado))
-                    conn.close()
+                    excluir_transacao(db_ref, usuario_logado, int(id_selecionado))
+                    registrar_log("Excluir", f"ID {int(id_selecionado)}")
                     st.session_state.pop("confirmar_exclusao_id", None)
                     st.success("✅ Lançamento apagado permanentemente!")
                     st.rerun()
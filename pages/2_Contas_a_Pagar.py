@@ -1,69 +1,26 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
 from datetime import date, timedelta
 
-from style import carregar_estilos
-from components import metric_card, icon_svg
+from bootstrap import iniciar_pagina
+from components import metric_card, icon_svg, tabela_paginada
+from formatting import CORES_STATUS, fmt_brl, fmt_brl_serie, status_serie
 from auth import exigir_login
-from database import conectar_banco
+from exports import exportacao
+import audit
+from repository import (
+    SITUACOES_PAGAR, categorias_do_usuario, classificar_situacao, contas_do_periodo, contas_do_usuario, marcar_realizados,
+)
 
-st.set_page_config(page_title="Contas a Pagar", page_icon="📊", layout="wide")
-
-try:
-    st.logo("logo.png")
-except:
-    pass
-
-carregar_estilos()
-
-st.markdown("""
-<style>
-.dt-table table { width:100%; border-collapse:separate; border-spacing:0; overflow:hidden; border-radius:14px; }
-.dt-table thead th {
-    text-align:center !important;
-    font-weight:800;
-    padding:12px 12px;
-    border-bottom:1px solid rgba(0, 209, 255, 0.3);
-    background:rgba(0, 209, 255, 0.05);
-    color: #00D1FF;
-}
-.dt-table tbody td {
-    padding:12px 12px;
-    border-bottom:1px solid rgba(255,255,255,0.05);
-    vertical-align:middle;
-}
-.dt-table tbody tr:hover td { background:rgba(255,255,255,0.02); }
-.dt-table tbody td:nth-child(1) { text-align:left; }
-.dt-table tbody td:nth-child(2) { text-align:center; }
-.dt-table tbody td:nth-child(5) { text-align:right; }
-</style>
-""", unsafe_allow_html=True)
+iniciar_pagina("Contas a Pagar", icone="📊", sidebar="auto")
 
 exigir_login()
 
 usuario_logado = st.session_state.get("usuario_atual", "danilo")
+db_ref = st.session_state.get("db_nome", "financeiro.db")
 
 st.title("Contas a Pagar")
 st.markdown("<span style='color: #A0AEC0;'>Acompanhe compromissos, fornecedores e evite atrasos.</span>", unsafe_allow_html=True)
 
-# ==========================================
-# BANCO DE DADOS HÍBRIDO
-# ==========================================
-def conectar():
-    db_nome = st.session_state.get("db_nome", "financeiro.db") 
-    conn, engine = conectar_banco(db_nome)
-    return conn, engine
-
-def executar_sql(conn, engine, query, params=()):
-    if engine == "postgres" and params:
-        query = query.replace("?", "%s")
-    cur = conn.cursor()
-    cur.execute(query, params)
-    conn.commit()
-    try: return cur.lastrowid
-    except: return 0
-
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -73,74 +30,7 @@ MESES_PT = {
 }
 NOME_PARA_NUMERO = {v: k for k, v in MESES_PT.items()}
 
-def fmt_brl(x: float) -> str:
-    try: return f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except: return "R$ 0,00"
-
-def limpar_txt(x: str) -> str:
-    try: return str(x).replace("\n", " ").strip()
-    except: return ""
-
-def badge_status_minimal(status: str, atrasado: bool) -> str:
-    status = limpar_txt(status)
-
-    if atrasado:
-        cor_bg, cor_tx, icon, texto = "rgba(255,75,75,0.12)", "#FF4B4B", icon_svg("alert"), "Atrasado"
-    elif status == "Realizado":
-        cor_bg, cor_tx, icon, texto = "rgba(0,204,150,0.12)", "#00CC96", icon_svg("check"), "Realizado"
-    else:
-        cor_bg, cor_tx, icon, texto = "rgba(249,199,79,0.12)", "#F9C74F", icon_svg("clock"), "Previsto"
-
-    return f"""<span style="display:inline-flex; align-items:center; gap:8px; padding:6px 10px; border-radius:999px; font-size:12px; font-weight:700; color:{cor_tx}; background:{cor_bg}; border:1px solid rgba(255,255,255,0.08); white-space:nowrap;"><span style="display:inline-flex; color:{cor_tx};">{icon}</span>{texto}</span>"""
-
-# -----------------------------
-# Dados
-# -----------------------------
-try:
-    conn, engine = conectar()
-    query = """
-        SELECT t.id, t.descricao, c.nome, t.data_prevista, t.valor, t.status
-        FROM transactions t
-        LEFT JOIN categories c ON t.categoria_id = c.id
-        WHERE t.tipo = 'Saída' AND t.usuario_dono = ?
-        ORDER BY t.data_prevista ASC
-    """
-    if engine == "postgres": query = query.replace("?", "%s")
-    df = pd.read_sql_query(query, conn, params=(usuario_logado,))
-    conn.close()
-    
-    # Blindando os nomes das colunas
-    df.columns = ["id", "Fornecedor_Descricao", "Categoria", "Vencimento", "Valor", "Status_BD"]
-    
-except Exception as e:
-    st.error(f"Erro ao conectar banco: {e}")
-    st.stop()
-
-if df.empty:
-    st.info("Nenhuma despesa registrada ainda.")
-    df = pd.DataFrame(columns=["id", "Fornecedor_Descricao", "Categoria", "Vencimento", "Valor", "Status_BD"])
-
-for col in ["Fornecedor_Descricao", "Categoria", "Status_BD"]:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.replace("\n", " ", regex=False).str.strip()
-
-df["Vencimento"] = pd.to_datetime(df["Vencimento"], errors="coerce").dt.date
-df["Venc_dt"] = pd.to_datetime(df["Vencimento"], errors="coerce")
-
 hoje = date.today()
-em_7 = hoje + timedelta(days=7)
-
-def definir_status_label(row):
-    if str(row["Status_BD"]) == "Realizado": return "Realizado"
-    if row["Vencimento"] is None: return "A pagar"
-    if row["Vencimento"] < hoje: return "Atrasado"
-    if hoje <= row["Vencimento"] <= em_7: return "Recebe em 7 dias"
-    return "A pagar"
-
-if not df.empty:
-    df["Status_Label"] = df.apply(definir_status_label, axis=1)
-else:
-    df["Status_Label"] = []
 
 # -----------------------------
 # Filtros
@@ -164,17 +54,50 @@ STATUS_OPCOES = ["Atrasado", "Recebe em 7 dias", "A pagar", "Realizado"]
 
 with f4: status_filtro = st.multiselect("Status", options=STATUS_OPCOES)
 with f5:
-    cats = sorted([c for c in df["Categoria"].dropna().unique().tolist()]) if not df.empty else []
+    cats = sorted(categorias_do_usuario(db_ref, usuario_logado)["nome"].dropna().unique().tolist())
     categoria_sel = st.multiselect("Categoria", options=cats)
 with f6: ordenar = st.selectbox("Ordenar", options=["Vencimento (próximo)", "Valor (maior)", "Valor (menor)"])
 
-df_f = pd.DataFrame()
-if not df.empty:
-    df_f = df[(df["Venc_dt"].dt.year == int(ano_sel)) & (df["Venc_dt"].dt.month == int(mes_sel))].copy()
+incluir_atrasados = st.checkbox("Incluir contas atrasadas de meses anteriores", value=False)
+
+inicio_mes = date(int(ano_sel), int(mes_sel), 1)
+fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+
+# -----------------------------
+# Dados (só o mês escolhido, já filtrado no banco)
+# -----------------------------
+try:
+    df = contas_do_periodo(
+        db_ref, usuario_logado, "Saída", inicio_mes, fim_mes,
+        categorias=categoria_sel, busca=busca, incluir_atrasados=incluir_atrasados,
+    )
+    
+    # Blindando os nomes das colunas
+    df.columns = ["id", "Fornecedor_Descricao", "Categoria", "Vencimento", "Valor", "Status_BD"]
+    
+except Exception as e:
+    st.error(f"Erro ao conectar banco: {e}")
+    st.stop()
+
+# Texto já gravado normalizado e Vencimento já em datetime64 pelo repository (Categoria/Status_BD em category).
+# A situação sai daqui uma vez e alimenta KPIs, filtro, badges e exportação.
+df["Status_Label"] = classificar_situacao(df["Status_BD"], df["Vencimento"], hoje, SITUACOES_PAGAR)
 
+df_f = df.copy()
+# Faixa do slider (None quando ele não aparece): recorta df_f, então entra na chave da exportação
+faixa = None
+if not df_f.empty:
+    # O status depende de "hoje", por isso é o único filtro que continua aqui
     if status_filtro: df_f = df_f[df_f["Status_Label"].isin(status_filtro)]
-    if categoria_sel: df_f = df_f[df_f["Categoria"].isin(categoria_sel)]
-    if busca.strip(): df_f = df_f[df_f["Fornecedor_Descricao"].astype(str).str.contains(busca.strip(), case=False, na=False)]
+
+    if not df_f.empty:
+        # Valor vem em centavos; o slider mostra reais e o filtro volta a comparar centavos
+        vmin, vmax = int(df_f["Valor"].min()), int(df_f["Valor"].max())
+        if vmin < vmax:
+            faixa = st.slider("Faixa de valor (R$)", min_value=vmin / 100, max_value=vmax / 100, value=(vmin / 100, vmax / 100))
+            df_f = df_f[(df_f["Valor"] >= round(faixa[0] * 100)) & (df_f["Valor"] <= round(faixa[1] * 100))]
+        else:
+            st.info(f"Faixa de valor: apenas um valor → {fmt_brl(vmin)}")
 
     if ordenar == "Valor (maior)": df_f = df_f.sort_values("Valor", ascending=False)
     elif ordenar == "Valor (menor)": df_f = df_f.sort_values("Valor", ascending=True)
@@ -201,38 +124,62 @@ else:
     with m4: metric_card("Vence em 7 dias", str(qtd_7), "Prioridade", "red" if qtd_7 > 0 else "green", icon_svg("calendar"))
 
 # -----------------------------
-# Ação Rápida
+# Ação Rápida (baixa em lote)
 # -----------------------------
 st.divider()
 st.subheader("Ação rápida")
 
+if st.session_state.get("baixa_pagar_msg"):
+    st.success(st.session_state.pop("baixa_pagar_msg"))
+
 if not df_f.empty:
     df_acao = df_f[df_f["Status_BD"] != "Realizado"].copy()
     if df_acao.empty:
         st.info("Todas as contas deste período já foram pagas.")
     else:
-        df_acao["venc_fmt"] = pd.to_datetime(df_acao["Vencimento"]).dt.strftime("%d/%m/%Y")
-        df_acao["valor_fmt"] = df_acao["Valor"].apply(fmt_brl)
-
-        opcoes = df_acao.apply(lambda r: f"{limpar_txt(r['Fornecedor_Descricao'])} | {r['venc_fmt']} | {r['valor_fmt']}", axis=1).tolist()
-        map_id = dict(zip(opcoes, df_acao["id"].tolist()))
-
-        cA1, cA2 = st.columns([3, 1])
-        with cA1: escolha = st.selectbox("Selecione a conta para baixar:", options=opcoes)
-        id_sel = map_id.get(escolha)
-
-        with cA2:
-            if st.button("Marcar como pago", type="primary", use_container_width=True):
-                if id_sel:
-                    conn, engine = conectar()
-                    try:
-                        executar_sql(conn, engine, "UPDATE transactions SET status='Realizado', data_real=? WHERE id=? AND usuario_dono=?", (date.today(), id_sel, usuario_logado))
-                        st.success("Conta atualizada!")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Erro: {e}")
-                    finally:
-                        conn.close()
+        df_acao["venc_fmt"] = df_acao["Vencimento"].dt.strftime("%d/%m/%Y")
+        df_acao["valor_fmt"] = fmt_brl_serie(df_acao["Valor"])
+
+        rotulos = dict(zip(
+            df_acao["id"].astype(int),
+            df_acao["Fornecedor_Descricao"] + " | " + df_acao["venc_fmt"] + " | " + df_acao["valor_fmt"],
+        ))
+
+        todas = st.checkbox(f"Selecionar todas em aberto ({len(rotulos)})", key="baixa_pagar_todas")
+        ids_sel = st.multiselect(
+            "Selecione as contas para baixar:", options=list(rotulos), format_func=rotulos.get,
+            default=list(rotulos) if todas else [], key=f"baixa_pagar_ids_{todas}",
+        )
+
+        df_contas_pg = contas_do_usuario(db_ref, usuario_logado)
+        opcoes_conta = ["Manter a conta de cada lançamento"] + df_contas_pg["nome"].tolist()
+
+        cA1, cA2, cA3 = st.columns([1.2, 1.8, 1.2])
+        with cA1: data_pagamento = st.date_input("Data do pagamento", value=hoje, format="DD/MM/YYYY", key="baixa_pagar_data")
+        with cA2: conta_pagamento = st.selectbox("Pago pela conta", options=opcoes_conta, key="baixa_pagar_conta")
+        total_sel = int(df_acao[df_acao["id"].isin(ids_sel)]["Valor"].sum())
+
+        with cA3:
+            st.write("")
+            if st.button(f"Marcar {len(ids_sel)} como pago(s)", type="primary", disabled=not ids_sel, use_container_width=True):
+                st.session_state["confirmar_pagos"] = sorted(ids_sel)
+
+        if ids_sel and st.session_state.get("confirmar_pagos") == sorted(ids_sel):
+            st.warning(f"Confirme: {len(ids_sel)} conta(s), {fmt_brl(total_sel)}, serão marcadas como Realizado.")
+            if st.button("Confirmar pagamento", use_container_width=True):
+                conta_id = None
+                if conta_pagamento != opcoes_conta[0]:
+                    conta_id = int(df_contas_pg[df_contas_pg["nome"] == conta_pagamento]["id"].iloc[0])
+                try:
+                    marcar_realizados(db_ref, usuario_logado, ids_sel, data_pagamento, conta_id=conta_id)
+                    audit.registrar(db_ref, usuario_logado, "Baixa de pagamentos", f"IDs {sorted(ids_sel)} | {data_pagamento:%d/%m/%Y} | {total_sel / 100:.2f}")
+                    st.session_state.pop("confirmar_pagos", None)
+                    st.session_state["baixa_pagar_msg"] = f"{len(ids_sel)} conta(s) baixada(s) · {fmt_brl(total_sel)}"
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Erro: {e}")
+        elif ids_sel:
+            st.caption(f"Selecionado: {fmt_brl(total_sel)}")
 
 # -----------------------------
 # Detalhamento
@@ -243,36 +190,18 @@ st.subheader("Detalhamento")
 if not df_f.empty:
     df_view = df_f[["Status_BD", "Vencimento", "Fornecedor_Descricao", "Categoria", "Valor"]].copy()
     df_view.rename(columns={"Fornecedor_Descricao": "Descrição", "Vencimento": "Data", "Status_BD": "Status"}, inplace=True)
-    df_view["Descrição"] = df_view["Descrição"].apply(limpar_txt)
-    df_view["Categoria"] = df_view["Categoria"].apply(limpar_txt)
-    df_view["Data"] = pd.to_datetime(df_view["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-    df_view["Valor"] = df_view["Valor"].apply(fmt_brl)
-
-    venc_dt = pd.to_datetime(df_f["Vencimento"], errors="coerce").dt.date
-    atrasado_mask = (df_f["Status_BD"].astype(str) != "Realizado") & (venc_dt < hoje)
-
-    df_view["Status"] = [badge_status_minimal(str(s), bool(a)) for s, a in zip(df_f["Status_BD"].astype(str).tolist(), atrasado_mask.tolist())]
-
-    st.markdown(f'<div class="dt-table">{df_view.to_html(escape=False, index=False)}</div>', unsafe_allow_html=True)
-
-    df_export = df_f[["Status_Label", "Vencimento", "Fornecedor_Descricao", "Categoria", "Valor"]].copy()
-    df_export.rename(columns={"Fornecedor_Descricao": "Descrição", "Vencimento": "Data", "Status_Label": "Status"}, inplace=True)
-    df_export["Descrição"] = df_export["Descrição"].apply(limpar_txt)
-    df_export["Categoria"] = df_export["Categoria"].apply(limpar_txt)
-    df_export["Data"] = pd.to_datetime(df_export["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-    df_export["Valor"] = df_export["Valor"].apply(fmt_brl)
-    df_export["Status"] = df_export["Status"].astype(str).str.replace("\n", " ", regex=False).str.strip()
-
-    c_exp1, c_exp2 = st.columns([1, 1])
-    with c_exp1:
-        csv = df_export.to_csv(index=False, sep=";").encode("utf-8")
-        st.download_button("📥 Baixar CSV", data=csv, file_name=f"contas_pagar_{ano_sel}_{mes_sel}.csv", mime="text/csv", use_container_width=True)
-    with c_exp2:
-        try:
-            import io
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-                df_export.to_excel(writer, index=False, sheet_name="Contas")
-            st.download_button("📥 Baixar Excel", data=buffer.getvalue(), file_name=f"contas_pagar_{ano_sel}_{mes_sel}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
-        except:
-            st.caption("Instale 'openpyxl' para baixar em Excel.")
+    df_view["Status"] = status_serie(df_f["Status_BD"], df_f["Status_Label"] == "Atrasado")
+    tabela_paginada(df_view, "tabela_pagar", etiquetas={"Status": CORES_STATUS}, formatos={"Valor": fmt_brl})
+
+    def montar_export():
+        df_export = df_f[["Status_Label", "Vencimento", "Fornecedor_Descricao", "Categoria", "Valor"]].copy()
+        df_export.rename(columns={"Fornecedor_Descricao": "Descrição", "Vencimento": "Data", "Status_Label": "Status"}, inplace=True)
+        df_export["Data"] = df_export["Data"].dt.strftime("%d/%m/%Y")
+        df_export["Valor"] = fmt_brl_serie(df_export["Valor"])
+        return df_export
+
+    exportacao(
+        db_ref, usuario_logado, "export_pagar",
+        (ano_sel, mes_sel, busca, tuple(status_filtro), tuple(categoria_sel), ordenar, incluir_atrasados, hoje, faixa),
+        montar_export, f"contas_pagar_{ano_sel}_{mes_sel}", "Contas",
+    )
@@ -1,65 +1,26 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
 from datetime import date, timedelta
 
-from style import carregar_estilos
-from components import metric_card, icon_svg
+from bootstrap import iniciar_pagina
+from components import metric_card, icon_svg, tabela_paginada
+from formatting import CORES_RECEBER, fmt_brl, fmt_brl_serie
 from auth import exigir_login
-from database import conectar_banco
+from exports import exportacao
+import audit
+from repository import (
+    SITUACOES_RECEBER, categorias_do_usuario, classificar_situacao, contas_do_periodo, contas_do_usuario, marcar_realizados,
+)
 
-st.set_page_config(page_title="Contas a Receber | D.Tech", page_icon="logo.png", layout="wide")
-
-try:
-    st.logo("logo.png")
-except:
-    pass
-
-carregar_estilos()
-
-st.markdown("""
-<style>
-.dt-table table { width:100%; border-collapse:separate; border-spacing:0; overflow:hidden; border-radius:14px; }
-.dt-table thead th {
-    text-align:center !important;
-    font-weight:800;
-    padding:12px 12px;
-    border-bottom:1px solid rgba(0, 209, 255, 0.3);
-    background:rgba(0, 209, 255, 0.05);
-    color: #00D1FF;
-}
-.dt-table tbody td { padding:12px 12px; border-bottom:1px solid rgba(255,255,255,0.05); vertical-align:middle; }
-.dt-table tbody tr:hover td { background:rgba(255,255,255,0.02); }
-.dt-table tbody td:nth-child(1) { text-align:left; }
-.dt-table tbody td:nth-child(2) { text-align:center; }
-.dt-table tbody td:nth-child(5) { text-align:right; }
-</style>
-""", unsafe_allow_html=True)
+iniciar_pagina("Contas a Receber | D.Tech", sidebar="auto")
 
 exigir_login()
 
 usuario_logado = st.session_state.get("usuario_atual", "danilo")
+db_ref = st.session_state.get("db_nome", "financeiro.db")
 
 st.title("Contas a Receber")
 st.markdown("<span style='color: #A0AEC0;'>Acompanhe previsões de recebimento e pagamentos confirmados.</span>", unsafe_allow_html=True)
 
-# ==========================================
-# BANCO DE DADOS HÍBRIDO
-# ==========================================
-def conectar():
-    db_nome = st.session_state.get("db_nome", "financeiro.db")
-    conn, engine = conectar_banco(db_nome)
-    return conn, engine
-
-def executar_sql(conn, engine, query, params=()):
-    if engine == "postgres" and params:
-        query = query.replace("?", "%s")
-    cur = conn.cursor()
-    cur.execute(query, params)
-    conn.commit()
-    try: return cur.lastrowid
-    except: return 0
-
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -69,75 +30,7 @@ MESES_PT = {
 }
 NOME_PARA_NUMERO = {v: k for k, v in MESES_PT.items()}
 
-def fmt_brl(x: float) -> str:
-    try: return f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except: return "R$ 0,00"
-
-def limpar_txt(x: str) -> str:
-    try: return str(x).replace("\n", " ").strip()
-    except: return ""
-
-def badge_status_minimal_receber(status: str) -> str:
-    s = limpar_txt(status)
-    if s == "Recebido":
-        cor_bg, cor_tx, icon, texto = "rgba(0,204,150,0.12)", "#00CC96", icon_svg("check"), "Realizado"
-    elif s == "Atrasado":
-        cor_bg, cor_tx, icon, texto = "rgba(255,75,75,0.12)", "#FF4B4B", icon_svg("alert"), "Atrasado"
-    elif s == "Recebe em 7 dias":
-        cor_bg, cor_tx, icon, texto = "rgba(249,199,79,0.12)", "#F9C74F", icon_svg("calendar"), "Recebe em 7 dias"
-    else:
-        cor_bg, cor_tx, icon, texto = "rgba(249,199,79,0.12)", "#F9C74F", icon_svg("clock"), "A receber"
-
-    return f"""<span style="display:inline-flex; align-items:center; gap:8px; padding:6px 10px; border-radius:999px; font-size:12px; font-weight:700; color:{cor_tx}; background:{cor_bg}; border:1px solid rgba(255,255,255,0.08); white-space:nowrap;"><span style="display:inline-flex; color:{cor_tx};">{icon}</span>{texto}</span>"""
-
-# -----------------------------
-# Dados
-# -----------------------------
-try:
-    conn, engine = conectar()
-    query = """
-        SELECT t.id, t.descricao, c.nome, t.data_prevista, t.valor, t.status
-        FROM transactions t
-        LEFT JOIN categories c ON t.categoria_id = c.id
-        WHERE t.tipo = 'Entrada' AND t.usuario_dono = ?
-        ORDER BY t.data_prevista ASC
-    """
-    if engine == "postgres": query = query.replace("?", "%s")
-    df = pd.read_sql_query(query, conn, params=(usuario_logado,))
-    conn.close()
-    
-    # Blindando os nomes das colunas contra o banco na nuvem
-    df.columns = ["id", "Cliente_Descricao", "Categoria", "Previsao_Recebimento", "Valor", "Status_BD"]
-
-except Exception as e:
-    st.error(f"Erro ao conectar banco: {e}")
-    st.stop()
-
-if df.empty:
-    st.info("Nenhuma receita registrada ainda. Cadastre em 'Lançamentos'.")
-    df = pd.DataFrame(columns=["id", "Cliente_Descricao", "Categoria", "Previsao_Recebimento", "Valor", "Status_BD"])
-
-for col in ["Cliente_Descricao", "Categoria", "Status_BD"]:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.replace("\n", " ", regex=False).str.strip()
-
-df["Previsao_Recebimento"] = pd.to_datetime(df["Previsao_Recebimento"], errors="coerce").dt.date
-df["Prev_dt"] = pd.to_datetime(df["Previsao_Recebimento"], errors="coerce")
-
 hoje = date.today()
-em_7 = hoje + timedelta(days=7)
-
-def definir_status(row):
-    if row["Status_BD"] == "Realizado": return "Recebido"
-    if row["Previsao_Recebimento"] is None: return "A receber"
-    if row["Previsao_Recebimento"] < hoje: return "Atrasado"
-    if hoje <= row["Previsao_Recebimento"] <= em_7: return "Recebe em 7 dias"
-    return "A receber"
-
-if not df.empty:
-    df["Status"] = df.apply(definir_status, axis=1)
-else:
-    df["Status"] = []
 
 # -----------------------------
 # Filtros
@@ -159,23 +52,48 @@ with f3: busca = st.text_input("Buscar cliente/descrição", placeholder="Ex: ve
 f4, f5, f6 = st.columns([1.6, 1.6, 1.2])
 with f4: status_filtro = st.multiselect("Status", options=["Atrasado", "Recebe em 7 dias", "A receber", "Recebido"], default=["Atrasado", "Recebe em 7 dias", "A receber"])
 with f5:
-    cats = sorted([c for c in df["Categoria"].dropna().unique().tolist()]) if not df.empty else []
+    cats = sorted(categorias_do_usuario(db_ref, usuario_logado)["nome"].dropna().unique().tolist())
     categoria_sel = st.multiselect("Categoria", options=cats, default=[])
 with f6: ordenar = st.selectbox("Ordenar", options=["Previsão (mais próximo)", "Valor (maior)", "Valor (menor)"])
 
-df_f = pd.DataFrame()
-if not df.empty:
-    df_f = df[(df["Prev_dt"].dt.year == int(ano_sel)) & (df["Prev_dt"].dt.month == int(mes_sel))].copy()
+incluir_atrasados = st.checkbox("Incluir recebimentos atrasados de meses anteriores", value=False)
+
+inicio_mes = date(int(ano_sel), int(mes_sel), 1)
+fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+
+# -----------------------------
+# Dados (só o mês escolhido, já filtrado no banco)
+# -----------------------------
+try:
+    df = contas_do_periodo(
+        db_ref, usuario_logado, "Entrada", inicio_mes, fim_mes,
+        categorias=categoria_sel, busca=busca, incluir_atrasados=incluir_atrasados,
+    )
+
+    # Blindando os nomes das colunas contra o banco na nuvem
+    df.columns = ["id", "Cliente_Descricao", "Categoria", "Previsao_Recebimento", "Valor", "Status_BD"]
+
+except Exception as e:
+    st.error(f"Erro ao conectar banco: {e}")
+    st.stop()
+
+# Texto já gravado normalizado e previsão já em datetime64 pelo repository (Categoria/Status_BD em category).
+# A situação sai daqui uma vez e alimenta KPIs, filtro, badges e exportação.
+df["Status"] = classificar_situacao(df["Status_BD"], df["Previsao_Recebimento"], hoje, SITUACOES_RECEBER)
 
+df_f = df.copy()
+# Faixa do slider (None quando ele não aparece): recorta df_f, então entra na chave da exportação
+faixa = None
+if not df_f.empty:
+    # O status depende de "hoje", por isso é o único filtro que continua aqui
     if status_filtro: df_f = df_f[df_f["Status"].isin(status_filtro)]
-    if categoria_sel: df_f = df_f[df_f["Categoria"].isin(categoria_sel)]
-    if busca.strip(): df_f = df_f[df_f["Cliente_Descricao"].astype(str).str.contains(busca.strip(), case=False, na=False)]
 
     if not df_f.empty:
-        vmin, vmax = float(df_f["Valor"].min()), float(df_f["Valor"].max())
+        # Valor vem em centavos; o slider mostra reais e o filtro volta a comparar centavos
+        vmin, vmax = int(df_f["Valor"].min()), int(df_f["Valor"].max())
         if vmin < vmax:
-            faixa = st.slider("Faixa de valor (R$)", min_value=vmin, max_value=vmax, value=(vmin, vmax))
-            df_f = df_f[(df_f["Valor"] >= faixa[0]) & (df_f["Valor"] <= faixa[1])]
+            faixa = st.slider("Faixa de valor (R$)", min_value=vmin / 100, max_value=vmax / 100, value=(vmin / 100, vmax / 100))
+            df_f = df_f[(df_f["Valor"] >= round(faixa[0] * 100)) & (df_f["Valor"] <= round(faixa[1] * 100))]
         else:
             st.info(f"Faixa de valor: apenas um valor → {fmt_brl(vmin)}")
 
@@ -204,43 +122,62 @@ else:
     with m4: metric_card("Recebe em 7 dias", str(qtd_7), "Prioridade", "green" if qtd_7 == 0 else "red", icon_svg("calendar"))
 
 # -----------------------------
-# Ação rápida
+# Ação rápida (baixa em lote)
 # -----------------------------
 st.divider()
 st.subheader("Ação rápida")
 
+if st.session_state.get("baixa_receber_msg"):
+    st.success(st.session_state.pop("baixa_receber_msg"))
+
 if not df_f.empty:
     df_acao = df_f[df_f["Status_BD"] != "Realizado"].copy()
     if df_acao.empty:
         st.info("Nada para marcar como recebido com os filtros atuais.")
     else:
-        df_acao["prev_fmt"] = pd.to_datetime(df_acao["Previsao_Recebimento"]).dt.strftime("%d/%m/%Y")
-        df_acao["valor_fmt"] = df_acao["Valor"].apply(fmt_brl)
-
-        op = df_acao.apply(lambda r: f"{limpar_txt(r['Cliente_Descricao'])} | {r['prev_fmt']} | {r['valor_fmt']} | {r['Status']}", axis=1).tolist()
-        map_id = dict(zip(op, df_acao["id"].tolist()))
-
-        cA1, cA2 = st.columns([3, 1])
-        with cA1:
-            escolha = st.selectbox("Selecione a entrada:", options=op)
-            id_sel = int(map_id[escolha])
-        with cA2:
-            if st.button("Marcar como recebido", type="primary", use_container_width=True):
-                st.session_state["confirmar_recebido_id"] = id_sel
-
-        if st.session_state.get("confirmar_recebido_id") == id_sel:
-            st.warning("Confirme: isso marcará como Realizado.")
+        df_acao["prev_fmt"] = df_acao["Previsao_Recebimento"].dt.strftime("%d/%m/%Y")
+        df_acao["valor_fmt"] = fmt_brl_serie(df_acao["Valor"])
+
+        rotulos = dict(zip(
+            df_acao["id"].astype(int),
+            df_acao["Cliente_Descricao"] + " | " + df_acao["prev_fmt"] + " | " + df_acao["valor_fmt"] + " | " + df_acao["Status"].astype(str),
+        ))
+
+        todas = st.checkbox(f"Selecionar todas em aberto ({len(rotulos)})", key="baixa_receber_todas")
+        ids_sel = st.multiselect(
+            "Selecione as entradas:", options=list(rotulos), format_func=rotulos.get,
+            default=list(rotulos) if todas else [], key=f"baixa_receber_ids_{todas}",
+        )
+
+        df_contas_rc = contas_do_usuario(db_ref, usuario_logado)
+        opcoes_conta = ["Manter a conta de cada lançamento"] + df_contas_rc["nome"].tolist()
+
+        cA1, cA2, cA3 = st.columns([1.2, 1.8, 1.2])
+        with cA1: data_recebimento = st.date_input("Data do recebimento", value=hoje, format="DD/MM/YYYY", key="baixa_receber_data")
+        with cA2: conta_recebimento = st.selectbox("Recebido na conta", options=opcoes_conta, key="baixa_receber_conta")
+        total_sel = int(df_acao[df_acao["id"].isin(ids_sel)]["Valor"].sum())
+
+        with cA3:
+            st.write("")
+            if st.button(f"Marcar {len(ids_sel)} como recebido(s)", type="primary", disabled=not ids_sel, use_container_width=True):
+                st.session_state["confirmar_recebidos"] = sorted(ids_sel)
+
+        if ids_sel and st.session_state.get("confirmar_recebidos") == sorted(ids_sel):
+            st.warning(f"Confirme: {len(ids_sel)} entrada(s), {fmt_brl(total_sel)}, serão marcadas como Realizado.")
             if st.button("Confirmar recebimento", use_container_width=True):
-                conn, engine = conectar()
+                conta_id = None
+                if conta_recebimento != opcoes_conta[0]:
+                    conta_id = int(df_contas_rc[df_contas_rc["nome"] == conta_recebimento]["id"].iloc[0])
                 try:
-                    executar_sql(conn, engine, "UPDATE transactions SET status='Realizado', data_real=? WHERE id=? AND usuario_dono=?", (date.today(), id_sel, usuario_logado))
-                    st.success("Recebimento confirmado.")
-                    st.session_state.pop("confirmar_recebido_id", None)
+                    marcar_realizados(db_ref, usuario_logado, ids_sel, data_recebimento, conta_id=conta_id)
+                    audit.registrar(db_ref, usuario_logado, "Baixa de recebimentos", f"IDs {sorted(ids_sel)} | {data_recebimento:%d/%m/%Y} | {total_sel / 100:.2f}")
+                    st.session_state.pop("confirmar_recebidos", None)
+                    st.session_state["baixa_receber_msg"] = f"{len(ids_sel)} recebimento(s) confirmado(s) · {fmt_brl(total_sel)}"
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro: {e}")
-                finally:
-                    conn.close()
+        elif ids_sel:
+            st.caption(f"Selecionado: {fmt_brl(total_sel)}")
 
 # -----------------------------
 # Tabela Detalhada
@@ -253,31 +190,17 @@ if df_f.empty:
 else:
     df_view = df_f[["Status", "Previsao_Recebimento", "Cliente_Descricao", "Categoria", "Valor"]].copy()
     df_view.rename(columns={"Previsao_Recebimento": "Data", "Cliente_Descricao": "Descrição"}, inplace=True)
-    df_view["Descrição"] = df_view["Descrição"].apply(limpar_txt)
-    df_view["Categoria"] = df_view["Categoria"].apply(limpar_txt)
-    df_view["Data"] = pd.to_datetime(df_view["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-    df_view["Valor"] = df_view["Valor"].apply(fmt_brl)
-    df_view["Status"] = df_view["Status"].apply(badge_status_minimal_receber)
-
-    df_export = df_f[["Status", "Previsao_Recebimento", "Cliente_Descricao", "Categoria", "Valor"]].copy()
-    df_export.rename(columns={"Previsao_Recebimento": "Data", "Cliente_Descricao": "Descrição"}, inplace=True)
-    df_export["Descrição"] = df_export["Descrição"].apply(limpar_txt)
-    df_export["Categoria"] = df_export["Categoria"].apply(limpar_txt)
-    df_export["Data"] = pd.to_datetime(df_export["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-    df_export["Valor"] = df_export["Valor"].apply(fmt_brl)
-    df_export["Status"] = df_export["Status"].astype(str).str.replace("\n", " ", regex=False).str.strip()
-
-    e1, e2 = st.columns([1, 1])
-    with e1:
-        st.download_button("Baixar CSV", data=df_export.to_csv(index=False, sep=";").encode("utf-8"), file_name=f"contas_a_receber_{ano_sel}_{mes_sel:02d}.csv", mime="text/csv", use_container_width=True)
-    with e2:
-        try:
-            import io
-            buf = io.BytesIO()
-            with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-                df_export.to_excel(writer, index=False, sheet_name="Contas a Receber")
-            st.download_button("Baixar Excel", data=buf.getvalue(), file_name=f"contas_a_receber_{ano_sel}_{mes_sel:02d}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
-        except:
-            st.warning("Para baixar Excel: pip install openpyxl")
-
-    st.markdown(f'<div class="dt-table">{df_view.to_html(escape=False, index=False)}</div>', unsafe_allow_html=True)
+
+    def montar_export():
+        df_export = df_view.copy()
+        df_export["Data"] = df_export["Data"].dt.strftime("%d/%m/%Y")
+        df_export["Valor"] = fmt_brl_serie(df_export["Valor"])
+        return df_export
+
+    exportacao(
+        db_ref, usuario_logado, "export_receber",
+        (ano_sel, mes_sel, busca, tuple(status_filtro), tuple(categoria_sel), ordenar, incluir_atrasados, hoje, faixa),
+        montar_export, f"contas_a_receber_{ano_sel}_{mes_sel:02d}", "Contas a Receber",
+    )
+
+    tabela_paginada(df_view, "tabela_receber", etiquetas={"Status": CORES_RECEBER}, formatos={"Valor": fmt_brl})
@@ -1,52 +1,29 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
-import plotly.express as px
 from datetime import date, timedelta, datetime, timezone
 
-from style import carregar_estilos
+from bootstrap import iniciar_pagina
 from components import metric_card, icon_svg
+from formatting import fmt_brl, fmt_brl_serie
 from auth import exigir_login
-from database import conectar_banco
+from exports import exportacao
+from repository import contas_do_usuario, movimentos_fluxo, saldos_por_conta_em
 
 # 1) Configuração
-st.set_page_config(
-    page_title="Fluxo de Caixa | D.Tech", 
-    page_icon="logo.png",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
-try:
-    st.logo("logo.png")
-except:
-    pass
-
-carregar_estilos()
+iniciar_pagina("Fluxo de Caixa | D.Tech")
 
 exigir_login()
 
 # Captura quem é o usuário logado agora
 usuario_logado = st.session_state.get("usuario_atual", "danilo")
+db_ref = st.session_state.get("db_nome", "financeiro.db")
 
 st.title("Fluxo de Caixa")
 st.markdown("<span style='color: #A0AEC0;'>Visão diária das entradas, saídas e evolução do saldo acumulado.</span>", unsafe_allow_html=True)
 
-# ==========================================
-# BANCO DE DADOS HÍBRIDO
-# ==========================================
-def conectar():
-    db_nome = st.session_state.get("db_nome", "financeiro.db")
-    conn, engine = conectar_banco(db_nome)
-    return conn, engine
-
 # -----------------------------
 # Helpers
 # -----------------------------
-def fmt_brl(x: float) -> str:
-    try: return f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except: return "R$ 0,00"
-
 # 🚀 NOVA FUNÇÃO: Forçar o Fuso Horário do Brasil (Brasília UTC-3)
 def obter_hoje_br():
     fuso_br = timezone(timedelta(hours=-3))
@@ -83,49 +60,35 @@ if data_fim < data_inicio:
 # -----------------------------
 # Dados (Filtrados por dono)
 # -----------------------------
-conn, engine = conectar()
-if base.startswith("Realizado"):
-    query = "SELECT tipo, valor, data_real as data_base FROM transactions WHERE data_real IS NOT NULL AND usuario_dono = ?"
-else:
-    query = "SELECT tipo, valor, data_prevista as data_base FROM transactions WHERE usuario_dono = ?"
-
-if engine == "postgres": query = query.replace("?", "%s")
-df = pd.read_sql_query(query, conn, params=(usuario_logado,))
-conn.close()
-
-if df.empty:
-    st.info("Nenhuma movimentação registrada para gerar o fluxo de caixa.")
-    st.stop()
-
-df["data_base"] = pd.to_datetime(df["data_base"], errors="coerce").dt.date
-df = df.dropna(subset=["data_base"])
+base_realizado = base.startswith("Realizado")
 
-df_antes = df[df["data_base"] < data_inicio]
-entradas_antes = df_antes[df_antes["tipo"] == "Entrada"]["valor"].sum()
-saidas_antes = df_antes[df_antes["tipo"] == "Saída"]["valor"].sum()
-saldo_inicial = float(entradas_antes - saidas_antes)
+# Saldo inicial por conta a partir dos checkpoints mensais; só o período em si sai do razão.
+# Tudo em centavos inteiros (somas e acumulado exatos); reais só em fmt_brl e nos gráficos
+df_saldos = saldos_por_conta_em(db_ref, usuario_logado, data_inicio, base_realizado=base_realizado)
+saldo_inicial = int(df_saldos["saldo_centavos"].sum())
 
-mask = (df["data_base"] >= data_inicio) & (df["data_base"] <= data_fim)
-df_periodo = df[mask]
+df_periodo = movimentos_fluxo(db_ref, usuario_logado, data_inicio, data_fim + timedelta(days=1), base_realizado=base_realizado)
+df_periodo["data_base"] = df_periodo["data_base"].dt.date
+df_periodo = df_periodo.dropna(subset=["data_base"])
 
 if df_periodo.empty:
     st.warning("Nenhum lançamento encontrado neste período.")
     metric_card("Saldo inicial", fmt_brl(saldo_inicial), "Antes do período", "gray", icon_svg("wallet"))
     st.stop()
 
-df_agrupado = df_periodo.pivot_table(index="data_base", columns="tipo", values="valor", aggfunc="sum").fillna(0)
+df_agrupado = df_periodo.pivot_table(index="data_base", columns="tipo", values="valor_centavos", aggfunc="sum").fillna(0).astype("int64")
 
-if "Entrada" not in df_agrupado.columns: df_agrupado["Entrada"] = 0.0
-if "Saída" not in df_agrupado.columns: df_agrupado["Saída"] = 0.0
+if "Entrada" not in df_agrupado.columns: df_agrupado["Entrada"] = 0
+if "Saída" not in df_agrupado.columns: df_agrupado["Saída"] = 0
 
 df_agrupado["Saldo do Dia"] = df_agrupado["Entrada"] - df_agrupado["Saída"]
 df_agrupado["Saldo Acumulado"] = saldo_inicial + df_agrupado["Saldo do Dia"].cumsum()
 df_agrupado = df_agrupado.reset_index().rename(columns={"data_base": "Data"})
 
-total_entradas = float(df_agrupado["Entrada"].sum())
-total_saidas = float(df_agrupado["Saída"].sum())
-resultado = float(total_entradas - total_saidas)
-saldo_final = float(df_agrupado["Saldo Acumulado"].iloc[-1])
+total_entradas = int(df_agrupado["Entrada"].sum())
+total_saidas = int(df_agrupado["Saída"].sum())
+resultado = total_entradas - total_saidas
+saldo_final = int(df_agrupado["Saldo Acumulado"].iloc[-1])
 
 # -----------------------------
 # Resumo
@@ -140,17 +103,41 @@ with m2: metric_card("Entradas", fmt_brl(total_entradas), "Receitas no período"
 with m3: metric_card("Saídas", fmt_brl(total_saidas), "Despesas no período", "red" if total_saidas > 0 else "green", icon_svg("down"))
 with m4: metric_card("Saldo final", fmt_brl(saldo_final), f"Resultado: {fmt_brl(resultado)}", "green" if saldo_final >= 0 else "red", icon_svg("trend"))
 
+# -----------------------------
+# Saldo por conta (checkpoints + movimentos do período que já estão na memória)
+# -----------------------------
+with st.expander("Ver saldo por conta"):
+    df_mov_conta = df_periodo.pivot_table(index="conta_id", columns="tipo", values="valor_centavos", aggfunc="sum").reindex(columns=["Entrada", "Saída"]).fillna(0)
+    df_conta = (
+        df_saldos.set_index("conta_id")[["saldo_centavos"]].rename(columns={"saldo_centavos": "Saldo inicial"})
+        .join(df_mov_conta, how="outer").fillna(0).astype("int64")
+    )
+    df_conta["Saldo final"] = df_conta["Saldo inicial"] + df_conta["Entrada"] - df_conta["Saída"]
+
+    df_contas = contas_do_usuario(db_ref, usuario_logado)
+    nomes_contas = dict(zip(df_contas["id"].astype(int), df_contas["nome"]))
+    df_conta.index = [nomes_contas.get(int(i), "Sem conta") for i in df_conta.index]
+    df_conta = df_conta.rename(columns={"Entrada": "Entradas", "Saída": "Saídas"})[["Saldo inicial", "Entradas", "Saídas", "Saldo final"]]
+
+    for col in df_conta.columns:
+        df_conta[col] = fmt_brl_serie(df_conta[col])
+
+    st.dataframe(df_conta.rename_axis("Conta").reset_index(), hide_index=True, use_container_width=True)
+
 # -----------------------------
 # Gráficos
 # -----------------------------
 st.divider()
 st.subheader("Evolução do saldo e movimentações")
 
+# Import tardio: login pendente e período sem lançamentos param antes e não pagam o plotly
+import plotly.express as px
+
 g1, g2 = st.columns([2, 1])
 
 with g1:
     fig_line = px.line(
-        df_agrupado, x="Data", y="Saldo Acumulado", markers=True,
+        df_agrupado.assign(**{"Saldo Acumulado": df_agrupado["Saldo Acumulado"] / 100}), x="Data", y="Saldo Acumulado", markers=True,
         labels={"Data": "Data", "Saldo Acumulado": "Saldo (R$)"}, template="plotly_dark"
     )
     cor_linha = "#00D1FF" if saldo_final >= 0 else "#FF4B4B"
@@ -159,7 +146,7 @@ with g1:
     st.plotly_chart(fig_line, use_container_width=True)
 
 with g2:
-    df_totais = pd.DataFrame({"Tipo": ["Entradas", "Saídas"], "Valor": [total_entradas, total_saidas]})
+    df_totais = pd.DataFrame({"Tipo": ["Entradas", "Saídas"], "Valor": [total_entradas / 100, total_saidas / 100]})
     fig_bar = px.bar(
         df_totais, x="Tipo", y="Valor", color="Tipo", 
         color_discrete_map={"Entradas": "#00D1FF", "Saídas": "#FF4B4B"}, 
@@ -177,20 +164,12 @@ with st.expander("Ver tabela detalhada dia a dia"):
     df_tabela["Data"] = pd.to_datetime(df_tabela["Data"]).dt.strftime("%d/%m/%Y")
 
     for col in ["Entrada", "Saída", "Saldo do Dia", "Saldo Acumulado"]:
-        df_tabela[col] = df_tabela[col].apply(fmt_brl)
+        df_tabela[col] = fmt_brl_serie(df_tabela[col])
 
     st.dataframe(df_tabela, hide_index=True, use_container_width=True)
 
-    e1, e2 = st.columns([1, 1])
-    with e1:
-        csv_data = df_tabela.to_csv(index=False, sep=";").encode("utf-8")
-        st.download_button("Baixar CSV", data=csv_data, file_name=f"fluxo_caixa_{data_inicio}_{data_fim}.csv", mime="text/csv", use_container_width=True)
-    with e2:
-        try:
-            import io
-            buf = io.BytesIO()
-            with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-                df_tabela.to_excel(writer, index=False, sheet_name="Fluxo de Caixa")
-            st.download_button("Baixar Excel", data=buf.getvalue(), file_name=f"fluxo_caixa_{data_inicio}_{data_fim}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
-        except:
-            st.warning("Para baixar Excel: pip install openpyxl")
+    # A tabela já está formatada para a tela; o arquivo só é montado no "Gerar arquivo"
+    exportacao(
+        db_ref, usuario_logado, "export_fluxo", (data_inicio, data_fim, base),
+        lambda: df_tabela, f"fluxo_caixa_{data_inicio}_{data_fim}", "Fluxo de Caixa",
+    )
@@ -1,25 +1,14 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
 
-from style import carregar_estilos
+from bootstrap import iniciar_pagina
 from auth import exigir_login
-from database import conectar_banco
-
-# 1) Configuração
-st.set_page_config(
-    page_title="Cadastros | D.Tech", 
-    page_icon="logo.png",
-    layout="wide",
-    initial_sidebar_state="collapsed"
+from exports import exportacao
+from repository import (
+    contas_do_usuario, categorias_do_usuario, inserir_conta, excluir_conta, inserir_categoria, excluir_categoria,
 )
 
-try:
-    st.logo("logo.png")
-except:
-    pass
-
-carregar_estilos()
+# 1) Configuração
+iniciar_pagina("Cadastros | D.Tech")
 
 st.markdown("""
 <style>
@@ -33,27 +22,11 @@ exigir_login()
 
 # Captura quem é o usuário logado agora
 usuario_logado = st.session_state.get("usuario_atual", "danilo")
+db_ref = st.session_state.get("db_nome", "financas.db")
 
 st.title("Cadastros")
 st.markdown("<span style='color: #A0AEC0;'>Gerencie contas bancárias/caixa e categorias de receitas e despesas.</span>", unsafe_allow_html=True)
 
-# ==========================================
-# BANCO DE DADOS HÍBRIDO (SQLite/Postgres)
-# ==========================================
-def conectar():
-    db_nome = st.session_state.get("db_nome", "financas.db")
-    conn, engine = conectar_banco(db_nome)
-    return conn, engine
-
-def executar_sql(conn, engine, query, params=()):
-    if engine == "postgres" and params:
-        query = query.replace("?", "%s")
-    cur = conn.cursor()
-    cur.execute(query, params)
-    conn.commit()
-    try: return cur.lastrowid
-    except: return 0
-
 tab1, tab2 = st.tabs(["Contas (Bancos/Caixa)", "Categorias"])
 
 # -------------------------
@@ -71,10 +44,8 @@ with tab1:
 
             if submit_conta:
                 if nome_conta.strip():
-                    conn, engine = conectar()
                     # Salva a conta com a etiqueta do usuário
-                    executar_sql(conn, engine, "INSERT INTO accounts (nome, tipo, usuario_dono) VALUES (?, ?, ?)", (nome_conta.strip(), tipo_conta, usuario_logado))
-                    conn.close()
+                    inserir_conta(db_ref, usuario_logado, nome_conta.strip(), tipo_conta)
                     st.success("Conta cadastrada com sucesso.")
                     st.rerun()
                 else:
@@ -83,16 +54,13 @@ with tab1:
         st.divider()
         st.subheader("Ação rápida")
 
-        conn, engine = conectar()
-        query_contas_raw = "SELECT id, nome, tipo FROM accounts WHERE usuario_dono=? ORDER BY id DESC"
-        if engine == "postgres": query_contas_raw = query_contas_raw.replace("?", "%s")
-        df_contas_raw = pd.read_sql_query(query_contas_raw, conn, params=(usuario_logado,))
-        conn.close()
+        # Uma leitura só alimenta a ação rápida e a tabela ao lado
+        df_contas_raw = contas_do_usuario(db_ref, usuario_logado).sort_values("id", ascending=False)
 
         if df_contas_raw.empty:
             st.info("Nenhuma conta cadastrada ainda.")
         else:
-            op = df_contas_raw.apply(lambda r: f"ID {r['id']} | {r['nome']} ({r['tipo']})", axis=1).tolist()
+            op = ("ID " + df_contas_raw["id"].astype(str) + " | " + df_contas_raw["nome"] + " (" + df_contas_raw["tipo"] + ")").tolist()
             map_id = dict(zip(op, df_contas_raw["id"].tolist()))
 
             escolha = st.selectbox("Selecionar conta", options=op, key="select_conta_acao")
@@ -106,14 +74,11 @@ with tab1:
             with c2:
                 if st.session_state.get("conf_excluir_conta") == id_sel:
                     if st.button("Confirmar exclusão", key="btn_confirmar_excluir_conta", type="primary", use_container_width=True):
-                        conn, engine = conectar()
                         try:
-                            executar_sql(conn, engine, "DELETE FROM accounts WHERE id=? AND usuario_dono=?", (id_sel, usuario_logado))
+                            excluir_conta(db_ref, usuario_logado, id_sel)
                             st.success("Conta excluída.")
                         except Exception as e:
                             st.error("Não foi possível excluir. Talvez existam lançamentos vinculados a esta conta.")
-                        finally:
-                            conn.close()
 
                         st.session_state.pop("conf_excluir_conta", None)
                         st.rerun()
@@ -122,11 +87,7 @@ with tab1:
         st.subheader("Contas cadastradas")
         busca = st.text_input("Buscar conta", placeholder="Digite para filtrar...", key="busca_conta")
 
-        conn, engine = conectar()
-        query_contas = "SELECT id as ID, nome as Nome, tipo as Tipo FROM accounts WHERE usuario_dono=? ORDER BY id DESC"
-        if engine == "postgres": query_contas = query_contas.replace("?", "%s")
-        df_contas = pd.read_sql_query(query_contas, conn, params=(usuario_logado,))
-        conn.close()
+        df_contas = df_contas_raw.rename(columns={"id": "ID", "nome": "Nome", "tipo": "Tipo"})
 
         if busca.strip():
             df_contas = df_contas[df_contas["Nome"].astype(str).str.contains(busca.strip(), case=False, na=False)]
@@ -134,18 +95,7 @@ with tab1:
         if df_contas.empty:
             st.info("Nenhuma conta encontrada.")
         else:
-            e1, e2 = st.columns(2)
-            with e1:
-                st.download_button("Baixar CSV", data=df_contas.to_csv(index=False, sep=";").encode("utf-8"), file_name="contas.csv", mime="text/csv", use_container_width=True, key="down_contas_csv")
-            with e2:
-                try:
-                    import io
-                    buf = io.BytesIO()
-                    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-                        df_contas.to_excel(writer, index=False, sheet_name="Contas")
-                    st.download_button("Baixar Excel", data=buf.getvalue(), file_name="contas.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True, key="down_contas_xlsx")
-                except:
-                    st.warning("Para baixar Excel: pip install openpyxl")
+            exportacao(db_ref, usuario_logado, "export_contas", (busca.strip(),), lambda: df_contas, "contas", "Contas")
 
             st.dataframe(df_contas, hide_index=True, use_container_width=True)
 
@@ -164,9 +114,7 @@ with tab2:
 
             if submit_categoria:
                 if nome_categoria.strip():
-                    conn, engine = conectar()
-                    executar_sql(conn, engine, "INSERT INTO categories (nome, tipo, usuario_dono) VALUES (?, ?, ?)", (nome_categoria.strip(), tipo_categoria, usuario_logado))
-                    conn.close()
+                    inserir_categoria(db_ref, usuario_logado, nome_categoria.strip(), tipo_categoria)
                     st.success("Categoria cadastrada com sucesso.")
                     st.rerun()
                 else:
@@ -175,16 +123,12 @@ with tab2:
         st.divider()
         st.subheader("Ação rápida")
 
-        conn, engine = conectar()
-        query_cat_raw = "SELECT id, nome, tipo FROM categories WHERE usuario_dono=? ORDER BY id DESC"
-        if engine == "postgres": query_cat_raw = query_cat_raw.replace("?", "%s")
-        df_cat_raw = pd.read_sql_query(query_cat_raw, conn, params=(usuario_logado,))
-        conn.close()
+        df_cat_raw = categorias_do_usuario(db_ref, usuario_logado).sort_values("id", ascending=False)
 
         if df_cat_raw.empty:
             st.info("Nenhuma categoria cadastrada ainda.")
         else:
-            op = df_cat_raw.apply(lambda r: f"ID {r['id']} | {r['nome']} ({r['tipo']})", axis=1).tolist()
+            op = ("ID " + df_cat_raw["id"].astype(str) + " | " + df_cat_raw["nome"] + " (" + df_cat_raw["tipo"] + ")").tolist()
             map_id = dict(zip(op, df_cat_raw["id"].tolist()))
 
             escolha = st.selectbox("Selecionar categoria", options=op, key="select_cat_acao")
@@ -198,14 +142,11 @@ with tab2:
             with c2:
                 if st.session_state.get("conf_excluir_cat") == id_sel:
                     if st.button("Confirmar exclusão", key="btn_confirmar_excluir_cat", type="primary", use_container_width=True):
-                        conn, engine = conectar()
                         try:
-                            executar_sql(conn, engine, "DELETE FROM categories WHERE id=? AND usuario_dono=?", (id_sel, usuario_logado))
+                            excluir_categoria(db_ref, usuario_logado, id_sel)
                             st.success("Categoria excluída.")
                         except Exception as e:
                             st.error("Não foi possível excluir. Talvez existam lançamentos vinculados a esta categoria.")
-                        finally:
-                            conn.close()
 
                         st.session_state.pop("conf_excluir_cat", None)
                         st.rerun()
@@ -214,11 +155,7 @@ with tab2:
         st.subheader("Categorias cadastradas")
         busca = st.text_input("Buscar categoria", placeholder="Digite para filtrar...", key="busca_cat")
 
-        conn, engine = conectar()
-        query_categorias = "SELECT id as ID, nome as Nome, tipo as Tipo FROM categories WHERE usuario_dono=? ORDER BY id DESC"
-        if engine == "postgres": query_categorias = query_categorias.replace("?", "%s")
-        df_categorias = pd.read_sql_query(query_categorias, conn, params=(usuario_logado,))
-        conn.close()
+        df_categorias = df_cat_raw.rename(columns={"id": "ID", "nome": "Nome", "tipo": "Tipo"})
 
         if busca.strip():
             df_categorias = df_categorias[df_categorias["Nome"].astype(str).str.contains(busca.strip(), case=False, na=False)]
@@ -226,17 +163,6 @@ with tab2:
         if df_categorias.empty:
             st.info("Nenhuma categoria encontrada.")
         else:
-            e1, e2 = st.columns(2)
-            with e1:
-                st.download_button("Baixar CSV", data=df_categorias.to_csv(index=False, sep=";").encode("utf-8"), file_name="categorias.csv", mime="text/csv", use_container_width=True, key="down_cat_csv")
-            with e2:
-                try:
-                    import io
-                    buf = io.BytesIO()
-                    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-                        df_categorias.to_excel(writer, index=False, sheet_name="Categorias")
-                    st.download_button("Baixar Excel", data=buf.getvalue(), file_name="categorias.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True, key="down_cat_xlsx")
-                except:
-                    st.warning("Para baixar Excel: pip install openpyxl")
+            exportacao(db_ref, usuario_logado, "export_categorias", (busca.strip(),), lambda: df_categorias, "categorias", "Categorias")
 
             st.dataframe(df_categorias, hide_index=True, use_container_width=True)
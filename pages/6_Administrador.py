@@ -1,13 +1,18 @@
 import streamlit as st
-import sqlite3
+import pandas as pd
 import os
 from datetime import date, timedelta
 
-from database import inicializar_banco
-from auth import exigir_login
+from database import eh_postgres, inicializar_banco, metricas_pool
+from auth import exigir_login, preparar_admin, ref_admin
+from bootstrap import iniciar_pagina
+from formatting import fmt_brl, fmt_brl_serie
+from repository import (
+    atualizar_plano_cliente, clientes_admin, contar_clientes, criar_cliente, definir_ativo_cliente, excluir_cliente,
+    estatisticas_consultas, liberar_acesso_cliente, para_centavos,
+)
 
-st.set_page_config(page_title="Administração", page_icon="⚙️", layout="wide")
-st.logo("logo.png")
+iniciar_pagina("Administração", icone="⚙️", sidebar="auto", estilos=False)
 
 # ============================
 # UI COMPACTA (SIDEBAR MENOR + CONTEÚDO MAIOR)
@@ -48,150 +53,6 @@ st.divider()
 
 col1, col2 = st.columns([1, 2])
 
-# -----------------------------
-# Helpers
-# -----------------------------
-def fmt_brl(x):
-    try:
-        return f"R$ {float(x):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "R$ 0,00"
-
-
-def conectar_admin():
-    db_url = os.getenv("DATABASE_URL", "").strip()
-    usando_postgres = bool(db_url)
-
-    if usando_postgres:
-        import psycopg2
-        conn = psycopg2.connect(
-            db_url,
-            sslmode="require",
-            connect_timeout=10
-        )
-        return conn, True, db_url
-
-    conn = sqlite3.connect("admin.db")
-    return conn, False, "admin.db"
-
-
-def preparar_admin(conn, usando_postgres, db_url):
-    cur = conn.cursor()
-    try:
-        # Tabela base
-        if usando_postgres:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    usuario TEXT PRIMARY KEY,
-                    senha TEXT,
-                    db_nome TEXT,
-                    empresa TEXT,
-                    ativo INTEGER DEFAULT 1
-                )
-            """)
-
-            # Migrações seguras no Postgres
-            cur.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS ativo INTEGER DEFAULT 1")
-            cur.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS plano TEXT DEFAULT 'Starter'")
-            cur.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS valor_mensal DOUBLE PRECISION DEFAULT 0")
-            cur.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS vencimento TEXT")
-
-        else:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    usuario TEXT PRIMARY KEY,
-                    senha TEXT,
-                    db_nome TEXT,
-                    empresa TEXT,
-                    ativo INTEGER DEFAULT 1
-                )
-            """)
-
-            # Migrações SQLite
-            try:
-                cur.execute("ALTER TABLE usuarios ADD COLUMN ativo INTEGER DEFAULT 1")
-            except Exception:
-                pass
-
-            try:
-                cur.execute("ALTER TABLE usuarios ADD COLUMN plano TEXT DEFAULT 'Starter'")
-            except Exception:
-                pass
-
-            try:
-                cur.execute("ALTER TABLE usuarios ADD COLUMN valor_mensal REAL DEFAULT 0")
-            except Exception:
-                pass
-
-            try:
-                cur.execute("ALTER TABLE usuarios ADD COLUMN vencimento TEXT")
-            except Exception:
-                pass
-
-        # Garante usuário principal
-        if usando_postgres:
-            cur.execute("SELECT usuario FROM usuarios WHERE usuario=%s", ("danilo",))
-            existe = cur.fetchone()
-
-            if not existe:
-                cur.execute("""
-                    INSERT INTO usuarios (
-                        usuario, senha, db_nome, empresa, ativo, plano, valor_mensal, vencimento
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    "danilo",
-                    "09011998Dan*",
-                    db_url,
-                    "D.Tech - Danilo Diogo",
-                    1,
-                    "Business",
-                    0,
-                    None
-                ))
-            else:
-                cur.execute("""
-                    UPDATE usuarios
-                    SET empresa=%s
-                    WHERE usuario=%s
-                """, ("D.Tech - Danilo Diogo", "danilo"))
-
-        else:
-            cur.execute("SELECT usuario FROM usuarios WHERE usuario=?", ("danilo",))
-            existe = cur.fetchone()
-
-            if not existe:
-                cur.execute("""
-                    INSERT INTO usuarios (
-                        usuario, senha, db_nome, empresa, ativo, plano, valor_mensal, vencimento
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    "danilo",
-                    "09011998Dan*",
-                    "dominio.db",
-                    "D.Tech - Danilo Diogo",
-                    1,
-                    "Business",
-                    0,
-                    None
-                ))
-            else:
-                cur.execute("""
-                    UPDATE usuarios
-                    SET empresa=?
-                    WHERE usuario=?
-                """, ("D.Tech - Danilo Diogo", "danilo"))
-
-        conn.commit()
-
-    except Exception:
-        conn.rollback()
-        raise
-
-    finally:
-        cur.close()
-
 
 PLANOS = {
     "Starter": 49.90,
@@ -239,77 +100,27 @@ with col1:
                 elif " " in novo_user:
                     st.warning("O login não pode conter espaços.")
                 else:
-                    conn, usando_postgres, db_ref = conectar_admin()
+                    admin_ref = ref_admin()
+                    preparar_admin(admin_ref)
+                    novo_db = f"cliente_{novo_user}.db"
                     try:
-                        preparar_admin(conn, usando_postgres, db_ref)
-                        cur = conn.cursor()
-
-                        novo_db = f"cliente_{novo_user}.db"
-
-                        if usando_postgres:
-                            cur.execute("SELECT usuario FROM usuarios WHERE usuario=%s", (novo_user,))
-                            existe = cur.fetchone()
-
-                            if existe:
-                                st.error("Erro: este usuário já existe.")
-                            else:
-                                cur.execute("""
-                                    INSERT INTO usuarios (
-                                        usuario, senha, db_nome, empresa, ativo, plano, valor_mensal, vencimento
-                                    )
-                                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                                """, (
-                                    novo_user,
-                                    None,
-                                    novo_db,
-                                    nova_empresa,
-                                    1,
-                                    plano_sel,
-                                    float(valor_mensal),
-                                    vencimento.isoformat()
-                                ))
-                                conn.commit()
-                                inicializar_banco(db_ref)
-                                st.success(f"Cliente **{novo_user}** criado com sucesso!")
-                                st.balloons()
-
+                        if criar_cliente(admin_ref, novo_user, nova_empresa, novo_db, plano_sel, valor_mensal, vencimento):
+                            # No Postgres todos os clientes ficam no mesmo banco do cofre
+                            inicializar_banco(admin_ref if eh_postgres(admin_ref) else novo_db)
+                            st.success(f"Cliente **{novo_user}** criado com sucesso!")
+                            st.balloons()
                         else:
-                            cur.execute("SELECT usuario FROM usuarios WHERE usuario=?", (novo_user,))
-                            existe = cur.fetchone()
-
-                            if existe:
-                                st.error("Erro: este usuário já existe.")
-                            else:
-                                cur.execute("""
-                                    INSERT INTO usuarios (
-                                        usuario, senha, db_nome, empresa, ativo, plano, valor_mensal, vencimento
-                                    )
-                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                """, (
-                                    novo_user,
-                                    "",
-                                    novo_db,
-                                    nova_empresa,
-                                    1,
-                                    plano_sel,
-                                    float(valor_mensal),
-                                    vencimento.isoformat()
-                                ))
-                                conn.commit()
-                                inicializar_banco(novo_db)
-                                st.success(f"Cliente **{novo_user}** criado com sucesso!")
-                                st.balloons()
-
-                        cur.close()
-
+                            st.error("Erro: este usuário já existe.")
                     except Exception as e:
                         st.error(f"Falha ao criar cliente: {e}")
-                    finally:
-                        conn.close()
 
 # ==================================================
 # COLUNA DIREITA: LISTA / GESTÃO
 # ==================================================
+# Filtros e paginação rodam no banco; a tabela mostra só a página atual e os
+# botões/formulários existem apenas para o cliente selecionado.
+TAMANHO_PAGINA_CLIENTES = 25
+
 with col2:
     st.subheader("Gestão de Clientes")
 
@@ -321,249 +132,238 @@ with col2:
     with f3:
         somente_vencidos = st.checkbox("Somente vencidos", value=False)
 
-    conn, usando_postgres, db_ref = conectar_admin()
-    try:
-        preparar_admin(conn, usando_postgres, db_ref)
-        cur = conn.cursor()
-
-        if usando_postgres:
-            cur.execute("""
-                SELECT usuario, empresa, db_nome, ativo, senha, plano, valor_mensal, vencimento
-                FROM usuarios
-                WHERE usuario != %s
-                ORDER BY empresa ASC
-            """, ("danilo",))
-        else:
-            cur.execute("""
-                SELECT usuario, empresa, db_nome, ativo, senha, plano, valor_mensal, vencimento
-                FROM usuarios
-                WHERE usuario != ?
-                ORDER BY empresa COLLATE NOCASE ASC
-            """, ("danilo",))
-
-        clientes = cur.fetchall()
-
-        if not clientes:
-            st.info("Nenhum cliente cadastrado além de você.")
-        else:
-            hoje = date.today()
-            clientes_filtrados = []
-
-            for cli in clientes:
-                user, emp, db, ativo, senha_atual, plano, valor_mensal, venc = cli
-                ativo = int(ativo) if ativo is not None else 1
-                plano = plano or "Starter"
-                valor_mensal = float(valor_mensal or 0)
-
-                venc_dt = None
-                if venc:
+    filtros = (busca.strip().lower(), mostrar_bloqueados, somente_vencidos)
+    if st.session_state.get("filtros_clientes_anterior") != filtros:
+        st.session_state["filtros_clientes_anterior"] = filtros
+        st.session_state["cursores_clientes"] = [None]
+    cursores = st.session_state.setdefault("cursores_clientes", [None])
+
+    admin_ref = ref_admin()
+    preparar_admin(admin_ref)
+    hoje = date.today()
+    filtro_args = dict(busca=busca, incluir_bloqueados=mostrar_bloqueados, somente_vencidos=somente_vencidos, hoje=hoje)
+
+    total_clientes = contar_clientes(admin_ref, "danilo", **filtro_args)
+    df_cli = clientes_admin(admin_ref, "danilo", apos=cursores[-1], limite=TAMANHO_PAGINA_CLIENTES, **filtro_args)
+    tem_proxima = len(df_cli) > TAMANHO_PAGINA_CLIENTES
+    df_cli = df_cli.head(TAMANHO_PAGINA_CLIENTES)
+
+    if df_cli.empty:
+        sem_filtro = not busca.strip() and mostrar_bloqueados and not somente_vencidos
+        st.info("Nenhum cliente cadastrado além de você." if sem_filtro and len(cursores) == 1 else "Nenhum cliente encontrado com os filtros.")
+    else:
+        df_cli["empresa"] = df_cli["empresa"].fillna("").astype(str)
+        df_cli["venc_dt"] = pd.to_datetime(df_cli["vencimento"], errors="coerce").dt.date
+
+        situacao = pd.Series("EM DIA", index=df_cli.index)
+        situacao = situacao.mask(df_cli["venc_dt"].isna(), "SEM VENCIMENTO")
+        situacao = situacao.mask(df_cli["venc_dt"].notna() & (df_cli["venc_dt"] < hoje), "VENCIDO")
+        df_cli["situacao"] = situacao
+
+        tabela = pd.DataFrame({
+            "Empresa": df_cli["empresa"],
+            "Login": df_cli["usuario"],
+            "Plano": df_cli["plano"],
+            "Valor mensal": fmt_brl_serie(para_centavos(df_cli["valor_mensal"])),
+            "Vencimento": pd.to_datetime(df_cli["venc_dt"]).dt.strftime("%d/%m/%Y").fillna("Não definido"),
+            "Situação": df_cli["situacao"],
+            "Status": df_cli["ativo"].map({1: "ATIVO"}).fillna("BLOQUEADO"),
+            "Senha": df_cli["senha_definida"].map({1: "Definida"}).fillna("Pendente"),
+        })
+        st.dataframe(tabela, hide_index=True, use_container_width=True)
+
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            if st.button("← Anteriores", disabled=len(cursores) == 1, use_container_width=True):
+                cursores.pop()
+                st.rerun()
+        with p2:
+            st.caption(f"Página {len(cursores)} · {total_clientes} cliente(s) no filtro")
+        with p3:
+            if st.button("Próximos →", disabled=not tem_proxima, use_container_width=True):
+                ultima = df_cli.iloc[-1]
+                cursores.append((ultima["chave_empresa"], ultima["usuario"]))
+                st.rerun()
+
+        rotulos = dict(zip(df_cli["usuario"], df_cli["empresa"] + " (" + df_cli["usuario"] + ")"))
+        user = st.selectbox("Cliente selecionado", options=list(rotulos), format_func=rotulos.get, key="cliente_admin_sel")
+        cli = df_cli[df_cli["usuario"] == user].iloc[0]
+
+        emp, db, plano = cli["empresa"], cli["db_nome"], cli["plano"]
+        ativo, valor_mensal, venc_dt, situacao_cli = int(cli["ativo"]), float(cli["valor_mensal"]), cli["venc_dt"], cli["situacao"]
+        if pd.isna(venc_dt):
+            venc_dt = None
+
+        status_texto = "ATIVO" if ativo == 1 else "BLOQUEADO"
+        senha_texto = "Definida" if int(cli["senha_definida"]) == 1 else "Pendente (primeiro acesso)"
+        venc_str = venc_dt.strftime("%d/%m/%Y") if venc_dt else "Não definido"
+
+        with st.container(border=True):
+            topo1, topo2 = st.columns([3, 1])
+
+            with topo1:
+                st.markdown(f"### {emp}")
+                st.caption(f"Login: `{user}`  |  Banco: `{db}`")
+                st.caption(f"Senha: **{senha_texto}**")
+
+            with topo2:
+                if ativo == 1:
+                    st.success(status_texto)
+                else:
+                    st.error(status_texto)
+
+            st.divider()
+
+            sa1, sa2, sa3, sa4 = st.columns([1.2, 1.2, 1.2, 1.4])
+            with sa1:
+                st.caption("Plano")
+                st.write(f"**{plano}**")
+            with sa2:
+                st.caption("Valor mensal")
+                st.write(f"**{fmt_brl(para_centavos(valor_mensal))}**")
+            with sa3:
+                st.caption("Vencimento")
+                st.write(f"**{venc_str}**")
+            with sa4:
+                st.caption("Situação")
+                if situacao_cli == "EM DIA":
+                    st.success(situacao_cli)
+                elif situacao_cli == "VENCIDO":
+                    st.error(situacao_cli)
+                else:
+                    st.warning(situacao_cli)
+
+            st.divider()
+
+            b1, b2, b3, b4 = st.columns(4)
+
+            with b1:
+                label = "Bloquear" if ativo == 1 else "Ativar"
+                if st.button(label, key=f"block_{user}", use_container_width=True):
                     try:
-                        venc_dt = date.fromisoformat(str(venc))
-                    except Exception:
-                        venc_dt = None
-
-                if not mostrar_bloqueados and ativo == 0:
-                    continue
-
-                if busca.strip():
-                    b = busca.strip().lower()
-                    if b not in str(user).lower() and b not in str(emp).lower():
-                        continue
-
-                if somente_vencidos:
-                    if venc_dt is None:
-                        continue
-                    if venc_dt >= hoje:
-                        continue
-
-                clientes_filtrados.append((user, emp, db, ativo, senha_atual, plano, valor_mensal, venc_dt))
-
-            if not clientes_filtrados:
-                st.info("Nenhum cliente encontrado com os filtros.")
-            else:
-                for (user, emp, db, ativo, senha_atual, plano, valor_mensal, venc_dt) in clientes_filtrados:
-                    status_texto = "ATIVO" if ativo == 1 else "BLOQUEADO"
-                    senha_texto = "Pendente (primeiro acesso)" if (senha_atual is None or str(senha_atual).strip() == "") else "Definida"
-
-                    if venc_dt is None:
-                        venc_str = "Não definido"
-                        situacao = "SEM VENCIMENTO"
-                        situacao_cor = "warning"
-                    else:
-                        venc_str = venc_dt.strftime("%d/%m/%Y")
-                        if venc_dt < date.today():
-                            situacao = "VENCIDO"
-                            situacao_cor = "error"
-                        else:
-                            situacao = "EM DIA"
-                            situacao_cor = "success"
-
-                    with st.container(border=True):
-                        topo1, topo2 = st.columns([3, 1])
-
-                        with topo1:
-                            st.markdown(f"### {emp}")
-                            st.caption(f"Login: `{user}`  |  Banco: `{db}`")
-                            st.caption(f"Senha: **{senha_texto}**")
-
-                        with topo2:
-                            if ativo == 1:
-                                st.success(status_texto)
-                            else:
-                                st.error(status_texto)
-
-                        st.divider()
-
-                        sa1, sa2, sa3, sa4 = st.columns([1.2, 1.2, 1.2, 1.4])
-                        with sa1:
-                            st.caption("Plano")
-                            st.write(f"**{plano}**")
-                        with sa2:
-                            st.caption("Valor mensal")
-                            st.write(f"**{fmt_brl(valor_mensal)}**")
-                        with sa3:
-                            st.caption("Vencimento")
-                            st.write(f"**{venc_str}**")
-                        with sa4:
-                            st.caption("Situação")
-                            if situacao_cor == "success":
-                                st.success(situacao)
-                            elif situacao_cor == "error":
-                                st.error(situacao)
-                            else:
-                                st.warning(situacao)
-
-                        st.divider()
-
-                        b1, b2, b3, b4 = st.columns(4)
-
-                        with b1:
-                            novo_status = 0 if ativo == 1 else 1
-                            label = "Bloquear" if ativo == 1 else "Ativar"
-                            if st.button(label, key=f"block_{user}", use_container_width=True):
-                                try:
-                                    c1 = conn.cursor()
-                                    if usando_postgres:
-                                        c1.execute("UPDATE usuarios SET ativo=%s WHERE usuario=%s", (novo_status, user))
-                                    else:
-                                        c1.execute("UPDATE usuarios SET ativo=? WHERE usuario=?", (novo_status, user))
-                                    conn.commit()
-                                    c1.close()
-                                    st.rerun()
-                                except Exception as e:
-                                    conn.rollback()
-                                    st.error(f"Erro ao alterar status: {e}")
-
-                        with b2:
-                            if st.button("Liberar 1º acesso", key=f"reset_{user}", use_container_width=True):
-                                try:
-                                    c2 = conn.cursor()
-                                    if usando_postgres:
-                                        c2.execute("UPDATE usuarios SET senha=%s WHERE usuario=%s", (None, user))
-                                    else:
-                                        c2.execute("UPDATE usuarios SET senha=? WHERE usuario=?", ("", user))
-                                    conn.commit()
-                                    c2.close()
-                                    st.success(f"Primeiro acesso liberado para {user}.")
-                                    st.rerun()
-                                except Exception as e:
-                                    conn.rollback()
-                                    st.error(f"Erro ao liberar primeiro acesso: {e}")
-
-                        with b3:
-                            if st.button("Editar plano", key=f"edit_{user}", use_container_width=True):
-                                st.session_state[f"edit_open_{user}"] = True
-
-                        with b4:
-                            conf_key = f"conf_del_{user}"
-                            if conf_key not in st.session_state:
-                                st.session_state[conf_key] = False
-
-                            if not st.session_state[conf_key]:
-                                if st.button("Excluir", key=f"prep_del_{user}", type="primary", use_container_width=True):
-                                    st.session_state[conf_key] = True
-                                    st.rerun()
-                            else:
-                                st.warning("Confirme para excluir.")
-                                if st.button("Confirmar", key=f"confirm_del_{user}", type="primary", use_container_width=True):
-                                    try:
-                                        c4 = conn.cursor()
-                                        if usando_postgres:
-                                            c4.execute("DELETE FROM usuarios WHERE usuario=%s", (user,))
-                                        else:
-                                            c4.execute("DELETE FROM usuarios WHERE usuario=?", (user,))
-                                        conn.commit()
-                                        c4.close()
-                                        st.session_state[conf_key] = False
-                                        st.error(f"Cliente {user} removido permanentemente.")
-                                        st.rerun()
-                                    except Exception as e:
-                                        conn.rollback()
-                                        st.error(f"Erro ao excluir cliente: {e}")
-
-                        if st.session_state.get(f"edit_open_{user}", False):
-                            st.divider()
-                            st.subheader("Editar plano / cobrança")
-
-                            with st.form(f"form_edit_{user}"):
-                                novo_plano = st.selectbox(
-                                    "Plano",
-                                    options=list(PLANOS.keys()),
-                                    index=list(PLANOS.keys()).index(plano) if plano in PLANOS else 0,
-                                    key=f"plano_{user}"
-                                )
-
-                                novo_valor = st.number_input(
-                                    "Valor mensal (R$)",
-                                    min_value=0.0,
-                                    step=10.0,
-                                    value=float(valor_mensal),
-                                    format="%.2f",
-                                    key=f"valor_{user}"
-                                )
-
-                                venc_padrao = venc_dt if venc_dt else (date.today() + timedelta(days=30))
-                                novo_venc = st.date_input(
-                                    "Vencimento",
-                                    value=venc_padrao,
-                                    key=f"venc_{user}"
-                                )
-
-                                csave, ccancel = st.columns([1, 1])
-                                with csave:
-                                    salvar = st.form_submit_button("Salvar", type="primary", use_container_width=True)
-                                with ccancel:
-                                    cancelar = st.form_submit_button("Cancelar", use_container_width=True)
-
-                                if salvar:
-                                    try:
-                                        c3 = conn.cursor()
-                                        if usando_postgres:
-                                            c3.execute("""
-                                                UPDATE usuarios
-                                                SET plano=%s, valor_mensal=%s, vencimento=%s
-                                                WHERE usuario=%s
-                                            """, (novo_plano, float(novo_valor), novo_venc.isoformat(), user))
-                                        else:
-                                            c3.execute("""
-                                                UPDATE usuarios
-                                                SET plano=?, valor_mensal=?, vencimento=?
-                                                WHERE usuario=?
-                                            """, (novo_plano, float(novo_valor), novo_venc.isoformat(), user))
-                                        conn.commit()
-                                        c3.close()
-                                        st.session_state[f"edit_open_{user}"] = False
-                                        st.success("Dados atualizados.")
-                                        st.rerun()
-                                    except Exception as e:
-                                        conn.rollback()
-                                        st.error(f"Erro ao atualizar dados: {e}")
-
-                                if cancelar:
-                                    st.session_state[f"edit_open_{user}"] = False
-                                    st.rerun()
-
-        cur.close()
-
-    finally:
-        conn.close()
\ No newline at end of file
+                        definir_ativo_cliente(admin_ref, user, ativo != 1)
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Erro ao alterar status: {e}")
+
+            with b2:
+                if st.button("Liberar 1º acesso", key=f"reset_{user}", use_container_width=True):
+                    try:
+                        liberar_acesso_cliente(admin_ref, user)
+                        st.success(f"Primeiro acesso liberado para {user}.")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Erro ao liberar primeiro acesso: {e}")
+
+            with b3:
+                if st.button("Editar plano", key=f"edit_{user}", use_container_width=True):
+                    st.session_state[f"edit_open_{user}"] = True
+
+            with b4:
+                conf_key = f"conf_del_{user}"
+                if conf_key not in st.session_state:
+                    st.session_state[conf_key] = False
+
+                if not st.session_state[conf_key]:
+                    if st.button("Excluir", key=f"prep_del_{user}", type="primary", use_container_width=True):
+                        st.session_state[conf_key] = True
+                        st.rerun()
+                else:
+                    st.warning("Confirme para excluir.")
+                    if st.button("Confirmar", key=f"confirm_del_{user}", type="primary", use_container_width=True):
+                        try:
+                            excluir_cliente(admin_ref, user)
+                            st.session_state[conf_key] = False
+                            st.error(f"Cliente {user} removido permanentemente.")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Erro ao excluir cliente: {e}")
+
+            if st.session_state.get(f"edit_open_{user}", False):
+                st.divider()
+                st.subheader("Editar plano / cobrança")
+
+                with st.form(f"form_edit_{user}"):
+                    novo_plano = st.selectbox(
+                        "Plano",
+                        options=list(PLANOS.keys()),
+                        index=list(PLANOS.keys()).index(plano) if plano in PLANOS else 0,
+                        key=f"plano_{user}"
+                    )
+
+                    novo_valor = st.number_input(
+                        "Valor mensal (R$)",
+                        min_value=0.0,
+                        step=10.0,
+                        value=float(valor_mensal),
+                        format="%.2f",
+                        key=f"valor_{user}"
+                    )
+
+                    venc_padrao = venc_dt if venc_dt else (date.today() + timedelta(days=30))
+                    novo_venc = st.date_input(
+                        "Vencimento",
+                        value=venc_padrao,
+                        key=f"venc_{user}"
+                    )
+
+                    csave, ccancel = st.columns([1, 1])
+                    with csave:
+                        salvar = st.form_submit_button("Salvar", type="primary", use_container_width=True)
+                    with ccancel:
+                        cancelar = st.form_submit_button("Cancelar", use_container_width=True)
+
+                    if salvar:
+                        try:
+                            atualizar_plano_cliente(admin_ref, user, novo_plano, novo_valor, novo_venc)
+                            st.session_state[f"edit_open_{user}"] = False
+                            st.success("Dados atualizados.")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Erro ao atualizar dados: {e}")
+
+                    if cancelar:
+                        st.session_state[f"edit_open_{user}"] = False
+                        st.rerun()
+
+# ==================================================
+# SAÚDE DO BANCO (POOL DE CONEXÕES E CONSULTAS)
+# ==================================================
+TOP_CONSULTAS = 15
+
+st.divider()
+
+db_url_pool = os.getenv("DATABASE_URL", "").strip()
+if db_url_pool:
+    with st.expander("Pool de conexões do banco"):
+        m = metricas_pool(db_url_pool)
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("Em uso", f"{m['em_uso']} / {m['maximo']}")
+        p2.metric("Aguardando", m["aguardando"])
+        p3.metric("Espera média", f"{m['espera_media_ms']:.1f} ms")
+        p4.metric("Espera máxima", f"{m['espera_max_ms']:.0f} ms")
+        st.caption(
+            f"Livres: {m['livres']}  |  Checkouts: {m['checkouts']}  |  "
+            f"Timeouts: {m['timeouts']}  |  Reconexões: {m['reconexoes']}. "
+            "Ajuste com as variáveis DB_POOL_MIN, DB_POOL_MAX e DB_POOL_TIMEOUT."
+        )
+
+with st.expander("Tempo das consultas"):
+    df_consultas = estatisticas_consultas()
+    if df_consultas.empty:
+        st.caption("Nenhuma consulta medida ainda neste processo.")
+    else:
+        st.dataframe(
+            df_consultas.head(TOP_CONSULTAS), hide_index=True, use_container_width=True,
+            column_config={
+                "consulta": "Consulta",
+                "chamadas": st.column_config.NumberColumn("Chamadas", format="%d"),
+                "total_ms": st.column_config.NumberColumn("Total (ms)", format="%.0f"),
+                "media_ms": st.column_config.NumberColumn("Média (ms)", format="%.1f"),
+                "max_ms": st.column_config.NumberColumn("Pior (ms)", format="%.0f"),
+            },
+        )
+        st.caption(
+            "Consultas nomeadas do repository que mais somaram tempo desde que este processo subiu "
+            "(leituras servidas pelo cache não chegam ao banco e não entram na conta)."
+        )
@@ -1,57 +1,22 @@
 import streamlit as st
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
 import calendar
-import base64
-import streamlit.components.v1 as components
-from google import genai
 
-from style import carregar_estilos
+from bootstrap import iniciar_pagina
 from auth import exigir_login
-from database import conectar_banco
+from repository import realizado_por_categoria
 from components import metric_card, icon_svg
+from formatting import fmt_brl
 
 # ==========================================
 # CONFIGURAÇÃO DA PÁGINA
 # ==========================================
-st.set_page_config(
-    page_title="Consultor IA | D.Tech",
-    page_icon="logo.png",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
-# ==========================================
-# ÍCONE IPHONE
-# ==========================================
-try:
-    with open("logo.png", "rb") as f:
-        img_b64 = base64.b64encode(f.read()).decode()
-
-    components.html(
-        f"""
-        <script>
-            var link = window.parent.document.createElement('link');
-            link.rel = 'apple-touch-icon';
-            link.href = 'data:image/png;base64,{img_b64}';
-            window.parent.document.head.appendChild(link);
-        </script>
-        """,
-        height=0,
-        width=0
-    )
-except Exception:
-    pass
-
-try:
-    st.logo("logo.png")
-except Exception:
-    pass
+iniciar_pagina("Consultor IA | D.Tech")
 
 # ==========================================
-# LOGIN + ESTILO
+# LOGIN
 # ==========================================
-carregar_estilos()
 exigir_login()
 
 usuario_logado = st.session_state.get("usuario_atual", "danilo")
@@ -64,18 +29,6 @@ st.markdown(
 )
 st.divider()
 
-# ==========================================
-# BANCO DE DADOS E HELPERS
-# ==========================================
-def conectar():
-    db_nome = st.session_state.get("db_nome", "financeiro.db")
-    conn, engine = conectar_banco(db_nome)
-    return conn, engine
-
-def fmt_brl(x: float) -> str:
-    try: return f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except: return "R$ 0,00"
-
 # ==========================================
 # EXTRAÇÃO DE DADOS
 # ==========================================
@@ -87,47 +40,29 @@ ano_atual = hoje.year
 ultimo_dia = calendar.monthrange(ano_atual, mes_atual)[1]
 dias_restantes = ultimo_dia - hoje.day
 
-conn, engine = conectar()
-
-query = """
-SELECT t.tipo, t.valor, t.data_real, c.nome as categoria
-FROM transactions t
-LEFT JOIN categories c ON t.categoria_id = c.id
-WHERE t.usuario_dono = ? AND t.status = 'Realizado'
-"""
-
-if engine == "postgres":
-    query = query.replace("?", "%s")
+db_ref = st.session_state.get("db_nome", "financeiro.db")
+inicio_mes = hoje.replace(day=1)
+fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
 
-df = pd.read_sql_query(query, conn, params=(usuario_logado,))
-conn.close()
+# Já vem somado por tipo e categoria (resumo mensal), só do mês corrente
+df_mes = realizado_por_categoria(db_ref, usuario_logado, inicio_mes, fim_mes)
 
-if df.empty:
-    df = pd.DataFrame(columns=["tipo", "valor", "data_real", "categoria"])
-
-df["data_real"] = pd.to_datetime(df["data_real"], errors="coerce")
-
-df_mes = df[
-    (df["data_real"].dt.month == mes_atual) &
-    (df["data_real"].dt.year == ano_atual)
-].copy()
-
-entradas = float(df_mes.loc[df_mes["tipo"] == "Entrada", "valor"].sum())
-saidas = float(df_mes.loc[df_mes["tipo"] == "Saída", "valor"].sum())
+# Somas em centavos inteiros; reais só no texto
+entradas = int(df_mes.loc[df_mes["tipo"] == "Entrada", "valor_centavos"].sum())
+saidas = int(df_mes.loc[df_mes["tipo"] == "Saída", "valor_centavos"].sum())
 saldo = entradas - saidas
 
 df_saidas = df_mes[df_mes["tipo"] == "Saída"].copy()
-df_saidas["categoria"] = df_saidas["categoria"].fillna("Sem categoria")
 
 if not df_saidas.empty:
     top_categorias = (
-        df_saidas.groupby("categoria")["valor"]
+        df_saidas.groupby("categoria")["valor_centavos"]
         .sum()
         .sort_values(ascending=False)
         .head(3)
     )
     texto_categorias = "\n".join(
-        [f"- {cat}: R$ {val:,.2f}" for cat, val in top_categorias.items()]
+        [f"- {cat}: {fmt_brl(val)}" for cat, val in top_categorias.items()]
     )
 else:
     texto_categorias = "- Nenhuma despesa registrada no mês."
@@ -164,6 +99,9 @@ if not api_key:
 if st.button("🧠 Gerar Análise Financeira do Mês", use_container_width=True, type="primary"):
     with st.spinner("Analisando seus dados financeiros..."):
         try:
+            # Import tardio: o SDK do Gemini só carrega quando alguém pede a análise
+            from google import genai
+
             client = genai.Client(api_key=api_key)
 
             # 🚀 NOVIDADE: O Prompt agora entende a passagem do tempo!
@@ -177,9 +115,9 @@ if st.button("🧠 Gerar Análise Financeira do Mês", use_container_width=True,
             Seu foco deve ser em orientar o ritmo de gastos para o resto do mês e garantir que o caixa não fique no vermelho até o final.
 
             Dados parciais do mês atual:
-            - Receitas totais até hoje: R$ {entradas:,.2f}
-            - Despesas totais até hoje: R$ {saidas:,.2f}
-            - Saldo atual: R$ {saldo:,.2f}
+            - Receitas totais até hoje: {fmt_brl(entradas)}
+            - Despesas totais até hoje: {fmt_brl(saidas)}
+            - Saldo atual: {fmt_brl(saldo)}
 
             Principais categorias de gastos até o momento:
             {texto_categorias}
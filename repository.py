@@ -0,0 +1,1011 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from database import conectar_banco
+
+# Leituras ficam em memória até o dado do usuário mudar (ou o TTL vencer).
+# A versão do banco é relida a cada VERSAO_TTL segundos: é o atraso máximo para
+# enxergar escritas feitas por outro processo; as deste processo valem na hora.
+CACHE_TTL = int(os.getenv("DB_CACHE_TTL", "600"))
+CACHE_MAX_ENTRADAS = int(os.getenv("DB_CACHE_MAX_ENTRADAS", "512"))
+VERSAO_TTL = float(os.getenv("DB_VERSAO_TTL", "5"))
+
+# =========================================================
+# CONSULTAS NOMEADAS (COMPILADAS UMA VEZ POR DIALETO)
+# =========================================================
+# O SQL é escrito uma vez só, com parâmetros nomeados (:usuario). Na primeira
+# execução em cada engine ele é traduzido para o formato do driver e guardado.
+# Listas usam "= ANY(:ids)": array no Postgres, json_each no SQLite.
+# MES(coluna) vira o texto 'AAAA-MM' da data em cada dialeto.
+_PARAM = re.compile(r"(?<!:):([A-Za-z_]\w*)")
+_ANY = re.compile(r"=\s*ANY\(\s*:([A-Za-z_]\w*)\s*\)")
+_MES = re.compile(r"\bMES\(([^()]+)\)")
+
+_REGISTRO = {}
+
+
+class Consulta:
+    def __init__(self, nome, sql, tipos=None, retorna_id=False):
+        self.nome = nome
+        self.sql = sql
+        self.tipos = tipos or {}
+        self.retorna_id = retorna_id
+        self._compilada = {}
+        _REGISTRO[nome] = self
+
+    def compilar(self, engine):
+        sql = self._compilada.get(engine)
+        if sql is None:
+            if engine == "postgres":
+                sql = _MES.sub(r"TO_CHAR(\1, 'YYYY-MM')", self.sql)
+                sql = _PARAM.sub(r"%(\1)s", sql.replace("%", "%%"))
+                if self.retorna_id:
+                    sql += " RETURNING id"
+            else:
+                sql = _MES.sub(r"SUBSTR(\1, 1, 7)", self.sql)
+                sql = _ANY.sub(r"IN (SELECT value FROM json_each(:\1))", sql)
+            self._compilada[engine] = sql
+        return sql
+
+
+def _adaptar_sqlite(valor):
+    # SQLite guarda datas como texto ISO (o adaptador automático foi descontinuado no Python 3.12)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, (list, tuple)):
+        return json.dumps([_adaptar_sqlite(v) for v in valor])
+    return valor
+
+
+def _adaptar(engine, params):
+    if engine == "postgres":
+        return {k: (list(v) if isinstance(v, tuple) else v) for k, v in params.items()}
+    return {k: _adaptar_sqlite(v) for k, v in params.items()}
+
+
+def para_centavos(valor):
+    """Reais (número, texto "1234.56", Decimal ou Series) -> centavos inteiros (int / int64)."""
+    if isinstance(valor, pd.Series):
+        return (pd.to_numeric(valor, errors="coerce").fillna(0) * 100).round().astype("int64")
+    return int((Decimal(str(valor)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def padrao_busca(texto):
+    """Texto digitado numa busca -> padrão LIKE (minúsculo, com curingas escapados) ou None."""
+    texto = (texto or "").strip().lower()
+    if not texto:
+        return None
+    texto = texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{texto}%"
+
+
+_QUEBRAS = re.compile(r"[\r\n\t]")
+
+
+def normalizar_texto(texto):
+    """Texto como é gravado: sem quebra de linha/tabulação e sem espaço nas pontas."""
+    if texto is None or (not isinstance(texto, str) and pd.isna(texto)):
+        return ""
+    return _QUEBRAS.sub(" ", str(texto)).strip()
+
+
+# "categoria" é para texto de poucos valores (tipo, status, nomes de conta/categoria):
+# o DataFrame guarda códigos inteiros e os filtros comparam códigos, não strings
+def _tipar(df, tipos):
+    for coluna, tipo in tipos.items():
+        if coluna not in df.columns:
+            continue
+        if tipo == "data":
+            df[coluna] = pd.to_datetime(df[coluna], format="ISO8601", errors="coerce")
+        elif tipo == "float":
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce").fillna(0.0).astype("float64")
+        elif tipo == "int":
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce").astype("Int64")
+        elif tipo == "centavos":
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce").fillna(0).astype("int64")
+        elif tipo == "texto":
+            df[coluna] = df[coluna].astype("object")
+        elif tipo == "categoria":
+            df[coluna] = df[coluna].astype("category")
+    return df
+
+
+# =========================================================
+# INSTRUMENTAÇÃO
+# =========================================================
+_lock_estatisticas = threading.Lock()
+_estatisticas = {}
+
+
+def _medir(nome, inicio):
+    ms = (time.perf_counter() - inicio) * 1000
+    with _lock_estatisticas:
+        chamadas, total, maximo = _estatisticas.get(nome, (0, 0.0, 0.0))
+        _estatisticas[nome] = (chamadas + 1, total + ms, max(maximo, ms))
+
+
+def estatisticas_consultas():
+    """Chamadas, tempo total e pior tempo (ms) de cada consulta nomeada neste processo."""
+    with _lock_estatisticas:
+        linhas = [(nome, c, t, t / c, m) for nome, (c, t, m) in _estatisticas.items()]
+    return pd.DataFrame(linhas, columns=["consulta", "chamadas", "total_ms", "media_ms", "max_ms"]).sort_values("total_ms", ascending=False)
+
+
+# =========================================================
+# EXECUÇÃO
+# =========================================================
+def ler(db_ref, consulta, **params):
+    conn, engine = conectar_banco(db_ref)
+    cur = conn.cursor()
+    inicio = time.perf_counter()
+    try:
+        cur.execute(consulta.compilar(engine), _adaptar(engine, params))
+        linhas = cur.fetchall()
+        colunas = [c[0] for c in cur.description]
+    finally:
+        cur.close()
+        conn.close()
+    _medir(consulta.nome, inicio)
+    return _tipar(pd.DataFrame.from_records(linhas, columns=colunas), consulta.tipos)
+
+
+class Escrita:
+    """Cursor de uma transação aberta por transacao(): executa consultas nomeadas."""
+    def __init__(self, cur, engine):
+        self.cur = cur
+        self.engine = engine
+
+    def executar(self, consulta, **params):
+        inicio = time.perf_counter()
+        self.cur.execute(consulta.compilar(self.engine), _adaptar(self.engine, params))
+        _medir(consulta.nome, inicio)
+        if consulta.retorna_id:
+            if self.engine == "postgres":
+                linha = self.cur.fetchone()
+                return int(linha[0]) if linha else None
+            return self.cur.lastrowid
+        return self.cur.rowcount
+
+    def inserir_lote(self, tabela, colunas, tuplas, pagina=1000):
+        """
+        INSERT de muitas linhas de uma vez; devolve os ids na ordem das tuplas.
+        Postgres: execute_values com RETURNING (uma ida ao banco por página).
+        SQLite: executemany; como a transação segura a trava de escrita, os ids novos
+        são contíguos e terminam no MAX(id) logo depois do insert.
+        """
+        if not tuplas:
+            return []
+        inicio = time.perf_counter()
+        lista = ", ".join(colunas)
+        if self.engine == "postgres":
+            from psycopg2.extras import execute_values
+            linhas = execute_values(
+                self.cur, f"INSERT INTO {tabela} ({lista}) VALUES %s RETURNING id", tuplas, page_size=pagina, fetch=True,
+            )
+            ids = [int(l[0]) for l in linhas]
+        else:
+            marcadores = ", ".join("?" for _ in colunas)
+            self.cur.executemany(
+                f"INSERT INTO {tabela} ({lista}) VALUES ({marcadores})", [tuple(_adaptar_sqlite(v) for v in t) for t in tuplas],
+            )
+            self.cur.execute(f"SELECT MAX(id) FROM {tabela}")
+            ultimo = int(self.cur.fetchone()[0])
+            ids = list(range(ultimo - len(tuplas) + 1, ultimo + 1))
+        _medir(f"inserir_lote_{tabela}", inicio)
+        return ids
+
+    def linhas(self, consulta, **params):
+        """Executa uma leitura dentro da transação e devolve as tuplas."""
+        inicio = time.perf_counter()
+        self.cur.execute(consulta.compilar(self.engine), _adaptar(self.engine, params))
+        resultado = self.cur.fetchall()
+        _medir(consulta.nome, inicio)
+        return resultado
+
+
+@contextmanager
+def transacao(db_ref, usuario=None):
+    """
+    Abre uma transação de escrita. Com usuario, a versão dos dados dele sobe no mesmo
+    commit, o que invalida as leituras em cache daquele usuário.
+    """
+    conn, engine = conectar_banco(db_ref)
+    cur = conn.cursor()
+    try:
+        tx = Escrita(cur, engine)
+        yield tx
+        versao = _incrementar_versao(tx, usuario) if usuario is not None else None
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    if versao is not None:
+        _guardar_versao(db_ref, usuario, versao)
+
+
+# =========================================================
+# VERSÃO DOS DADOS E CACHE DE LEITURAS
+# =========================================================
+_INCREMENTAR_VERSAO = Consulta("incrementar_versao", """
+    INSERT INTO data_version (usuario_dono, versao) VALUES (:usuario, 1)
+    ON CONFLICT (usuario_dono) DO UPDATE SET versao = data_version.versao + 1
+""")
+
+_VERSAO = Consulta("versao_dados", """
+    SELECT versao FROM data_version WHERE usuario_dono = :usuario
+""")
+
+_lock_versoes = threading.Lock()
+_versoes = {}
+
+
+def _incrementar_versao(tx, usuario):
+    tx.executar(_INCREMENTAR_VERSAO, usuario=usuario)
+    return int(tx.linhas(_VERSAO, usuario=usuario)[0][0])
+
+
+def _guardar_versao(db_ref, usuario, versao):
+    with _lock_versoes:
+        _versoes[(db_ref, usuario)] = (versao, time.monotonic())
+
+
+# Quem tem dados derivados a refazer: os donos dos lançamentos e de linhas antigas do resumo/saldos
+_DONOS_DADOS = Consulta("donos_dados", """
+    SELECT usuario_dono FROM transactions WHERE usuario_dono IS NOT NULL
+    UNION SELECT usuario_dono FROM monthly_rollup
+    UNION SELECT usuario_dono FROM saldo_checkpoint
+""")
+
+
+def _reconstruir(db_ref, usuario, popular):
+    """
+    popular(tx, usuario) numa transação que também sobe a versão dos dados de cada usuário
+    afetado (todos, se usuario for None): as leituras em cache não sobrevivem ao conserto.
+    """
+    if usuario is not None:
+        with transacao(db_ref, usuario) as tx:
+            popular(tx, usuario)
+        return
+    with transacao(db_ref) as tx:
+        donos = [dono for (dono,) in tx.linhas(_DONOS_DADOS)]
+        popular(tx)
+        versoes = {dono: _incrementar_versao(tx, dono) for dono in donos}
+    for dono, versao in versoes.items():
+        _guardar_versao(db_ref, dono, versao)
+
+
+def versao_dados(db_ref, usuario):
+    """Contador de escritas do usuário (0 se nunca escreveu), relido no máximo a cada VERSAO_TTL."""
+    with _lock_versoes:
+        guardada = _versoes.get((db_ref, usuario))
+    if guardada and time.monotonic() - guardada[1] < VERSAO_TTL:
+        return guardada[0]
+    df = ler(db_ref, _VERSAO, usuario=usuario)
+    versao = int(df.iloc[0, 0]) if not df.empty else 0
+    _guardar_versao(db_ref, usuario, versao)
+    return versao
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRADAS, show_spinner=False)
+def _ler_versionado(db_ref, usuario, nome_consulta, params, versao):
+    return ler(db_ref, _REGISTRO[nome_consulta], usuario=usuario, **params)
+
+
+def ler_cache(db_ref, usuario, consulta, **params):
+    """
+    ler() com cache por (banco, usuário, consulta, parâmetros, versão dos dados).
+    Cada chamada devolve uma cópia, então a página pode alterar o DataFrame à vontade.
+    """
+    return _ler_versionado(db_ref, usuario, consulta.nome, params, versao_dados(db_ref, usuario))
+
+
+# =========================================================
+# CADASTROS (CONTAS E CATEGORIAS)
+# =========================================================
+_CONTAS = Consulta("contas_do_usuario", """
+    SELECT id, nome, tipo FROM accounts WHERE usuario_dono = :usuario ORDER BY id
+""", tipos={"id": "int"})
+
+_CATEGORIAS = Consulta("categorias_do_usuario", """
+    SELECT id, nome, tipo FROM categories WHERE usuario_dono = :usuario ORDER BY id
+""", tipos={"id": "int"})
+
+_INSERIR_CONTA = Consulta("inserir_conta", """
+    INSERT INTO accounts (nome, tipo, usuario_dono) VALUES (:nome, :tipo, :usuario)
+""", retorna_id=True)
+
+_EXCLUIR_CONTA = Consulta("excluir_conta", """
+    DELETE FROM accounts WHERE id = :id AND usuario_dono = :usuario
+""")
+
+_INSERIR_CATEGORIA = Consulta("inserir_categoria", """
+    INSERT INTO categories (nome, tipo, usuario_dono) VALUES (:nome, :tipo, :usuario)
+""", retorna_id=True)
+
+_EXCLUIR_CATEGORIA = Consulta("excluir_categoria", """
+    DELETE FROM categories WHERE id = :id AND usuario_dono = :usuario
+""")
+
+
+def contas_do_usuario(db_ref, usuario):
+    return ler_cache(db_ref, usuario, _CONTAS)
+
+
+def categorias_do_usuario(db_ref, usuario):
+    return ler_cache(db_ref, usuario, _CATEGORIAS)
+
+
+def inserir_conta(db_ref, usuario, nome, tipo):
+    with transacao(db_ref, usuario) as tx:
+        return tx.executar(_INSERIR_CONTA, nome=normalizar_texto(nome), tipo=normalizar_texto(tipo), usuario=usuario)
+
+
+def excluir_conta(db_ref, usuario, conta_id):
+    with transacao(db_ref, usuario) as tx:
+        return tx.executar(_EXCLUIR_CONTA, id=int(conta_id), usuario=usuario)
+
+
+def inserir_categoria(db_ref, usuario, nome, tipo):
+    with transacao(db_ref, usuario) as tx:
+        return tx.executar(_INSERIR_CATEGORIA, nome=normalizar_texto(nome), tipo=normalizar_texto(tipo), usuario=usuario)
+
+
+def excluir_categoria(db_ref, usuario, categoria_id):
+    with transacao(db_ref, usuario) as tx:
+        return tx.executar(_EXCLUIR_CATEGORIA, id=int(categoria_id), usuario=usuario)
+
+
+# =========================================================
+# RESUMO MENSAL (monthly_rollup)
+# =========================================================
+# Uma linha por (usuário, base, mês, tipo, status, categoria, conta) com soma (centavos) e contagem.
+# base "prevista" agrupa pela data prevista (todos os lançamentos); base "real" pela data
+# real (só os que têm). As escritas de lançamentos mantêm o resumo na mesma transação:
+# subtraem as linhas afetadas antes da mudança e somam de novo depois.
+_ROLLUP_LINHAS = """
+    SELECT usuario_dono, 'prevista' AS base, MES(data_prevista) AS ano_mes, tipo, status,
+           COALESCE(categoria_id, 0) AS categoria_id, COALESCE(conta_id, 0) AS conta_id, valor_centavos
+    FROM transactions WHERE {filtro}
+    UNION ALL
+    SELECT usuario_dono, 'real' AS base, MES(data_real) AS ano_mes, tipo, status,
+           COALESCE(categoria_id, 0) AS categoria_id, COALESCE(conta_id, 0) AS conta_id, valor_centavos
+    FROM transactions WHERE data_real IS NOT NULL AND {filtro}
+"""
+
+# "WHERE true" desfaz a ambiguidade do SQLite entre ON CONFLICT e um ON de JOIN
+_ROLLUP_SOMAR = """
+    INSERT INTO monthly_rollup (usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id, total_centavos, quantidade)
+    SELECT usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id, {sinal} * SUM(valor_centavos), {sinal} * COUNT(*)
+    FROM ({linhas}) m
+    WHERE true
+    GROUP BY usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id
+    ON CONFLICT (usuario_dono, base, ano_mes, tipo, status, categoria_id, conta_id) DO UPDATE
+    SET total_centavos = monthly_rollup.total_centavos + excluded.total_centavos, quantidade = monthly_rollup.quantidade + excluded.quantidade
+"""
+
+_ROLLUP_DELTA = Consulta("rollup_delta", _ROLLUP_SOMAR.format(
+    sinal=":sinal", linhas=_ROLLUP_LINHAS.format(filtro="usuario_dono = :usuario AND id = ANY(:ids)"),
+))
+
+_ROLLUP_LIMPAR_ZERADOS = Consulta("rollup_limpar_zerados", """
+    DELETE FROM monthly_rollup WHERE usuario_dono = :usuario AND quantidade = 0
+""")
+
+_ROLLUP_APAGAR = Consulta("rollup_apagar", """
+    DELETE FROM monthly_rollup WHERE (:usuario IS NULL OR usuario_dono = :usuario)
+""")
+
+_ROLLUP_RECONSTRUIR = Consulta("rollup_reconstruir", _ROLLUP_SOMAR.format(
+    sinal="1", linhas=_ROLLUP_LINHAS.format(filtro="(:usuario IS NULL OR usuario_dono = :usuario)"),
+))
+
+
+def _ajustar_rollup(tx, usuario, ids, sinal):
+    """Soma (+1) ou subtrai (-1) do resumo mensal as linhas atuais dos lançamentos ids."""
+    ids = [int(i) for i in ids if i is not None]
+    if not ids:
+        return
+    tx.executar(_ROLLUP_DELTA, usuario=usuario, ids=ids, sinal=sinal)
+    if sinal < 0:
+        tx.executar(_ROLLUP_LIMPAR_ZERADOS, usuario=usuario)
+
+
+def popular_rollup(tx, usuario=None):
+    """Recalcula o resumo do zero (de um usuário ou de todos) dentro da transação tx."""
+    tx.executar(_ROLLUP_APAGAR, usuario=usuario)
+    tx.executar(_ROLLUP_RECONSTRUIR, usuario=usuario)
+
+
+def reconstruir_rollup(db_ref, usuario=None):
+    _reconstruir(db_ref, usuario, popular_rollup)
+
+
+# =========================================================
+# SALDOS POR CONTA (saldo_checkpoint)
+# =========================================================
+# Saldo acumulado (entradas - saídas) de cada conta ao fim de cada mês que teve movimento,
+# nas duas bases. O saldo numa data é o último checkpoint antes do mês dela mais o que
+# entrou/saiu no próprio mês até ali — nunca o histórico inteiro.
+_LIQUIDO = "CASE tipo WHEN 'Entrada' THEN valor_centavos WHEN 'Saída' THEN -valor_centavos ELSE 0 END"
+
+_SALDOS_LIQUIDO_POR_MES = f"""
+    SELECT usuario_dono, conta_id, base, ano_mes, SUM({_LIQUIDO}) AS liquido
+    FROM ({{linhas}}) m
+    GROUP BY usuario_dono, conta_id, base, ano_mes
+"""
+
+_SALDOS_DELTAS = Consulta("saldos_deltas", _SALDOS_LIQUIDO_POR_MES.format(
+    linhas=_ROLLUP_LINHAS.format(filtro="usuario_dono = :usuario AND id = ANY(:ids)"),
+))
+
+# Cria o checkpoint do mês (herdando o saldo do anterior) se ainda não existir...
+_SALDOS_ABRIR_MES = Consulta("saldos_abrir_mes", """
+    INSERT INTO saldo_checkpoint (usuario_dono, conta_id, base, mes, saldo_centavos)
+    SELECT :usuario, :conta_id, :base, :mes, COALESCE((
+        SELECT s.saldo_centavos FROM saldo_checkpoint s
+        WHERE s.usuario_dono = :usuario AND s.base = :base AND s.conta_id = :conta_id AND s.mes < :mes
+        ORDER BY s.mes DESC LIMIT 1
+    ), 0)
+    WHERE true
+    ON CONFLICT (usuario_dono, base, conta_id, mes) DO NOTHING
+""")
+
+# ...e propaga a diferença para ele e todos os meses seguintes
+_SALDOS_PROPAGAR = Consulta("saldos_propagar", """
+    UPDATE saldo_checkpoint SET saldo_centavos = saldo_centavos + :delta
+    WHERE usuario_dono = :usuario AND base = :base AND conta_id = :conta_id AND mes >= :mes
+""")
+
+_SALDOS_APAGAR = Consulta("saldos_apagar", """
+    DELETE FROM saldo_checkpoint WHERE (:usuario IS NULL OR usuario_dono = :usuario)
+""")
+
+_SALDOS_ESPERADOS = f"""
+    SELECT usuario_dono, conta_id, base, ano_mes AS mes,
+           SUM(liquido) OVER (PARTITION BY usuario_dono, conta_id, base ORDER BY ano_mes) AS saldo_centavos
+    FROM ({_SALDOS_LIQUIDO_POR_MES.format(linhas=_ROLLUP_LINHAS.format(filtro="(:usuario IS NULL OR usuario_dono = :usuario)"))}) l
+"""
+
+_SALDOS_RECONSTRUIR = Consulta("saldos_reconstruir", f"""
+    INSERT INTO saldo_checkpoint (usuario_dono, conta_id, base, mes, saldo_centavos)
+    {_SALDOS_ESPERADOS}
+""")
+
+_SALDOS_RECALCULAR = Consulta("saldos_recalcular", _SALDOS_ESPERADOS, tipos={"conta_id": "int", "saldo_centavos": "centavos"})
+
+_SALDOS_GRAVADOS = Consulta("saldos_gravados", """
+    SELECT usuario_dono, conta_id, base, mes, saldo_centavos FROM saldo_checkpoint
+    WHERE (:usuario IS NULL OR usuario_dono = :usuario)
+""", tipos={"conta_id": "int", "saldo_centavos": "centavos"})
+
+
+def _ajustar_saldos(tx, usuario, ids, sinal):
+    ids = [int(i) for i in ids if i is not None]
+    if not ids:
+        return
+    for _, conta_id, base, mes, liquido in tx.linhas(_SALDOS_DELTAS, usuario=usuario, ids=ids):
+        chave = {"usuario": usuario, "conta_id": int(conta_id), "base": base, "mes": mes}
+        tx.executar(_SALDOS_ABRIR_MES, **chave)
+        tx.executar(_SALDOS_PROPAGAR, delta=sinal * int(liquido or 0), **chave)
+
+
+def popular_saldos(tx, usuario=None):
+    """Recalcula os checkpoints do zero (de um usuário ou de todos) dentro da transação tx."""
+    tx.executar(_SALDOS_APAGAR, usuario=usuario)
+    tx.executar(_SALDOS_RECONSTRUIR, usuario=usuario)
+
+
+def reconstruir_saldos(db_ref, usuario=None):
+    _reconstruir(db_ref, usuario, popular_saldos)
+
+
+def verificar_saldos(db_ref, usuario=None):
+    """
+    Confere os checkpoints contra o razão: recalcula os saldos a partir de transactions e
+    devolve as divergências em centavos (usuario_dono, conta_id, base, mes, gravado, esperado).
+    Meses que ficaram sem movimento valem o saldo do último mês anterior.
+    """
+    chaves = ["usuario_dono", "conta_id", "base"]
+    esperado = ler(db_ref, _SALDOS_RECALCULAR, usuario=usuario).rename(columns={"saldo_centavos": "esperado"})
+    gravado = ler(db_ref, _SALDOS_GRAVADOS, usuario=usuario).rename(columns={"saldo_centavos": "gravado"})
+    df = esperado.merge(gravado, on=chaves + ["mes"], how="outer").sort_values(chaves + ["mes"])
+    df[["esperado", "gravado"]] = df.groupby(chaves)[["esperado", "gravado"]].ffill().fillna(0).astype("int64")
+    divergentes = df["esperado"] != df["gravado"]
+    return df.loc[divergentes, chaves + ["mes", "gravado", "esperado"]].reset_index(drop=True)
+
+
+def _ajustar_agregados(tx, usuario, ids, sinal):
+    """Ponto único das escritas de lançamentos: mantém resumo mensal e saldos juntos."""
+    _ajustar_rollup(tx, usuario, ids, sinal)
+    _ajustar_saldos(tx, usuario, ids, sinal)
+
+
+# =========================================================
+# LEITURAS DE LANÇAMENTOS
+# =========================================================
+# Os KPIs do painel saem do resumo mensal: algumas centenas de linhas, não o histórico inteiro
+_KPIS_MES = Consulta("kpis_mes", """
+    SELECT
+        COALESCE(SUM(CASE WHEN base = 'prevista' THEN quantidade END), 0) AS quantidade,
+        COALESCE(SUM(CASE WHEN base = 'prevista' AND status = 'Realizado' AND tipo = 'Entrada' THEN total_centavos END), 0)
+          - COALESCE(SUM(CASE WHEN base = 'prevista' AND status = 'Realizado' AND tipo = 'Saída' THEN total_centavos END), 0) AS saldo_atual_centavos,
+        COALESCE(SUM(CASE WHEN base = 'prevista' AND status = 'Previsto' AND tipo = 'Entrada'
+                           AND ano_mes >= :mes_inicio AND ano_mes < :mes_fim THEN total_centavos END), 0) AS receber_mes_centavos,
+        COALESCE(SUM(CASE WHEN base = 'prevista' AND status = 'Previsto' AND tipo = 'Saída'
+                           AND ano_mes >= :mes_inicio AND ano_mes < :mes_fim THEN total_centavos END), 0) AS pagar_mes_centavos,
+        COALESCE(SUM(CASE WHEN base = 'real' AND status = 'Realizado' AND tipo = 'Entrada'
+                           AND ano_mes >= :mes_inicio AND ano_mes < :mes_fim THEN total_centavos END), 0) AS entradas_realizadas_mes_centavos,
+        COALESCE(SUM(CASE WHEN base = 'real' AND status = 'Realizado' AND tipo = 'Saída'
+                           AND ano_mes >= :mes_inicio AND ano_mes < :mes_fim THEN total_centavos END), 0) AS saidas_realizadas_mes_centavos
+    FROM monthly_rollup
+    WHERE usuario_dono = :usuario
+""", tipos={"quantidade": "int", "saldo_atual_centavos": "centavos", "receber_mes_centavos": "centavos", "pagar_mes_centavos": "centavos",
+            "entradas_realizadas_mes_centavos": "centavos", "saidas_realizadas_mes_centavos": "centavos"})
+
+_DESPESAS_POR_CATEGORIA = Consulta("despesas_por_categoria", """
+    SELECT COALESCE(c.nome, 'Sem categoria') AS categoria, SUM(r.total_centavos) AS valor_centavos
+    FROM monthly_rollup r
+    LEFT JOIN categories c ON r.categoria_id = c.id
+    WHERE r.usuario_dono = :usuario AND r.base = 'prevista' AND r.tipo = 'Saída'
+      AND r.ano_mes >= :mes_inicio AND r.ano_mes < :mes_fim
+    GROUP BY COALESCE(c.nome, 'Sem categoria')
+""", tipos={"categoria": "categoria", "valor_centavos": "centavos"})
+
+_REALIZADO_POR_CATEGORIA = Consulta("realizado_por_categoria", """
+    SELECT r.tipo, COALESCE(c.nome, 'Sem categoria') AS categoria, SUM(r.total_centavos) AS valor_centavos
+    FROM monthly_rollup r
+    LEFT JOIN categories c ON r.categoria_id = c.id
+    WHERE r.usuario_dono = :usuario AND r.base = 'real' AND r.status = 'Realizado'
+      AND r.ano_mes >= :mes_inicio AND r.ano_mes < :mes_fim
+    GROUP BY r.tipo, COALESCE(c.nome, 'Sem categoria')
+""", tipos={"tipo": "categoria", "categoria": "categoria", "valor_centavos": "centavos"})
+
+# Só o mês pedido sai do banco; os filtros opcionais valem NULL quando não usados
+_LANCAMENTOS_PERIODO = Consulta("lancamentos_do_periodo", """
+    SELECT t.id, t.status, t.data_prevista, t.tipo, t.descricao, c.nome AS categoria, a.nome AS conta, t.valor_centavos
+    FROM transactions t
+    LEFT JOIN categories c ON t.categoria_id = c.id
+    LEFT JOIN accounts a ON t.conta_id = a.id
+    WHERE t.usuario_dono = :usuario
+      AND t.data_prevista >= :inicio AND t.data_prevista < :fim
+      AND (:status IS NULL OR t.status = :status)
+      AND (:somente_atrasados = 0 OR (t.status = 'Previsto' AND t.data_prevista < :hoje))
+      AND (:tipo IS NULL OR t.tipo = :tipo)
+      AND (:categoria IS NULL OR c.nome = :categoria)
+      AND (:conta IS NULL OR a.nome = :conta)
+      AND (:busca IS NULL OR LOWER(t.descricao) LIKE :busca ESCAPE '\\')
+    ORDER BY t.id DESC
+""", tipos={"id": "int", "status": "categoria", "data_prevista": "data", "tipo": "categoria", "categoria": "categoria",
+            "conta": "categoria", "valor_centavos": "centavos"})
+
+_LANCAMENTOS_GESTAO = Consulta("lancamentos_para_gestao", """
+    SELECT t.id, t.tipo, t.descricao, t.valor_centavos, t.data_prevista, t.status,
+           a.nome AS conta_nome, c.nome AS categoria_nome, t.conta_id, t.categoria_id
+    FROM transactions t
+    LEFT JOIN accounts a ON t.conta_id = a.id
+    LEFT JOIN categories c ON t.categoria_id = c.id
+    WHERE t.usuario_dono = :usuario
+      AND (:antes_de IS NULL OR t.id < :antes_de)
+      AND (:filtrar = 0
+           OR LOWER(t.descricao) LIKE :busca ESCAPE '\\'
+           OR t.id = :busca_id
+           OR t.valor_centavos = :busca_centavos
+           OR t.data_prevista = :busca_data)
+    ORDER BY t.id DESC
+    LIMIT :limite
+""", tipos={"id": "int", "tipo": "categoria", "valor_centavos": "centavos", "data_prevista": "data", "status": "categoria",
+            "conta_nome": "categoria", "categoria_nome": "categoria", "conta_id": "int", "categoria_id": "int"})
+
+_LANCAMENTOS_DA_CONTA = Consulta("lancamentos_da_conta", """
+    SELECT data_prevista, valor_centavos, tipo, descricao
+    FROM transactions
+    WHERE usuario_dono = :usuario AND conta_id = :conta_id AND data_prevista >= :inicio AND data_prevista <= :fim
+""", tipos={"valor_centavos": "centavos", "data_prevista": "data", "tipo": "categoria"})
+
+_CONTAS_PERIODO = Consulta("contas_do_periodo", """
+    SELECT t.id, t.descricao, c.nome AS categoria, t.data_prevista, t.valor_centavos, t.status
+    FROM transactions t
+    LEFT JOIN categories c ON t.categoria_id = c.id
+    WHERE t.tipo = :tipo AND t.usuario_dono = :usuario
+      AND (
+            (t.data_prevista >= :inicio AND t.data_prevista < :fim)
+         OR (:incluir_atrasados = 1 AND t.status <> 'Realizado' AND t.data_prevista < :inicio)
+      )
+      AND (:categorias IS NULL OR c.nome = ANY(:categorias))
+      AND (:busca IS NULL OR LOWER(t.descricao) LIKE :busca ESCAPE '\\')
+    ORDER BY t.data_prevista ASC
+""", tipos={"id": "int", "categoria": "categoria", "data_prevista": "data", "valor_centavos": "centavos", "status": "categoria"})
+
+_FLUXO = """
+    SELECT tipo, valor_centavos, {coluna} AS data_base, COALESCE(conta_id, 0) AS conta_id
+    FROM transactions
+    WHERE usuario_dono = :usuario AND {coluna} >= :inicio AND {coluna} < :fim
+"""
+
+_FLUXO_PREVISTO = Consulta("fluxo_previsto", _FLUXO.format(coluna="data_prevista"),
+                           tipos={"tipo": "categoria", "valor_centavos": "centavos", "data_base": "data", "conta_id": "int"})
+
+_FLUXO_REALIZADO = Consulta("fluxo_realizado", _FLUXO.format(coluna="data_real"),
+                            tipos={"tipo": "categoria", "valor_centavos": "centavos", "data_base": "data", "conta_id": "int"})
+
+# Último checkpoint antes do mês da data + o movimento do próprio mês até a véspera da data
+_SALDOS_EM = """
+    SELECT s.conta_id, a.nome AS conta, SUM(s.saldo_centavos) AS saldo_centavos
+    FROM (
+        SELECT c.conta_id, c.saldo_centavos
+        FROM saldo_checkpoint c
+        WHERE c.usuario_dono = :usuario AND c.base = '{base}'
+          AND c.mes = (SELECT MAX(c2.mes) FROM saldo_checkpoint c2
+                       WHERE c2.usuario_dono = c.usuario_dono AND c2.base = c.base
+                         AND c2.conta_id = c.conta_id AND c2.mes < :mes)
+        UNION ALL
+        SELECT COALESCE(conta_id, 0) AS conta_id, {liquido} AS saldo_centavos
+        FROM transactions
+        WHERE usuario_dono = :usuario AND {coluna} >= :inicio_mes AND {coluna} < :data
+    ) s
+    LEFT JOIN accounts a ON a.id = s.conta_id
+    GROUP BY s.conta_id, a.nome
+    ORDER BY s.conta_id
+"""
+
+_SALDOS_EM_PREVISTO = Consulta("saldos_em_previsto", _SALDOS_EM.format(base="prevista", coluna="data_prevista", liquido=_LIQUIDO),
+                               tipos={"conta_id": "int", "saldo_centavos": "centavos"})
+
+_SALDOS_EM_REALIZADO = Consulta("saldos_em_realizado", _SALDOS_EM.format(base="real", coluna="data_real", liquido=_LIQUIDO),
+                                tipos={"conta_id": "int", "saldo_centavos": "centavos"})
+
+def _meses(inicio, fim):
+    # O resumo é mensal: [inicio, fim) precisa começar e terminar em virada de mês
+    return {"mes_inicio": inicio.strftime("%Y-%m"), "mes_fim": fim.strftime("%Y-%m")}
+
+
+def kpis_mes(db_ref, usuario, inicio, fim):
+    """
+    Saldo realizado de todo o histórico e os totais do mês [inicio, fim) num dict de ints
+    (valores em centavos). O total "quantidade" é zero quando o usuário ainda não lançou nada.
+    """
+    linha = ler_cache(db_ref, usuario, _KPIS_MES, **_meses(inicio, fim)).iloc[0]
+    return {k: int(v) for k, v in linha.items()}
+
+
+def despesas_por_categoria(db_ref, usuario, inicio, fim):
+    """Saídas previstas para [inicio, fim) somadas por categoria (gráfico de pizza do painel)."""
+    return ler_cache(db_ref, usuario, _DESPESAS_POR_CATEGORIA, **_meses(inicio, fim))
+
+
+def realizado_por_categoria(db_ref, usuario, inicio, fim):
+    """Entradas e saídas realizadas (pela data real) em [inicio, fim), por tipo e categoria."""
+    return ler_cache(db_ref, usuario, _REALIZADO_POR_CATEGORIA, **_meses(inicio, fim))
+
+
+def lancamentos_do_periodo(db_ref, usuario, inicio, fim, hoje, status=None, tipo=None, categoria=None, conta=None, busca=None):
+    """
+    Lançamentos com data prevista em [inicio, fim). status aceita "Previsto", "Realizado" ou
+    "Atrasado" (previsto e vencido antes de hoje); os demais filtros são nomes exatos ou None.
+    """
+    atrasado = status == "Atrasado"
+    return ler_cache(
+        db_ref, usuario, _LANCAMENTOS_PERIODO, inicio=inicio, fim=fim, hoje=hoje,
+        status=None if atrasado else status, somente_atrasados=int(atrasado),
+        tipo=tipo, categoria=categoria, conta=conta, busca=padrao_busca(busca),
+    )
+
+
+_BUSCA_DATA = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_BUSCA_VALOR = re.compile(r"^(R\$)?\s*\d{1,3}(\.?\d{3})*(,\d{1,2})?$|^(R\$)?\s*\d+(\.\d{1,2})?$")
+
+
+def _interpretar_busca(texto):
+    """
+    Um único campo de busca vale para descrição, ID, valor e data: o texto vira os
+    parâmetros que fizerem sentido para ele (o resto fica None e não casa nada).
+    """
+    texto = (texto or "").strip()
+    params = {"filtrar": int(bool(texto)), "busca": padrao_busca(texto), "busca_id": None, "busca_centavos": None, "busca_data": None}
+    if not texto:
+        return params
+    sem_cerquilha = texto.lstrip("#")
+    if sem_cerquilha.isdigit():
+        params["busca_id"] = int(sem_cerquilha)
+    m = _BUSCA_DATA.match(texto)
+    if m:
+        try:
+            params["busca_data"] = date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+        except ValueError:
+            pass
+    if _BUSCA_VALOR.match(texto):
+        numero = texto.replace("R$", "").strip()
+        if "," in numero:
+            numero = numero.replace(".", "").replace(",", ".")
+        elif numero.count(".") == 1 and len(numero.split(".")[1]) == 3:
+            numero = numero.replace(".", "")
+        params["busca_centavos"] = para_centavos(numero)
+    return params
+
+
+def lancamentos_para_gestao(db_ref, usuario, antes_de=None, busca=None, limite=50):
+    """
+    Uma página do "Gerenciar Lançamentos", do mais novo para o mais antigo, a partir do
+    cursor antes_de (o menor id da página anterior). Traz limite + 1 linhas: se a extra
+    vier, existe próxima página.
+    """
+    return ler_cache(
+        db_ref, usuario, _LANCAMENTOS_GESTAO, antes_de=antes_de,
+        limite=int(limite) + 1, **_interpretar_busca(busca),
+    )
+
+
+def lancamentos_da_conta(db_ref, usuario, conta_id, inicio, fim):
+    """Data, valor, tipo e descrição do que já existe na conta entre inicio e fim (inclusive)."""
+    return ler_cache(db_ref, usuario, _LANCAMENTOS_DA_CONTA, conta_id=int(conta_id), inicio=inicio, fim=fim)
+
+
+def contas_do_periodo(db_ref, usuario, tipo, inicio, fim, categorias=None, busca=None, incluir_atrasados=False):
+    """
+    Entradas (Contas a Receber) ou Saídas (Contas a Pagar) com vencimento em [inicio, fim),
+    por vencimento. Com incluir_atrasados, traz também o que ficou em aberto antes de inicio.
+    """
+    return ler_cache(
+        db_ref, usuario, _CONTAS_PERIODO, tipo=tipo, inicio=inicio, fim=fim,
+        incluir_atrasados=int(bool(incluir_atrasados)), categorias=list(categorias) if categorias else None,
+        busca=padrao_busca(busca),
+    )
+
+
+# Rótulos de situação na ordem (liquidado, atrasado, vence em breve, em aberto)
+SITUACOES_PAGAR = ("Realizado", "Atrasado", "Recebe em 7 dias", "A pagar")
+SITUACOES_RECEBER = ("Recebido", "Atrasado", "Recebe em 7 dias", "A receber")
+
+
+def classificar_situacao(status, vencimento, hoje, rotulos, dias_alerta=7):
+    """
+    Situação de cada conta de contas_do_periodo em relação a hoje, numa passada só:
+    Realizado > vencida antes de hoje > vence em até dias_alerta > em aberto.
+    Sem vencimento conta como em aberto. Devolve category com os rótulos dados.
+    """
+    hoje = pd.Timestamp(hoje)
+    vencimento = pd.to_datetime(vencimento, errors="coerce")
+    codigo = np.select(
+        [
+            (status == "Realizado").to_numpy(dtype=bool),
+            (vencimento < hoje).to_numpy(dtype=bool),
+            (vencimento <= hoje + pd.Timedelta(days=dias_alerta)).to_numpy(dtype=bool),
+        ],
+        [0, 1, 2], default=3,
+    )
+    return pd.Series(pd.Categorical.from_codes(codigo, categories=list(rotulos)), index=status.index)
+
+
+def movimentos_fluxo(db_ref, usuario, inicio, fim, base_realizado=False):
+    """Movimentos com data (prevista ou real) em [inicio, fim), com a conta de cada um."""
+    return ler_cache(db_ref, usuario, _FLUXO_REALIZADO if base_realizado else _FLUXO_PREVISTO, inicio=inicio, fim=fim)
+
+
+def saldos_por_conta_em(db_ref, usuario, data, base_realizado=False):
+    """
+    Saldo de cada conta imediatamente antes de data (conta_id 0 = lançamentos sem conta),
+    a partir dos checkpoints mensais. Contas sem movimento até ali não aparecem.
+    """
+    inicio_mes = data.replace(day=1)
+    return ler_cache(
+        db_ref, usuario, _SALDOS_EM_REALIZADO if base_realizado else _SALDOS_EM_PREVISTO,
+        mes=inicio_mes.strftime("%Y-%m"), inicio_mes=inicio_mes, data=data,
+    )
+
+
+# =========================================================
+# ESCRITAS DE LANÇAMENTOS
+# =========================================================
+_INSERIR_TRANSACAO = Consulta("inserir_transacao", """
+    INSERT INTO transactions (tipo, descricao, valor_centavos, data_prevista, data_real, status, conta_id, categoria_id, usuario_dono)
+    VALUES (:tipo, :descricao, :valor_centavos, :data_prevista, :data_real, :status, :conta_id, :categoria_id, :usuario)
+""", retorna_id=True)
+
+_ATUALIZAR_TRANSACAO = Consulta("atualizar_transacao", """
+    UPDATE transactions
+    SET tipo = :tipo, descricao = :descricao, valor_centavos = :valor_centavos, data_prevista = :data_prevista, data_real = :data_real,
+        status = :status, conta_id = :conta_id, categoria_id = :categoria_id
+    WHERE id = :id AND usuario_dono = :usuario
+""")
+
+_DUPLICAR_TRANSACAO = Consulta("duplicar_transacao", """
+    INSERT INTO transactions (tipo, descricao, valor_centavos, data_prevista, data_real, status, conta_id, categoria_id, usuario_dono)
+    SELECT tipo, descricao, valor_centavos, data_prevista, NULL, 'Previsto', conta_id, categoria_id, usuario_dono
+    FROM transactions WHERE id = :id AND usuario_dono = :usuario
+""", retorna_id=True)
+
+_EXCLUIR_TRANSACAO = Consulta("excluir_transacao", """
+    DELETE FROM transactions WHERE id = :id AND usuario_dono = :usuario
+""")
+
+# conta_id NULL mantém a conta de cada lançamento
+_MARCAR_REALIZADOS = Consulta("marcar_realizados", """
+    UPDATE transactions SET status = 'Realizado', data_real = :data_real, conta_id = COALESCE(:conta_id, conta_id)
+    WHERE usuario_dono = :usuario AND id = ANY(:ids)
+""")
+
+
+# Toda escrita passa resumo mensal e saldos junto: -1 nas linhas como estavam, +1 como ficaram.
+# Valores sempre em centavos inteiros (use para_centavos na entrada da tela); texto já sai normalizado.
+def inserir_transacao(db_ref, usuario, tipo, descricao, valor_centavos, data_prevista, data_real, status, conta_id, categoria_id):
+    with transacao(db_ref, usuario) as tx:
+        novo_id = tx.executar(
+            _INSERIR_TRANSACAO, tipo=normalizar_texto(tipo), descricao=normalizar_texto(descricao), valor_centavos=int(valor_centavos), data_prevista=data_prevista,
+            data_real=data_real, status=normalizar_texto(status), conta_id=int(conta_id), categoria_id=int(categoria_id), usuario=usuario,
+        )
+        _ajustar_agregados(tx, usuario, [novo_id], +1)
+        return novo_id
+
+
+def atualizar_transacao(db_ref, usuario, transacao_id, tipo, descricao, valor_centavos, data_prevista, data_real, status, conta_id, categoria_id):
+    with transacao(db_ref, usuario) as tx:
+        _ajustar_agregados(tx, usuario, [transacao_id], -1)
+        alteradas = tx.executar(
+            _ATUALIZAR_TRANSACAO, tipo=normalizar_texto(tipo), descricao=normalizar_texto(descricao), valor_centavos=int(valor_centavos), data_prevista=data_prevista,
+            data_real=data_real, status=normalizar_texto(status), conta_id=int(conta_id), categoria_id=int(categoria_id),
+            id=int(transacao_id), usuario=usuario,
+        )
+        _ajustar_agregados(tx, usuario, [transacao_id], +1)
+        return alteradas
+
+
+_COLUNAS_TRANSACAO = ["tipo", "descricao", "valor_centavos", "data_prevista", "data_real", "status", "conta_id", "categoria_id", "usuario_dono"]
+
+
+def inserir_transacoes_em_lote(db_ref, usuario, lancamentos):
+    """
+    Grava milhares de lançamentos num único commit (importação de extrato). lancamentos é
+    um DataFrame ou lista de dicts com as colunas de inserir_transacao. Devolve os ids.
+    """
+    def dia(valor):
+        if valor is None or pd.isna(valor):
+            return None
+        return pd.Timestamp(valor).date()
+
+    registros = lancamentos.to_dict("records") if isinstance(lancamentos, pd.DataFrame) else list(lancamentos)
+    tuplas = [
+        (normalizar_texto(r["tipo"]), normalizar_texto(r["descricao"]), int(r["valor_centavos"]), dia(r["data_prevista"]),
+         dia(r.get("data_real")), normalizar_texto(r["status"]), int(r["conta_id"]), int(r["categoria_id"]), usuario)
+        for r in registros
+    ]
+    with transacao(db_ref, usuario) as tx:
+        ids = tx.inserir_lote("transactions", _COLUNAS_TRANSACAO, tuplas)
+        _ajustar_agregados(tx, usuario, ids, +1)
+    return ids
+
+
+def duplicar_transacao(db_ref, usuario, transacao_id):
+    with transacao(db_ref, usuario) as tx:
+        novo_id = tx.executar(_DUPLICAR_TRANSACAO, id=int(transacao_id), usuario=usuario)
+        _ajustar_agregados(tx, usuario, [novo_id], +1)
+        return novo_id
+
+
+def excluir_transacao(db_ref, usuario, transacao_id):
+    with transacao(db_ref, usuario) as tx:
+        _ajustar_agregados(tx, usuario, [transacao_id], -1)
+        return tx.executar(_EXCLUIR_TRANSACAO, id=int(transacao_id), usuario=usuario)
+
+
+def marcar_realizados(db_ref, usuario, transacao_ids, data_real, conta_id=None):
+    """Baixa vários lançamentos num único UPDATE/commit, com data (e opcionalmente conta) em comum."""
+    ids = [int(i) for i in transacao_ids]
+    if not ids:
+        return 0
+    with transacao(db_ref, usuario) as tx:
+        _ajustar_agregados(tx, usuario, ids, -1)
+        alteradas = tx.executar(
+            _MARCAR_REALIZADOS, ids=ids, data_real=data_real, usuario=usuario,
+            conta_id=int(conta_id) if conta_id is not None else None,
+        )
+        _ajustar_agregados(tx, usuario, ids, +1)
+        return alteradas
+
+
+# =========================================================
+# CLIENTES (COFRE DE USUÁRIOS DO ADMINISTRADOR)
+# =========================================================
+# Filtros e paginação por chave (empresa, usuario) no banco: a tela só recebe uma página.
+# A senha nunca sai do banco, só se ela já foi definida.
+_CLIENTES_FILTRO = """
+    FROM usuarios
+    WHERE usuario <> :admin
+      AND (:incluir_bloqueados = 1 OR COALESCE(ativo, 1) <> 0)
+      AND (:somente_vencidos = 0 OR (vencimento IS NOT NULL AND vencimento <> '' AND vencimento < :hoje))
+      AND (:busca IS NULL OR LOWER(usuario) LIKE :busca ESCAPE '\\' OR LOWER(COALESCE(empresa, '')) LIKE :busca ESCAPE '\\')
+"""
+
+_CLIENTES_PAGINA = Consulta("clientes_admin", """
+    SELECT usuario, empresa, db_nome, COALESCE(ativo, 1) AS ativo,
+           CASE WHEN senha IS NULL OR LOWER(TRIM(senha)) IN ('', 'null', 'none') THEN 0 ELSE 1 END AS senha_definida,
+           COALESCE(plano, 'Starter') AS plano, COALESCE(valor_mensal, 0) AS valor_mensal, vencimento,
+           LOWER(COALESCE(empresa, '')) AS chave_empresa
+""" + _CLIENTES_FILTRO + """
+      AND (:apos_empresa IS NULL OR (LOWER(COALESCE(empresa, '')), usuario) > (:apos_empresa, :apos_usuario))
+    ORDER BY LOWER(COALESCE(empresa, '')), usuario
+    LIMIT :limite
+""", tipos={"ativo": "int", "senha_definida": "int", "valor_mensal": "float"})
+
+_CLIENTES_TOTAL = Consulta("contar_clientes", "SELECT COUNT(*) AS total" + _CLIENTES_FILTRO, tipos={"total": "int"})
+
+_CLIENTE_EXISTE = Consulta("cliente_existe", "SELECT 1 FROM usuarios WHERE usuario = :cliente")
+# Senha NULL: o cliente cria a dele no primeiro acesso
+_INSERIR_CLIENTE = Consulta("inserir_cliente", """
+    INSERT INTO usuarios (usuario, senha, db_nome, empresa, ativo, plano, valor_mensal, vencimento)
+    VALUES (:cliente, NULL, :db_nome, :empresa, 1, :plano, :valor_mensal, :vencimento)
+""")
+_CLIENTE_ATIVO = Consulta("definir_ativo_cliente", "UPDATE usuarios SET ativo = :ativo WHERE usuario = :cliente")
+_CLIENTE_LIBERAR = Consulta("liberar_acesso_cliente", "UPDATE usuarios SET senha = NULL WHERE usuario = :cliente")
+_CLIENTE_PLANO = Consulta("atualizar_plano_cliente", """
+    UPDATE usuarios SET plano = :plano, valor_mensal = :valor_mensal, vencimento = :vencimento WHERE usuario = :cliente
+""")
+_CLIENTE_EXCLUIR = Consulta("excluir_cliente", "DELETE FROM usuarios WHERE usuario = :cliente")
+
+
+def _filtros_clientes(admin, busca, incluir_bloqueados, somente_vencidos, hoje):
+    return {
+        "admin": admin, "busca": padrao_busca(busca), "incluir_bloqueados": int(bool(incluir_bloqueados)),
+        "somente_vencidos": int(bool(somente_vencidos)), "hoje": hoje.isoformat(),
+    }
+
+
+def clientes_admin(db_ref, admin, busca=None, incluir_bloqueados=True, somente_vencidos=False, hoje=None, apos=None, limite=25):
+    """
+    Uma página de clientes por empresa, a partir do cursor apos = (chave_empresa, usuario)
+    da última linha da página anterior. Traz limite + 1 linhas para indicar a próxima página.
+    """
+    apos_empresa, apos_usuario = apos if apos else (None, None)
+    return ler(
+        db_ref, _CLIENTES_PAGINA, apos_empresa=apos_empresa, apos_usuario=apos_usuario, limite=int(limite) + 1,
+        **_filtros_clientes(admin, busca, incluir_bloqueados, somente_vencidos, hoje or date.today()),
+    )
+
+
+def contar_clientes(db_ref, admin, busca=None, incluir_bloqueados=True, somente_vencidos=False, hoje=None):
+    df = ler(db_ref, _CLIENTES_TOTAL, **_filtros_clientes(admin, busca, incluir_bloqueados, somente_vencidos, hoje or date.today()))
+    return int(df["total"].iloc[0])
+
+
+def criar_cliente(db_ref, cliente, empresa, db_nome, plano, valor_mensal, vencimento):
+    """Cadastra o cliente ativo e sem senha; False se o login já existir."""
+    with transacao(db_ref) as tx:
+        if tx.linhas(_CLIENTE_EXISTE, cliente=cliente):
+            return False
+        tx.executar(
+            _INSERIR_CLIENTE, cliente=cliente, db_nome=db_nome, empresa=empresa, plano=plano,
+            valor_mensal=float(valor_mensal), vencimento=vencimento.isoformat(),
+        )
+        return True
+
+
+def definir_ativo_cliente(db_ref, cliente, ativo):
+    with transacao(db_ref) as tx:
+        tx.executar(_CLIENTE_ATIVO, cliente=cliente, ativo=int(bool(ativo)))
+
+
+def liberar_acesso_cliente(db_ref, cliente):
+    with transacao(db_ref) as tx:
+        tx.executar(_CLIENTE_LIBERAR, cliente=cliente)
+
+
+def atualizar_plano_cliente(db_ref, cliente, plano, valor_mensal, vencimento):
+    with transacao(db_ref) as tx:
+        tx.executar(_CLIENTE_PLANO, cliente=cliente, plano=plano, valor_mensal=float(valor_mensal), vencimento=vencimento.isoformat())
+
+
+def excluir_cliente(db_ref, cliente):
+    with transacao(db_ref) as tx:
+        tx.executar(_CLIENTE_EXCLUIR, cliente=cliente)